@@ -1,56 +1,121 @@
-from fastapi import APIRouter, HTTPException,BackgroundTasks
-from typing import List, Optional, Dict, Any
-from models import VideoBase, VideoItem, AnalysisResponse,AnalysisRequest
-import requests
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse, JSONResponse
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple
+from models import VideoBase, VideoItem, AnalysisResponse,AnalysisRequest,TopicRequest
 import os
 from pathlib import Path
 from datetime import datetime
 import aiofiles
-import httpx
 import asyncio
-from openai import OpenAI
+import uuid
+import json
+import hashlib
+import time
+import config
+import http_client
+import metrics
+import dedup
+from resilience import UpstreamError
+import subtitle as subtitle_pipeline
+import search_index
+from doc_catalog import doc_catalog, content_hash
+from knowledge_store import knowledge_store
+from jobs import job_store, notify_new_job
+from llm_cache import llm_cache
+import prompts
+import topic as topic_pipeline
+from outline import parse_outline, count_nodes
+from outline_cache import outline_cache, outline_response
+from prompts import SYSTEM_PROMPT
 
 analyse= APIRouter()
 # 配置
-TONGYI_API_KEY = os.getenv("TONGYI_API_KEY", "your_tongyi_api_key_here")
-TONGYI_API_URL = "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation"
-OUTPUT_DIR = Path("./output/markdowns")
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+TONGYI_API_KEY = config.TONGYI_API_KEY
+TONGYI_API_URL = f"{config.DASHSCOPE_API_BASE}/api/v1/services/aigc/text-generation/generation"
+TONGYI_PARAMETERS = {"result_format": "text"}
+OUTPUT_DIR = config.OUTPUT_DIR
+metrics.register_cache("llm", llm_cache.stats)
 
-# 存储分析任务的状态
-analysis_tasks = {}
 
 
 
 async def extract_bilibili_subtitle(bvid: str) -> Optional[str]:
     """
-    尝试提取B站视频字幕
+    尝试提取B站视频字幕（带时间戳的纯文本），没有字幕时返回None
     """
     try:
-        # 这里需要实现B站字幕提取逻辑
-        # 实际实现可能需要使用B站API或web scraping
-        async with httpx.AsyncClient() as client:
-            # 示例：尝试获取字幕信息
-            subtitle_url = f"https://api.bilibili.com/x/player/v2?bvid={bvid}"
-            response = await client.get(subtitle_url, timeout=10)
-
-            if response.status_code == 200:
-                data = response.json()
-                # 这里需要根据实际API响应结构解析字幕
-                # 如果没有字幕，返回None
-                return None
-
+        with metrics.stage_seconds.time(stage="subtitle"):
+            return await subtitle_pipeline.fetch_subtitle(bvid)
+    except UpstreamError:
+        # B站限流/熔断时不退回无字幕分析，避免在故障期间浪费大模型调用
+        raise
     except Exception as e:
         print(f"提取字幕失败 {bvid}: {e}")
         return None
 
-    return None
 
+async def condense_subtitle(video: VideoItem, subtitle: str, analysis_type: str, use_cache: bool = True, depth: int = 0) -> str:
+    """
+    字幕超出该分析类型的 token 预算时分段并行摘要（map，使用便宜的模型），再把各段摘要按顺序合并，
+    合并结果作为最终分析（reduce）的输入；合并后仍超出预算时再压缩一轮
+    """
+    budget = prompts.get_route(analysis_type).subtitle_budget
+    if subtitle_pipeline.estimate_tokens(subtitle) <= budget:
+        return subtitle
+    if depth >= 2:
+        # 仍然过长时直接截断，保证请求不超出上下文
+        return prompts.trim_to_budget(subtitle, budget)
+
+    chunks = subtitle_pipeline.split_transcript(subtitle, config.SUBTITLE_CHUNK_TOKENS)
+    semaphore = asyncio.Semaphore(max(1, config.SUBTITLE_MAP_CONCURRENCY))
+
+    async def summarize(index: int, chunk: str) -> str:
+        prompt = prompts.build_chunk_prompt(video.title, index, len(chunks), chunk)
+        async with semaphore:
+            return await call_tongyi_qianwen(prompt, video.dict(), f"chunk:{analysis_type}", use_cache,
+                                             model=prompts.CHUNK_MODEL)
+
+    summaries = await asyncio.gather(*(summarize(i + 1, chunk) for i, chunk in enumerate(chunks)))
+    merged = "（以下为字幕分段摘要）\n\n" + "\n\n".join(
+        f"### 第{i + 1}部分\n{summary}" for i, summary in enumerate(summaries)
+    )
+    return await condense_subtitle(video, merged, analysis_type, use_cache, depth + 1)
+
+
+def _cache_key(prompt: str, analysis_type: Optional[str], model: str) -> str:
+    # 流式与非流式调用共用同一个缓存键
+    return llm_cache.make_key(
+        model, SYSTEM_PROMPT, prompt, {**TONGYI_PARAMETERS, "analysis_type": analysis_type}
+    )
+
+
+def _tongyi_payload(prompt: str, parameters: Dict, model: str) -> Dict:
+    return {
+        "model": model,
+        "input": {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": SYSTEM_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        },
+        "parameters": parameters
+    }
 
-async def call_tongyi_qianwen(prompt: str, video_info: Dict) -> str:
+
+async def call_tongyi_qianwen(prompt: str, video_info: Dict, analysis_type: str = None, use_cache: bool = True,
+                              model: Optional[str] = None) -> str:
     """
-    调用通义千问API进行分析
+    调用通义千问API进行分析，未指定 model 时按 analysis_type 路由
+    相同的模型、提示词和参数命中缓存时直接返回，use_cache=False 时跳过缓存读取
+    调用失败或返回内容为空时抛出 UpstreamError，不会把错误信息当作分析结果返回
     """
+    model = model or prompts.get_route(analysis_type).model
 
     # client = OpenAI(
     #     # 若没有配置环境变量，请用百炼API Key将下行替换为：api_key="sk-xxx",
@@ -70,114 +135,99 @@ async def call_tongyi_qianwen(prompt: str, video_info: Dict) -> str:
     #     # extra_body={"enable_thinking": False},
     # )
     # print(completion.model_dump_json())
-    try:
-        headers = {
-            "Authorization": f"Bearer {TONGYI_API_KEY}",
-            "Content-Type": "application/json"
-        }
-
-        payload = {
-            "model": "qwen-max",
-            "input": {
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "你是一个专业的知识整理助手，擅长从视频内容中提取关键信息并生成结构化的学习笔记。"
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            },
-            "parameters": {
-                "result_format": "text"
-            }
-        }
-
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                TONGYI_API_URL,
-                headers=headers,
-                json=payload,
-                timeout=60
-            )
+    headers = {
+        "Authorization": f"Bearer {TONGYI_API_KEY}",
+        "Content-Type": "application/json"
+    }
 
-            if response.status_code == 200:
-                result = response.json()
-                return result.get("output", {}).get("text", "分析失败")
-            else:
-                return f"API调用失败: {response.text}"
+    cache_key = _cache_key(prompt, analysis_type, model)
+    if use_cache:
+        cached = await asyncio.to_thread(llm_cache.get, cache_key)
+        if cached is not None:
+            return cached
+
+    payload = _tongyi_payload(prompt, TONGYI_PARAMETERS, model)
+
+    with metrics.stage_seconds.time(stage="llm"):
+        response = await http_client.request(
+            "tongyi",
+            "POST",
+            TONGYI_API_URL,
+            headers=headers,
+            json=payload
+        )
+    http_client.raise_for_status("tongyi", response)
 
-    except Exception as e:
-        return f"调用通义千问失败: {str(e)}"
+    result = response.json()
+    metrics.record_llm_usage(model, result.get("usage"))
+    text = result.get("output", {}).get("text")
+    if not text:
+        raise UpstreamError("tongyi", f"返回内容为空: {result.get('code') or result.get('message') or ''}")
+    await asyncio.to_thread(llm_cache.set, cache_key, text)
+    return text
 
 
-async def analyze_single_video(video: VideoItem, analysis_type: str) -> Dict[str, Any]:
+async def stream_tongyi_qianwen(prompt: str, analysis_type: str = None, use_cache: bool = True,
+                                model: Optional[str] = None) -> AsyncIterator[str]:
     """
-    分析单个视频
+    以流式（SSE）方式调用通义千问，逐段产出增量文本
+    命中缓存时一次性产出缓存内容
     """
-    try:
-        # 1. 尝试提取字幕
-        subtitle = await extract_bilibili_subtitle(video.bvid)
-
-        # 2. 构建提示词
-        if subtitle:
-            prompt = f"""
-请分析以下B站视频内容并生成详细的学习笔记：
-
-视频标题：{video.title}
-UP主：{video.author}
-视频时长：{video.duration}秒
-更新时间：{video.update}
-
-视频字幕内容：
-{subtitle}
-
-请生成结构化的Markdown文档，包括：
-1. 视频概要
-2. 核心知识点
-3. 详细内容解析
-4. 学习要点总结
-5. 相关拓展思考
-"""
-        else:
-            prompt = f"""
-请基于以下B站视频信息生成学习笔记：
-
-视频标题：{video.title}
-UP主：{video.author}
-视频时长：{video.duration}秒
-更新时间：{video.update}
-视频链接：{video.url}
-
-由于无法获取字幕内容，请根据视频标题和基本信息进行分析，生成包含：
-1. 基于标题的内容推测
-2. 可能的知识点分析
-3. 学习建议
-4. 相关资源推荐
-
-请用Markdown格式输出。
-"""
-
-        # 3. 调用通义千问
-        analysis_result = await call_tongyi_qianwen(prompt, video.dict())
-
-        # 4. 生成Markdown文档
-        markdown_content = f"""# {video.title} - 学习笔记
+    model = model or prompts.get_route(analysis_type).model
+    if use_cache:
+        cached = await asyncio.to_thread(llm_cache.get, _cache_key(prompt, analysis_type, model))
+        if cached is not None:
+            yield cached
+            return
+
+    headers = {
+        "Authorization": f"Bearer {TONGYI_API_KEY}",
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream",
+        "X-DashScope-SSE": "enable"
+    }
+    payload = _tongyi_payload(prompt, {**TONGYI_PARAMETERS, "incremental_output": True}, model)
+
+    start = time.perf_counter()
+    usage = None
+    async with http_client.stream("tongyi", "POST", TONGYI_API_URL, headers=headers, json=payload) as response:
+        if response.status_code != 200:
+            await response.aread()
+            http_client.raise_for_status("tongyi", response)
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = json.loads(line[5:])
+            # 每个事件都带有截至当前的累计 usage，以最后一个为准
+            usage = data.get("usage") or usage
+            text = data.get("output", {}).get("text")
+            if text:
+                yield text
+    metrics.stage_seconds.observe(time.perf_counter() - start, stage="llm_stream")
+    metrics.record_llm_usage(model, usage)
+
+
+def render_markdown_header(video: VideoItem) -> str:
+    """Markdown文档中分析结果之前的部分"""
+    return f"""# {video.title} - 学习笔记
 
 **视频信息**
 - UP主：{video.author}
 - BV号：{video.bvid}
 - 时长：{video.duration}秒
-- 更新时间：{video.update}
+- 更新时间：{video.pubdate or "未知"}
 - [观看视频]({video.url})
 
 ---
 
 ## 内容分析
 
-{analysis_result}
+"""
+
+
+def render_markdown_footer(video: VideoItem) -> str:
+    """Markdown文档中分析结果之后的部分"""
+    return f"""
 
 ---
 
@@ -191,12 +241,109 @@ UP主：{video.author}
 </div>
 """
 
+
+def new_markdown_filename(bvid: str) -> str:
+    return f"{bvid}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
+
+
+def register_document(filename: str, title: str, content: str):
+    """新文档写入后登记到文档目录、加入全文索引并解析好大纲（与文档大纲接口一样不带标题）"""
+    doc_catalog.register(filename, content)
+    search_index.index_markdown_file(filename, title, content)
+    outline_cache.build(content)
+
+
+async def reused_document(knowledge_id: str) -> Optional[Dict]:
+    """
+    复用的知识库项对应的Markdown文档：优先取内容相同的已有文档，
+    文档已删除时把知识库中的内容重新写成文档；知识库项已不存在时返回 None
+    """
+    item = await asyncio.to_thread(knowledge_store.get, knowledge_id)
+    if item is None:
+        return None
+    document = await asyncio.to_thread(doc_catalog.find, item.bvid, content_hash(item.markdown_content))
+    if document is None or not (OUTPUT_DIR / document["filename"]).exists():
+        filename = new_markdown_filename(item.bvid)
+        async with aiofiles.open(OUTPUT_DIR / filename, 'w', encoding='utf-8') as f:
+            await f.write(item.markdown_content)
+        await asyncio.to_thread(register_document, filename, item.title, item.markdown_content)
+        document = {"filename": filename}
+    return document
+
+
+async def dedup_results(videos: List[Dict], analysis_type: str, dedup_enabled: bool = True,
+                        reuse_existing: Optional[bool] = None) -> Tuple[Dict, Dict[int, Dict]]:
+    """
+    分析前去重，返回 (去重报告, 下标 -> 被合并/复用视频的结果)；
+    报告中的 unique 为仍需分析的视频下标
+    """
+    report = await asyncio.to_thread(dedup.dedup_videos, videos, analysis_type,
+                                     dedup=dedup_enabled, reuse_existing=reuse_existing)
+    results = {entry["index"]: dedup.collapsed_result(videos[entry["index"]], entry) for entry in report["collapsed"]}
+    reused = []
+    for entry in report["reused"]:
+        document = await reused_document(entry["knowledge_id"])
+        if document is None:
+            # 查询后知识库项被删除，照常分析
+            report["unique"].append(entry["index"])
+            continue
+        results[entry["index"]] = dedup.reused_result(videos[entry["index"]], entry, analysis_type, document)
+        reused.append(entry)
+    report["reused"] = reused
+    report["unique"].sort()
+    return report, results
+
+
+async def analyze_single_video(video: VideoItem, analysis_type: str, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    分析单个视频；失败时返回 status=error 的结果（批量任务逐个记录，不中断其他视频）
+    """
+    try:
+        return await run_video_analysis(video, analysis_type, use_cache)
+    except Exception as e:
+        return analysis_error(video, e)
+
+
+def analysis_error(video: VideoItem, e: Exception) -> Dict[str, Any]:
+    return {
+        "bvid": video.bvid,
+        "title": video.title,
+        "status": "error",
+        "error": str(e),
+        "error_type": type(e).__name__
+    }
+
+
+async def run_video_analysis(video: VideoItem, analysis_type: str, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    分析单个视频，失败时抛出异常
+    """
+    try:
+        metrics.analyses_inflight.inc()
+        # 1. 尝试提取字幕
+        subtitle = await extract_bilibili_subtitle(video.bvid)
+        if subtitle:
+            with metrics.stage_seconds.time(stage="condense"):
+                subtitle = await condense_subtitle(video, subtitle, analysis_type, use_cache)
+
+        # 2. 按分析类型选择模板和模型，构建提示词
+        route = prompts.get_route(analysis_type)
+        prompt = prompts.build_prompt(video, subtitle, analysis_type)
+
+        # 3. 调用通义千问
+        analysis_result = await call_tongyi_qianwen(prompt, video.dict(), analysis_type, use_cache, model=route.model)
+
+        # 4. 生成Markdown文档
+        markdown_content = render_markdown_header(video) + analysis_result + render_markdown_footer(video)
+
         # 5. 保存Markdown文件
-        filename = f"{video.bvid}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
+        filename = new_markdown_filename(video.bvid)
         filepath = OUTPUT_DIR / filename
 
-        async with aiofiles.open(filepath, 'w', encoding='utf-8') as f:
-            await f.write(markdown_content)
+        with metrics.stage_seconds.time(stage="markdown_write"):
+            async with aiofiles.open(filepath, 'w', encoding='utf-8') as f:
+                await f.write(markdown_content)
+            await asyncio.to_thread(register_document, filename, video.title, markdown_content)
 
         return {
             "bvid": video.bvid,
@@ -204,130 +351,347 @@ UP主：{video.author}
             "status": "success",
             "markdown_file": filename,
             "file_path": str(filepath),
-            "analysis_type": analysis_type
-        }
-
-    except Exception as e:
-        return {
-            "bvid": video.bvid,
-            "title": video.title,
-            "status": "error",
-            "error": str(e)
+            "analysis_type": analysis_type,
+            "model": route.model
         }
+    finally:
+        metrics.analyses_inflight.dec()
 
 
-async def analyze_videos_task(task_id: str, videos: List[VideoItem], analysis_type: str):
+async def analyze_videos_task(task_id: str):
     """
-    后台任务：批量分析视频
+    批量分析任务：只分析任务中尚未完成的视频，重启后从检查点继续
+    分析前先去重：重复/近似重复的视频和知识库中已有结果的视频直接记为完成，不调用大模型
+    最多 ANALYSE_CONCURRENCY 个视频同时分析，上游请求频率由各自的限流器控制，
+    每个视频完成后立即写入任务库
     """
-    results = []
+    job = await asyncio.to_thread(job_store.get, task_id)
+    if job is None:
+        return
+    items = await asyncio.to_thread(job_store.pending_items, task_id)
 
-    for video in videos:
-        result = await analyze_single_video(video, analysis_type)
-        results.append(result)
+    options = job["options"]
+    report, deduped = await dedup_results([video for _, video in items], job["analysis_type"],
+                                          options.get("dedup", True), options.get("reuse_existing"))
+    for index, result in deduped.items():
+        await asyncio.to_thread(job_store.complete_item, task_id, items[index][0], result)
+    if report["collapsed"] or report["reused"]:
+        print(f"任务 {task_id} 去重：合并 {len(report['collapsed'])} 个，复用已有结果 {len(report['reused'])} 个")
+    items = [items[index] for index in report["unique"]]
 
-        # 更新任务进度
-        analysis_tasks[task_id] = {
-            "status": "processing",
-            "progress": f"{len(results)}/{len(videos)}",
-            "completed": len(results),
-            "total": len(videos),
-            "results": results
-        }
+    semaphore = asyncio.Semaphore(max(1, config.ANALYSE_CONCURRENCY))
 
-        # 稍微延迟，避免请求过于频繁
-        await asyncio.sleep(1)
+    async def worker(seq: int, video: VideoItem):
+        async with semaphore:
+            result = await analyze_single_video(video, job["analysis_type"])
+        await asyncio.to_thread(job_store.complete_item, task_id, seq, result)
+
+    await asyncio.gather(*(worker(seq, VideoItem(**video)) for seq, video in items))
 
     # 标记任务完成
-    analysis_tasks[task_id]["status"] = "completed"
+    await asyncio.to_thread(job_store.finish, task_id)
 #批量分析视频
 @analyse.post("/",response_model=AnalysisResponse)
-async def analyse_endpoint(videos: List[VideoItem]):
-    async def analyze_videos(request: AnalysisRequest, background_tasks: BackgroundTasks):
-        """
-        分析视频集合并生成Markdown文档
-        """
-        if not request.videos:
-            raise HTTPException(status_code=400, detail="视频列表不能为空")
-
-        # 生成任务ID
-        task_id = f"task_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-
-        # 启动后台任务
-        background_tasks.add_task(
-            analyze_videos_task,
-            task_id,
-            request.videos,
-            request.analysis_type
-        )
+async def analyze_videos(request: AnalysisRequest, dedup_enabled: bool = Query(True, alias="dedup"),
+                         reuse_existing: Optional[bool] = None):
+    """
+    分析视频集合并生成Markdown文档
+    任务写入任务库后由 worker 执行，进度通过 /analyse/tasks/{task_id} 查询
+    dedup=false 时不合并重复视频，reuse_existing=false 时不复用知识库中已有的结果（默认见 ANALYSE_REUSE_EXISTING）
+    """
+    if not request.videos:
+        raise HTTPException(status_code=400, detail="视频列表不能为空")
 
-        # 初始化任务状态
-        analysis_tasks[task_id] = {
-            "status": "started",
-            "progress": "0/0",
-            "completed": 0,
-            "total": len(request.videos),
-            "results": []
-        }
+    # 生成任务ID
+    task_id = f"task_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
 
-        return AnalysisResponse(
-            status="started",
-            task_id=task_id,
-            message=f"开始分析 {len(request.videos)} 个视频",
-            results=None
-        )
+    await asyncio.to_thread(job_store.create, task_id, [video.dict() for video in request.videos],
+                            request.analysis_type, {"dedup": dedup_enabled, "reuse_existing": reuse_existing})
+    notify_new_job()
+
+    return AnalysisResponse(
+        status="started",
+        task_id=task_id,
+        message=f"开始分析 {len(request.videos)} 个视频",
+        results=None
+    )
+#主题聚合分析
+async def summarize_for_topic(video: VideoItem, use_cache: bool = True) -> Dict[str, Any]:
+    """主题聚合的 map 阶段：用摘要档位（便宜的模型）总结单个视频，不单独生成文档"""
+    subtitle = await extract_bilibili_subtitle(video.bvid)
+    if subtitle:
+        subtitle = await condense_subtitle(video, subtitle, "summary", use_cache)
+    prompt = prompts.build_prompt(video, subtitle, "summary")
+    summary = await call_tongyi_qianwen(prompt, video.dict(), "summary", use_cache)
+    return {"bvid": video.bvid, "title": video.title, "author": video.author, "summary": summary}
+
+
+@analyse.post("/topic")
+async def analyze_topic(request: TopicRequest, no_cache: bool = False,
+                        dedup_enabled: bool = Query(True, alias="dedup"), reuse_existing: Optional[bool] = None):
+    """
+    把多个视频合并成一份主题大纲：
+    视频去重 -> 并发生成各视频摘要 -> 知识点 MinHash 聚类去重 -> 一次汇总调用生成层级大纲，
+    大纲保存为Markdown文档，并以思维导图 JSON 返回
+    重复的视频不再生成摘要，知识库中已有摘要的视频直接使用已有摘要（dedup / reuse_existing 参数可关闭）
+    """
+    if not request.videos:
+        raise HTTPException(status_code=400, detail="视频列表不能为空")
+    use_cache = not no_cache
+    semaphore = asyncio.Semaphore(max(1, config.ANALYSE_CONCURRENCY))
+    report = await asyncio.to_thread(dedup.dedup_videos, [video.dict() for video in request.videos], "summary",
+                                     dedup=dedup_enabled, reuse_existing=reuse_existing)
+    reused = {entry["index"]: entry["knowledge_id"] for entry in report["reused"]}
+
+    async def summarize(index: int):
+        video = request.videos[index]
+        if index in reused:
+            item = await asyncio.to_thread(knowledge_store.get, reused[index])
+            if item is not None:
+                return {"bvid": video.bvid, "title": video.title, "author": video.author,
+                        "summary": item.markdown_content}
+        async with semaphore:
+            try:
+                return await summarize_for_topic(video, use_cache)
+            except Exception as e:
+                print(f"主题摘要失败 {video.bvid}: {e}")
+                return {"bvid": video.bvid, "error": str(e)}
+
+    with metrics.stage_seconds.time(stage="topic_map"):
+        results = await asyncio.gather(*(summarize(index) for index in sorted(report["unique"] + list(reused))))
+    summaries = [result for result in results if "summary" in result]
+    failed = [result for result in results if "summary" not in result]
+    if not summaries:
+        raise HTTPException(status_code=502, detail="所有视频摘要均失败")
+
+    points = topic_pipeline.merge_points(summaries)
+    prompt = topic_pipeline.build_reduce_prompt(request.topic, summaries, points, config.SUBTITLE_TOKEN_BUDGET)
+    with metrics.stage_seconds.time(stage="topic_reduce"):
+        outline_markdown = await call_tongyi_qianwen(prompt, {}, "topic", use_cache, model=prompts.TOPIC_MODEL)
+
+    topic_id = "topic-" + hashlib.sha1(request.topic.encode("utf-8")).hexdigest()[:10]
+    filename = new_markdown_filename(topic_id)
+    sources = "\n".join(f"- [{s['title']}](https://www.bilibili.com/video/{s['bvid']}) {s['bvid']}" for s in summaries)
+    content = f"{outline_markdown}\n\n---\n\n## 来源视频\n\n{sources}\n"
+    async with aiofiles.open(OUTPUT_DIR / filename, 'w', encoding='utf-8') as f:
+        await f.write(content)
+    await asyncio.to_thread(register_document, filename, request.topic, content)
+
+    mindmap = parse_outline(outline_markdown, title=request.topic)
+    return {
+        "topic": request.topic,
+        "topic_id": topic_id,
+        "markdown_file": filename,
+        "videos": len(request.videos),
+        "summarized": len(summaries),
+        "failed": failed,
+        "dedup": {"collapsed": report["collapsed"], "reused": report["reused"]},
+        "points": sum(point["merged"] for point in points),
+        "unique_points": len(points),
+        "nodes": count_nodes(mindmap),
+        "mindmap": mindmap
+    }
+#查询批量分析任务
+@analyse.get("/tasks/{task_id}")
+async def get_task_status(task_id: str):
+    """
+    查询批量分析任务的状态、进度和已完成视频的结果
+    """
+    job = await asyncio.to_thread(job_store.get, task_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
 #分析单个视频
 @analyse.post("/single",response_model=AnalysisResponse)
-async def analyze_single_video_endpoint(video: VideoItem, analysis_type: str = "summary"):
+async def analyze_single_video_endpoint(video: VideoItem, analysis_type: str = "summary", no_cache: bool = False):
     """
     分析单个视频（同步返回）
+    no_cache=true 时忽略已缓存的分析结果，重新调用大模型
+    上游失败时返回 502，上游限流或熔断中返回 503 并带 Retry-After（见 main 中的异常处理）
     """
-    result = await analyze_single_video(video, analysis_type)
+    try:
+        result = await run_video_analysis(video, analysis_type, use_cache=not no_cache)
+    except UpstreamError:
+        raise
+    except Exception as e:
+        result = analysis_error(video, e)
 
     return AnalysisResponse(
         status="completed",
         message="单个视频分析完成",
         results=[result]
     )
+#流式分析单个视频
+@analyse.post("/single/stream")
+async def analyze_single_video_stream(video: VideoItem, analysis_type: str = "summary", no_cache: bool = False):
+    """
+    分析单个视频，通过 Server-Sent Events 逐段返回大模型输出
+    事件：meta（开始）、多个 data（增量文本）、done（文档已保存）或 error
+    输出边生成边写入文件，结束后保存为完整的Markdown文档
+    """
+    async def event_stream():
+        yield _sse({"bvid": video.bvid, "title": video.title}, event="meta")
+
+        filename = new_markdown_filename(video.bvid)
+        filepath = OUTPUT_DIR / filename
+        partpath = filepath.with_suffix(".md.part")
+        header = render_markdown_header(video)
+        try:
+            subtitle = await extract_bilibili_subtitle(video.bvid)
+            if subtitle:
+                subtitle = await condense_subtitle(video, subtitle, analysis_type, use_cache=not no_cache)
+            model = prompts.get_route(analysis_type).model
+            prompt = prompts.build_prompt(video, subtitle, analysis_type)
+
+            # 输出边生成边写入 .part 文件，同时保留各段文本（大模型输出长度有上限），
+            # 结束后直接用于写缓存和登记文档，不再从文件读回
+            chunks = []
+            async with aiofiles.open(partpath, 'w', encoding='utf-8') as f:
+                await f.write(header)
+                async for text in stream_tongyi_qianwen(prompt, analysis_type, use_cache=not no_cache, model=model):
+                    await f.write(text)
+                    chunks.append(text)
+                    yield _sse({"text": text})
+                footer = render_markdown_footer(video)
+                await f.write(footer)
+            os.replace(partpath, filepath)
+
+            analysis_result = "".join(chunks)
+            if analysis_result:
+                await asyncio.to_thread(llm_cache.set, _cache_key(prompt, analysis_type, model), analysis_result)
+            await asyncio.to_thread(register_document, filename, video.title, header + analysis_result + footer)
+
+            yield _sse({
+                "bvid": video.bvid,
+                "markdown_file": filename,
+                "file_path": str(filepath),
+                "analysis_type": analysis_type,
+                "model": model
+            }, event="done")
+        except Exception as e:
+            if partpath.exists():
+                partpath.unlink()
+            yield _sse({"bvid": video.bvid, "error": str(e)}, event="error")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _sse(data: Dict, event: str = None) -> str:
+    """编码一条 SSE 消息"""
+    message = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    if event:
+        message = f"event: {event}\n" + message
+    return message
+#大模型缓存命中统计
+@analyse.get("/cache/stats")
+async def cache_stats():
+    """
+    查看大模型结果缓存的命中/未命中次数
+    """
+    return await asyncio.to_thread(llm_cache.stats)
 #获取markdown文档
+@analyse.get("/markdown/{bvid}")
 @analyse.post("/markdown/{bvid}")
-async def analyse_markdown(bvid: str):
+async def analyse_markdown(bvid: str, request: Request):
     """
        获取指定视频的Markdown文档
+       支持 If-None-Match，内容未变化时返回 304
        """
-    # 查找最新的Markdown文件
-    markdown_files = list(OUTPUT_DIR.glob(f"{bvid}_*.md"))
-    if not markdown_files:
+    # 从文档目录中查找最新的版本
+    latest = doc_catalog.latest(bvid)
+    if latest is None:
         raise HTTPException(status_code=404, detail="未找到对应的Markdown文档")
 
-    # 获取最新的文件
-    latest_file = max(markdown_files, key=os.path.getctime)
+    etag = f'"{latest["sha256"]}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
 
-    async with aiofiles.open(latest_file, 'r', encoding='utf-8') as f:
-        content = await f.read()
+    try:
+        async with aiofiles.open(OUTPUT_DIR / latest["filename"], 'r', encoding='utf-8') as f:
+            content = await f.read()
+    except FileNotFoundError:
+        # 文件已被外部删除，移除记录后查找上一个版本
+        doc_catalog.remove(latest["filename"])
+        return await analyse_markdown(bvid, request)
+
+    return JSONResponse(
+        {
+            "bvid": bvid,
+            "filename": latest["filename"],
+            "content": content,
+            "generated_at": datetime.fromtimestamp(latest["created_at"]).isoformat()
+        },
+        headers={"ETag": etag}
+    )
+#获取markdown文档的大纲（思维导图）
+@analyse.get("/markdown/{bvid}/outline")
+async def analyse_markdown_outline(
+    bvid: str,
+    request: Request,
+    node: str = "0",
+    depth: int = Query(2, ge=0, le=20)
+):
+    """
+    获取指定视频最新Markdown文档的大纲树，用于思维导图渲染
+    只返回 node 节点下 depth 层，更深的节点带有 "more"（子节点数），展开时以其 id 作为 node 再次请求
+    大纲按内容哈希缓存，每个文档只解析一次
+    """
+    latest = doc_catalog.latest(bvid)
+    if latest is None:
+        raise HTTPException(status_code=404, detail="未找到对应的Markdown文档")
 
-    return {
-        "bvid": bvid,
-        "filename": latest_file.name,
-        "content": content,
-        "generated_at": datetime.fromtimestamp(os.path.getctime(latest_file)).isoformat()
-    }
+    tree = outline_cache.lookup(latest["sha256"])
+    if tree is None:
+        try:
+            async with aiofiles.open(OUTPUT_DIR / latest["filename"], 'r', encoding='utf-8') as f:
+                content = await f.read()
+        except FileNotFoundError:
+            doc_catalog.remove(latest["filename"])
+            return await analyse_markdown_outline(bvid, request, node, depth)
+        tree = await asyncio.to_thread(outline_cache.build, content, None, latest["sha256"])
+
+    return outline_response(request, latest["sha256"], tree, node, depth,
+                            bvid=bvid, filename=latest["filename"])
 #获取整个markdown文档
 @analyse.get("/documents")
-async def list_all_documents():
+async def list_all_documents(
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    bvid: Optional[str] = None
+):
     """
-    列出所有已生成的Markdown文档
+    分页列出已生成的Markdown文档（按生成时间倒序）
     """
-    documents = []
-    for file in OUTPUT_DIR.glob("*.md"):
-        documents.append({
-            "filename": file.name,
-            "bvid": file.name.split('_')[0],
-            "size": file.stat().st_size,
-            "created_at": datetime.fromtimestamp(file.stat().st_ctime).isoformat()
-        })
-
-    return {"documents": documents}
+    try:
+        rows, next_cursor = doc_catalog.list(limit=limit, cursor=cursor, bvid=bvid)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+    documents = [
+        {
+            "filename": row["filename"],
+            "bvid": row["bvid"],
+            "size": row["size"],
+            "created_at": datetime.fromtimestamp(row["created_at"]).isoformat(),
+            "sha256": row["sha256"]
+        }
+        for row in rows
+    ]
+    # 当前页的 ETag 由各文档的哈希组合而成
+    page_hash = hashlib.sha256("|".join(d["sha256"] for d in documents).encode()).hexdigest()
+    etag = f'W/"{page_hash}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return JSONResponse(
+        {"documents": documents, "next_cursor": next_cursor},
+        headers={"ETag": etag}
+    )
 
 # 工具函数
 def generate_collect_button(bvid: str, title: str, author: str) -> str:
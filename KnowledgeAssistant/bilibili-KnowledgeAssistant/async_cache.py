@@ -0,0 +1,157 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+import db
+
+
+class SQLiteCacheBackend:
+    """可在多个进程间共享的缓存后端，值以 JSON 存储"""
+
+    def __init__(self, path, name: str):
+        self.path = path
+        self.table = f"cache_{name}"
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        if self._conn is None:
+            conn = db.connect(self.path)
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            row = self._db().execute(f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        return (json.loads(row["value"]), row["stored_at"]) if row else None
+
+    def set(self, key: str, value: Any, stored_at: float, max_age: float):
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False, default=str), stored_at),
+                )
+                conn.execute(f"DELETE FROM {self.table} WHERE stored_at < ?", (stored_at - max_age,))
+
+
+class AsyncTTLCache:
+    """
+    进程内 TTL + LRU 缓存，带三个特性：
+      single-flight           同一个键同时只有一个上游请求，其余请求等待同一个结果
+      stale-while-revalidate  过期但仍在 stale_ttl 内的结果先返回，同时在后台刷新
+      共享后端（可选）         本进程未命中时再查共享后端，写入时同时写两处
+    fetch 返回 None 表示没有结果，不会被缓存
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0, max_entries: int = 1000, backend=None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.backend = backend
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        # 未命中但与正在进行的请求合并的次数
+        self.coalesced = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._refreshing: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def _backend_key(key: Hashable) -> str:
+        return json.dumps(key, ensure_ascii=False, default=str)
+
+    def _lookup(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+        if self.backend is not None:
+            entry = self.backend.get(self._backend_key(key))
+            if entry is not None:
+                self._remember(key, *entry)
+        return entry
+
+    def _remember(self, key: Hashable, value: Any, stored_at: float):
+        self._entries[key] = (value, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._lookup(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age <= self.ttl:
+                self.hits += 1
+                return value
+            if age <= self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._refresh_in_background(key, fetch)
+                return value
+        self.misses += 1
+        return await self._fetch_once(key, fetch)
+
+    async def _fetch_once(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+            if value is not None:
+                stored_at = time.time()
+                self._remember(key, value, stored_at)
+                if self.backend is not None:
+                    self.backend.set(self._backend_key(key), value, stored_at, self.ttl + self.stale_ttl)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 标记异常已被读取，没有其他等待者时不会产生警告
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _refresh_in_background(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]):
+        if key in self._inflight:
+            return
+
+        async def refresh():
+            try:
+                await self._fetch_once(key, fetch)
+            except Exception as e:
+                print(f"后台刷新缓存失败 {key}: {e}")
+
+        task = asyncio.create_task(refresh())
+        self._refreshing.add(task)
+        task.add_done_callback(self._refreshing.discard)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round((self.hits + self.stale_hits) / total, 4) if total else 0.0,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+        }
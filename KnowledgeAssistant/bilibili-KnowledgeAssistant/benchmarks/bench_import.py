@@ -0,0 +1,106 @@
+"""
+启动（导入）耗时基准：在子进程中以 python -X importtime 导入应用，
+汇总本项目各模块与第三方包的导入耗时，用于发现拖慢冷启动的导入
+
+运行：python benchmarks/bench_import.py [--module main] [--runs 5] [--top 15] [--budget-ms 800]
+  --budget-ms  总导入耗时（各次运行的中位数）超过该值时以非 0 状态退出，可放在 CI 中防止回退
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# import time:  self [us] | cumulative | imported package
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def first_party_modules() -> set:
+    return {name[:-3] for name in os.listdir(ROOT) if name.endswith(".py")}
+
+
+def import_once(module: str) -> List[Tuple[str, int, int, int]]:
+    """在干净的子进程中导入 module，返回 [(模块名, 嵌套深度, 自身耗时us, 累计耗时us)]"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        # 使用临时数据目录，基准本身不会在项目目录中创建文件
+        env = dict(os.environ, DATA_DIR=data_dir, OUTPUT_DIR=os.path.join(data_dir, "markdowns"),
+                   PYTHONDONTWRITEBYTECODE="1")
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=ROOT, env=env, capture_output=True, text=True,
+        )
+    if result.returncode != 0:
+        sys.exit(f"导入 {module} 失败:\n{result.stderr[-2000:]}")
+    records = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            records.append((name, len(indent) // 2, int(self_us), int(cumulative_us)))
+    return records
+
+
+def summarize(records: List[Tuple[str, int, int, int]], module: str, ours: set) -> Dict:
+    total = next(cumulative for name, depth, _, cumulative in records if name == module and depth == 0)
+    project = {name: (self_us, cumulative) for name, _, self_us, cumulative in records if name in ours}
+    # 第三方包按顶层包名汇总自身耗时（累计耗时会与嵌套的包重复计算）
+    packages: Dict[str, int] = defaultdict(int)
+    for name, _, self_us, _ in records:
+        top = name.split(".")[0]
+        if top not in ours:
+            packages[top] += self_us
+    return {"total": total, "project": project, "packages": dict(packages)}
+
+
+def _ms(us: float) -> str:
+    return f"{us / 1000:8.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导入耗时基准")
+    parser.add_argument("--module", default="main", help="要导入的模块")
+    parser.add_argument("--runs", type=int, default=5, help="运行次数，结果取中位数")
+    parser.add_argument("--top", type=int, default=15, help="列出耗时最多的前几项")
+    parser.add_argument("--budget-ms", type=float, default=0, help="总耗时上限（毫秒），0 表示不检查")
+    args = parser.parse_args()
+
+    ours = first_party_modules()
+    # 先导入一次预热（生成字节码缓存、文件系统缓存），不计入结果
+    import_once(args.module)
+    runs = [summarize(import_once(args.module), args.module, ours) for _ in range(max(1, args.runs))]
+
+    def median(values):
+        return statistics.median(values) if values else 0
+
+    total = median([run["total"] for run in runs])
+    project = {
+        name: (median([run["project"][name][0] for run in runs if name in run["project"]]),
+               median([run["project"][name][1] for run in runs if name in run["project"]]))
+        for name in runs[0]["project"]
+    }
+    packages = {
+        name: median([run["packages"].get(name, 0) for run in runs])
+        for name in runs[0]["packages"]
+    }
+
+    print(f"import {args.module}: {_ms(total)}（{len(runs)} 次运行的中位数）\n")
+    print("本项目模块（累计 / 自身）：")
+    for name, (self_us, cumulative) in sorted(project.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"  {name:<20}{_ms(cumulative)}{_ms(self_us)}")
+    print("\n第三方包（自身耗时合计）：")
+    for name, self_us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<20}{_ms(self_us)}")
+
+    if args.budget_ms and total / 1000 > args.budget_ms:
+        print(f"\n导入耗时 {total / 1000:.1f} ms 超出预算 {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
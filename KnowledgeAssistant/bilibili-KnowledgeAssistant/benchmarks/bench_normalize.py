@@ -0,0 +1,111 @@
+"""
+搜索结果规范化的微基准：10k 条合成的B站搜索结果，对比
+基线版本 GET /search/{searchname} 接口中的转换循环（原样复制，中文键字典无法通过 SearchResponse 校验）
+与 normalize.normalize_results；另外给出两者加上 response_model=SearchResponse 校验后的完整耗时
+
+运行：python benchmarks/bench_normalize.py [条数]
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import ValidationError  # noqa: E402
+
+from models import SearchResponse  # noqa: E402
+from normalize import normalize_results  # noqa: E402
+
+
+def baseline_clean_html_tags(text):
+    """基线版本 videosearch.clean_html_tags"""
+    if not text:
+        return "N/A"
+    # 使用正则表达式移除<em>标签及其内容
+    clean_text = re.sub(r'<em[^>]*>.*?</em>', '', text)
+    clean_text = re.sub(r'<em[^>]* class>.*?</em>', '', text)
+    # 移除其他可能的HTML标签
+    clean_text = re.sub(r'<[^>]+>', '', clean_text)
+    # 清理多余的空格
+    clean_text = re.sub(r'\s+', ' ', clean_text).strip()
+    return clean_text
+
+
+def baseline_video_list(videos):
+    """基线版本 videosearch.videosearch 接口中构造 video_list 的循环"""
+    video_list = []
+    for video in videos:
+        clean_title = baseline_clean_html_tags(video.get('title', 'N/A'))
+        video_info = {
+            "标题": video.get('title', 'N/A'),
+            "UP主": video.get('author', 'N/A'),
+            "播放量": video.get('play', 'N/A'),
+            "弹幕数": video.get('danmaku', 'N/A'),
+            "发布时间": video.get('pubdate', 'N/A'),
+            "视频时长": video.get('duration', 'N/A'),
+            "视频链接": f"https://www.bilibili.com/video/{video.get('bvid', 'N/A')}",
+            "aid": video.get('aid', 'N/A'),
+            "bvid": video.get('bvid', 'N/A')
+        }
+        video_list.append(video_info)
+    return video_list
+
+
+def validate_response(video_list):
+    """FastAPI 按 response_model 校验接口返回值；基线的返回值在这一步校验失败（接口返回 500）"""
+    try:
+        SearchResponse.model_validate({"keyword": "k", "count": len(video_list), "videos": video_list})
+    except ValidationError:
+        pass
+
+
+def synthetic_results(n, seed=42):
+    rng = random.Random(seed)
+    words = ["Python", "机器学习", "教程", "入门", "实战", "深度学习", "Rust", "&amp;", "数据分析", "全套"]
+    results = []
+    for i in range(n):
+        title = " ".join(rng.choice(words) for _ in range(6))
+        title = title.replace("Python", '<em class="keyword">Python</em>')
+        minutes, seconds = rng.randint(0, 180), rng.randint(0, 59)
+        results.append({
+            "bvid": f"BV1{i:09d}",
+            "aid": 100000 + i,
+            "title": title,
+            "author": f"UP主{i % 97}",
+            "description": f"简介 {title} &lt;第{i}期&gt;",
+            "duration": f"{minutes}:{seconds}",
+            "play": rng.choice([rng.randint(0, 10 ** 7), "--"]),
+            "danmaku": rng.randint(0, 10 ** 5),
+            "pubdate": 1600000000 + i * 60,
+        })
+    return results
+
+
+def bench(cases, data, repeat=20):
+    """各实现交替运行 repeat 轮，取每个实现最快的一次，减少机器负载波动的影响"""
+    best = {label: float("inf") for label, _ in cases}
+    for _ in range(repeat):
+        for label, func in cases:
+            start = time.perf_counter()
+            func(data)
+            best[label] = min(best[label], time.perf_counter() - start)
+    for label, seconds in best.items():
+        print(f"{label:<40} {seconds * 1000:8.1f} ms  {seconds / len(data) * 1e6:6.2f} us/条")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    data = synthetic_results(n)
+    print(f"{n} 条合成搜索结果（交替运行 20 轮，各取最快的一次）")
+    bench([
+        ("基线: 接口内的转换循环", baseline_video_list),
+        ("新: normalize_results", normalize_results),
+        ("基线: 转换 + response_model 校验（失败）", lambda d: validate_response(baseline_video_list(d))),
+        ("新: normalize + response_model 校验", lambda d: validate_response(normalize_results(d))),
+    ], data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+端到端压测：对运行中的服务执行脚本化的负载场景，输出吞吐量和 p50/p95/p99 延迟
+
+场景：
+  search      GET  /search/{keyword}
+  single      POST /analyse/single（每次不同的视频，no_cache=true）
+  batch       POST /analyse/ 提交批量任务并轮询到完成，统计单个任务的完成时间
+  repository  GET  /repository/knowledge 逐页翻完整个知识库（先写入 --seed 条数据）
+
+用法：
+  # 自动启动本地模拟上游和服务（使用临时数据目录），跑完全部场景
+  python benchmarks/load.py --spawn
+  # 对已启动的服务压测某个场景
+  python benchmarks/load.py --base-url http://127.0.0.1:8000 --scenario search -n 500 -c 50
+
+--spawn 时额外的环境变量（如 TONGYI_QPS、ANALYSE_CONCURRENCY）会传给被启动的服务；
+模拟上游的延迟和错误率通过 --mock-args 传入，例如 --mock-args "--latency 0.1 --error-rate 0.02"
+"""
+import argparse
+import asyncio
+import math
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # 最近秩法
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Result:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.elapsed = 0.0
+
+    def report(self) -> str:
+        values = sorted(self.latencies)
+        total = len(values) + self.errors
+        throughput = total / self.elapsed if self.elapsed else 0.0
+        return (f"{self.name:<11} 请求 {total:>6}  失败 {self.errors:>5}  吞吐 {throughput:8.1f}/s  "
+                f"p50 {percentile(values, 50) * 1000:8.1f}ms  p95 {percentile(values, 95) * 1000:8.1f}ms  "
+                f"p99 {percentile(values, 99) * 1000:8.1f}ms")
+
+
+async def run_load(name: str, total: int, concurrency: int, call: Callable[[int], Awaitable[bool]]) -> Result:
+    """以固定并发执行 total 次 call(i)，call 返回是否成功"""
+    result = Result(name)
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                ok = await call(i)
+            except Exception:
+                ok = False
+            if ok:
+                result.latencies.append(time.perf_counter() - start)
+            else:
+                result.errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _video(i: int, run: str) -> Dict:
+    bvid = f"BV1load{run}{i:05d}"
+    return {"bvid": bvid, "title": f"压测视频 {run}-{i}", "description": f"第 {i} 个压测视频（{run}）",
+            "author": "bench", "duration": "10:00",
+            "url": f"https://www.bilibili.com/video/{bvid}", "avid": str(i)}
+
+
+async def scenario_search(client: httpx.AsyncClient, args) -> Result:
+    # 一半请求命中相同关键词（测缓存），一半是新关键词
+    async def call(i: int) -> bool:
+        keyword = f"python{i % 10}" if i % 2 else f"kw{uuid.uuid4().hex[:8]}"
+        response = await client.get(f"/search/{keyword}", params={"max_results": args.max_results})
+        return response.status_code == 200
+    return await run_load("search", args.requests, args.concurrency, call)
+
+
+async def scenario_single(client: httpx.AsyncClient, args) -> Result:
+    run = uuid.uuid4().hex[:4]
+
+    async def call(i: int) -> bool:
+        response = await client.post("/analyse/single", json=_video(i, run),
+                                     params={"analysis_type": args.analysis_type, "no_cache": True})
+        return response.status_code == 200 and response.json()["results"][0]["status"] == "success"
+    return await run_load("single", args.requests, args.concurrency, call)
+
+
+async def scenario_batch(client: httpx.AsyncClient, args) -> Result:
+    run = uuid.uuid4().hex[:4]
+    batches = max(1, args.requests // args.batch_size)
+
+    async def call(i: int) -> bool:
+        videos = [_video(i * args.batch_size + j, run) for j in range(args.batch_size)]
+        # 压测分析吞吐量：关闭去重和知识库复用，每个视频都实际分析
+        response = await client.post("/analyse/", json={"videos": videos, "analysis_type": args.analysis_type},
+                                     params={"dedup": "false", "reuse_existing": "false"})
+        if response.status_code != 200:
+            return False
+        task_id = response.json()["task_id"]
+        while True:
+            await asyncio.sleep(0.2)
+            job = (await client.get(f"/analyse/tasks/{task_id}")).json()
+            if job["status"] in ("completed", "failed"):
+                return job["status"] == "completed"
+    return await run_load("batch", batches, args.concurrency, call)
+
+
+async def scenario_repository(client: httpx.AsyncClient, args) -> Result:
+    # 写入测试数据
+    async def save(i: int) -> bool:
+        response = await client.post("/repository/knowledge/save", params={
+            "bvid": f"BV1repo{i:06d}", "title": f"知识点 {i}", "author": "bench", "analysis_type": "summary",
+            "markdown_content": f"# 知识点 {i}\n\n" + "内容 " * 200,
+        })
+        return response.status_code == 200
+    seeded = await run_load("seed", args.seed, args.concurrency, save)
+    print(seeded.report())
+
+    # 每次请求翻完整个知识库的一页
+    async def call(i: int) -> bool:
+        cursor = None
+        for _ in range(i % 5 + 1):
+            params = {"limit": 50}
+            if cursor:
+                params["cursor"] = cursor
+            response = await client.get("/repository/knowledge", params=params)
+            if response.status_code != 200:
+                return False
+            cursor = response.headers.get("x-next-cursor")
+            if not cursor:
+                break
+        return True
+    return await run_load("repository", args.requests, args.concurrency, call)
+
+
+SCENARIOS = {
+    "search": scenario_search,
+    "single": scenario_single,
+    "batch": scenario_batch,
+    "repository": scenario_repository,
+}
+
+
+async def _wait_ready(url: str, timeout: float = 30):
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.time() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"服务未能在 {timeout} 秒内启动: {url}")
+
+
+def spawn(args) -> List[subprocess.Popen]:
+    """启动模拟上游和服务，数据写入临时目录"""
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    data_dir = tempfile.mkdtemp(prefix="ka-bench-")
+    env = {
+        **os.environ,
+        "BILIBILI_API_BASE": mock_url,
+        "DASHSCOPE_API_BASE": mock_url,
+        "DATA_DIR": data_dir,
+        "OUTPUT_DIR": os.path.join(data_dir, "markdowns"),
+        "TONGYI_API_KEY": os.environ.get("TONGYI_API_KEY", "bench"),
+    }
+    mock = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "mock_upstreams.py"), "--port", str(args.mock_port)]
+        + shlex.split(args.mock_args)
+    )
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.app_port), "--log-level", "warning"],
+        cwd=APP_DIR, env=env,
+    )
+    print(f"数据目录: {data_dir}")
+    return [mock, app]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="端到端压测")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenario", choices=list(SCENARIOS) + ["all"], default="all")
+    parser.add_argument("-n", "--requests", type=int, default=200)
+    parser.add_argument("-c", "--concurrency", type=int, default=20)
+    parser.add_argument("--max-results", type=int, default=20)
+    parser.add_argument("--analysis-type", default="summary")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=500, help="repository 场景预先写入的条数")
+    parser.add_argument("--spawn", action="store_true", help="自动启动模拟上游和服务")
+    parser.add_argument("--mock-port", type=int, default=9100)
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--mock-args", default="", help="传给 mock_upstreams.py 的参数")
+    args = parser.parse_args()
+
+    processes = []
+    if args.spawn:
+        processes = spawn(args)
+        args.base_url = f"http://127.0.0.1:{args.app_port}"
+        await _wait_ready(f"http://127.0.0.1:{args.mock_port}/mock/stats")
+        await _wait_ready(f"{args.base_url}/metrics")
+
+    try:
+        names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=300, limits=limits) as client:
+            for name in names:
+                result = await SCENARIOS[name](client, args)
+                print(result.report())
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,183 @@
+"""
+本地模拟的B站与 DashScope 接口，供离线压测使用：
+  GET  /x/web-interface/search/type                         关键词搜索
+  GET  /x/web-interface/view                                视频信息（cid）
+  GET  /x/player/v2                                         字幕列表
+  GET  /subtitles/{bvid}.json                               字幕内容
+  POST /api/v1/services/aigc/text-generation/generation     文本生成（支持 SSE 流式）
+
+运行：python benchmarks/mock_upstreams.py --port 9100 --latency 0.05 --error-rate 0.01
+然后让服务指向它：
+  BILIBILI_API_BASE=http://127.0.0.1:9100 DASHSCOPE_API_BASE=http://127.0.0.1:9100 python main.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import zlib
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class MockSettings:
+    # 每个请求的基础延迟（秒），实际延迟在 [latency/2, latency*1.5] 之间均匀分布
+    latency = 0.05
+    # 大模型请求的额外延迟，模拟首个 token 之前的等待
+    llm_latency = 0.5
+    # 返回 503 的比例
+    error_rate = 0.0
+    # 触发限流的比例：B站接口返回 code=-412（风控），DashScope 返回 429
+    throttle_rate = 0.0
+    # 流式输出的分片数和分片间隔（秒）
+    stream_chunks = 20
+    chunk_delay = 0.02
+    # 每个视频的字幕行数；0 表示视频没有字幕
+    subtitle_lines = 200
+    # 搜索结果总数（超出后返回空页）
+    search_total = 1000
+
+
+settings = MockSettings()
+app = FastAPI()
+
+
+async def _delay(base: float):
+    if base > 0:
+        await asyncio.sleep(random.uniform(base / 2, base * 1.5))
+
+
+def _should_fail() -> bool:
+    return random.random() < settings.error_rate
+
+
+def _throttled() -> bool:
+    return random.random() < settings.throttle_rate
+
+
+_RISK_CONTROL = {"code": -412, "message": "请求被拦截"}
+
+
+def _bvid(n: int) -> str:
+    return f"BV1mock{n:06d}"
+
+
+@app.get("/x/web-interface/search/type")
+async def search(keyword: str, page: int = 1, page_size: int = 20, order: str = "totalrank"):
+    await _delay(settings.latency)
+    if _should_fail():
+        return Response(status_code=503)
+    if _throttled():
+        return _RISK_CONTROL
+    start = (page - 1) * page_size
+    end = min(start + page_size, settings.search_total)
+    seed = zlib.crc32(keyword.encode("utf-8"))
+    results = [{
+        "bvid": _bvid((seed + n) % 1000000),
+        "aid": 100000 + n,
+        "title": f'{keyword}<em class="keyword">教程</em> 第{n}集 &amp; 实战',
+        "author": f"UP主{n % 50}",
+        "description": f"{keyword} 相关视频 {n}",
+        "duration": f"{n % 90}:{n % 60}",
+        "play": n * 37,
+        "danmaku": n % 500,
+        "pubdate": 1700000000 + n * 3600,
+    } for n in range(start, end)]
+    return {"code": 0, "message": "0", "data": {"page": page, "numResults": settings.search_total, "result": results}}
+
+
+@app.get("/x/web-interface/view")
+async def view(bvid: str):
+    await _delay(settings.latency)
+    if _should_fail():
+        return Response(status_code=503)
+    if _throttled():
+        return _RISK_CONTROL
+    return {"code": 0, "data": {"bvid": bvid, "cid": zlib.crc32(bvid.encode("utf-8"))}}
+
+
+@app.get("/x/player/v2")
+async def player(request: Request, bvid: str, cid: int):
+    await _delay(settings.latency)
+    if _should_fail():
+        return Response(status_code=503)
+    if _throttled():
+        return _RISK_CONTROL
+    subtitles = []
+    if settings.subtitle_lines:
+        subtitles.append({"lan": "zh-CN", "subtitle_url": str(request.base_url) + f"subtitles/{bvid}.json"})
+    return {"code": 0, "data": {"subtitle": {"subtitles": subtitles}}}
+
+
+@app.get("/subtitles/{bvid}.json")
+async def subtitle_body(bvid: str):
+    await _delay(settings.latency)
+    body = [{"from": i * 4.0, "to": i * 4.0 + 3.5, "content": f"{bvid} 第{i}句：介绍一个知识点并给出例子"}
+            for i in range(settings.subtitle_lines)]
+    return {"body": body}
+
+
+def _usage(prompt: str, output: str):
+    return {"input_tokens": len(prompt) // 2, "output_tokens": len(output) // 2}
+
+
+@app.post("/api/v1/services/aigc/text-generation/generation")
+async def generation(request: Request):
+    payload = await request.json()
+    prompt = payload["input"]["messages"][-1]["content"]
+    await _delay(settings.llm_latency)
+    if _should_fail():
+        return JSONResponse(status_code=503, content={"code": "ServiceUnavailable", "message": "mock error"})
+    if _throttled():
+        return JSONResponse(status_code=429, headers={"Retry-After": "1"},
+                            content={"code": "Throttling.RateQuota", "message": "mock throttling"})
+
+    pieces = [f"\n## 第{i + 1}节\n- 模拟的分析内容，模型 {payload['model']}" for i in range(settings.stream_chunks)]
+    if request.headers.get("x-dashscope-sse") != "enable":
+        await asyncio.sleep(settings.chunk_delay * settings.stream_chunks)
+        text = "".join(pieces)
+        return {"output": {"text": text, "finish_reason": "stop"}, "usage": _usage(prompt, text)}
+
+    async def events():
+        produced = ""
+        for i, piece in enumerate(pieces):
+            await asyncio.sleep(settings.chunk_delay)
+            produced += piece
+            data = {"output": {"text": piece, "finish_reason": "stop" if i == len(pieces) - 1 else "null"},
+                    "usage": _usage(prompt, produced)}
+            yield f"id:{i + 1}\nevent:result\n:HTTP_STATUS/200\ndata:{json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/mock/stats")
+async def stats():
+    return {"uptime": time.time() - _started, **{k: getattr(settings, k) for k in vars(MockSettings) if not k.startswith("_")}}
+
+
+_started = time.time()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟的B站与 DashScope 接口")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=settings.latency)
+    parser.add_argument("--llm-latency", type=float, default=settings.llm_latency)
+    parser.add_argument("--error-rate", type=float, default=settings.error_rate)
+    parser.add_argument("--throttle-rate", type=float, default=settings.throttle_rate)
+    parser.add_argument("--stream-chunks", type=int, default=settings.stream_chunks)
+    parser.add_argument("--chunk-delay", type=float, default=settings.chunk_delay)
+    parser.add_argument("--subtitle-lines", type=int, default=settings.subtitle_lines)
+    parser.add_argument("--search-total", type=int, default=settings.search_total)
+    args = parser.parse_args()
+    for name in ("latency", "llm_latency", "error_rate", "throttle_rate", "stream_chunks", "chunk_delay",
+                 "subtitle_lines", "search_total"):
+        setattr(settings, name, getattr(args, name))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
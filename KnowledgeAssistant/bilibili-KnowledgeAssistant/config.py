@@ -0,0 +1,140 @@
+import os
+from pathlib import Path
+
+# 运行配置，均可通过环境变量覆盖
+
+# 通义千问（DashScope）API Key
+TONGYI_API_KEY = os.getenv("TONGYI_API_KEY", "your_tongyi_api_key_here")
+
+# 请求B站接口时携带的 Cookie。默认只有匿名的设备标识 buvid3（没有它时搜索接口容易被风控）；
+# 需要登录态时（如部分视频的字幕）设置为自己账号的 Cookie，其中的 SESSDATA、bili_jct 等不要提交到代码库
+BILIBILI_COOKIE = os.getenv("BILIBILI_COOKIE", "buvid3=7C5A5C0D-D9C5-F8D6-4C22-1339CF94A5DB98314infoc")
+
+# 部署：监听地址、端口与 API 进程数。WORKERS>1 时各进程通过 SQLite 共享状态，上游限流配额按进程数均分
+HOST = os.getenv("HOST", "127.0.0.1")
+PORT = int(os.getenv("PORT", "8000"))
+WORKERS = max(1, int(os.getenv("WORKERS", os.getenv("WEB_CONCURRENCY", "1"))))
+# 关闭：收到 SIGTERM 后 /healthz 立即返回 503、分析 worker 停止领取新任务，但继续正常服务 SHUTDOWN_PRESTOP_SECONDS 秒，
+# 让负载均衡先摘除实例；之后停止接受新连接，进行中的请求和分析任务共用 SHUTDOWN_GRACE_SECONDS 秒的等待时间。
+# 从收到 SIGTERM 到进程退出最多 SHUTDOWN_PRESTOP_SECONDS + SHUTDOWN_GRACE_SECONDS 秒，编排系统的终止宽限期应大于该值
+SHUTDOWN_PRESTOP_SECONDS = float(os.getenv("SHUTDOWN_PRESTOP_SECONDS", "5"))
+SHUTDOWN_GRACE_SECONDS = float(os.getenv("SHUTDOWN_GRACE_SECONDS", "30"))
+# 该文件存在时 /healthz 返回 503（用于 preStop 钩子或人工摘流，服务本身照常运行）；为空表示不检查
+DRAIN_FILE = os.getenv("DRAIN_FILE", "")
+
+# 批量分析时同时进行的视频数
+ANALYSE_CONCURRENCY = int(os.getenv("ANALYSE_CONCURRENCY", "4"))
+
+# 各上游每秒允许的请求数（QPS，所有 API 进程合计），<=0 表示不限流
+TONGYI_QPS = float(os.getenv("TONGYI_QPS", "2"))
+BILIBILI_QPS = float(os.getenv("BILIBILI_QPS", "5"))
+
+# HTTP 连接池与超时（秒）
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1"
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+BILIBILI_TIMEOUT = float(os.getenv("BILIBILI_TIMEOUT", "10"))
+TONGYI_TIMEOUT = float(os.getenv("TONGYI_TIMEOUT", "60"))
+# 失败重试次数，以及指数退避的基础间隔与上限（秒，实际等待时间在 0 到该值之间随机）
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "10"))
+# 自适应限流：上游返回 412/429 时请求速率减半（最低降到配置 QPS 的 RATE_MIN_FACTOR 倍），之后随成功请求逐步恢复
+RATE_MIN_FACTOR = float(os.getenv("RATE_MIN_FACTOR", "0.1"))
+# 熔断：上游连续失败 CIRCUIT_FAILURES 次后，CIRCUIT_RESET_SECONDS 秒内的请求直接失败（<=0 关闭熔断）
+CIRCUIT_FAILURES = int(os.getenv("CIRCUIT_FAILURES", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+# 本地数据目录（SQLite 数据库、缓存等）
+DATA_DIR = Path(os.getenv("DATA_DIR", "./output"))
+
+# 大模型结果缓存：有效期（秒）与最大条目数
+LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", str(DATA_DIR / "llm_cache.db")))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+# 字幕缓存目录；字幕超过 SUBTITLE_TOKEN_BUDGET 时按 SUBTITLE_CHUNK_TOKENS 分段并行摘要
+SUBTITLE_CACHE_DIR = Path(os.getenv("SUBTITLE_CACHE_DIR", str(DATA_DIR / "subtitles")))
+SUBTITLE_TOKEN_BUDGET = int(os.getenv("SUBTITLE_TOKEN_BUDGET", "6000"))
+SUBTITLE_CHUNK_TOKENS = int(os.getenv("SUBTITLE_CHUNK_TOKENS", "3000"))
+SUBTITLE_MAP_CONCURRENCY = int(os.getenv("SUBTITLE_MAP_CONCURRENCY", "4"))
+
+# bvid -> cid（第一个分P）的映射不会变化，长期保存在 SQLite 中（多进程共享），重复分析同一视频时不再请求 view 接口
+CID_CACHE_TTL = int(os.getenv("CID_CACHE_TTL", str(30 * 24 * 3600)))
+CID_CACHE_PATH = Path(os.getenv("CID_CACHE_PATH", str(DATA_DIR / "cid_cache.db")))
+
+# 知识库存储后端（目前支持 sqlite）与数据库路径
+KNOWLEDGE_STORE = os.getenv("KNOWLEDGE_STORE", "sqlite")
+KNOWLEDGE_DB_PATH = Path(os.getenv("KNOWLEDGE_DB_PATH", str(DATA_DIR / "knowledge.db")))
+
+# 全文检索索引（SQLite FTS5）
+SEARCH_INDEX_PATH = Path(os.getenv("SEARCH_INDEX_PATH", str(DATA_DIR / "search_index.db")))
+
+# 语义检索：向量索引目录与向量化方式（hashing 本地特征哈希 / sentence-transformers 本地模型 / dashscope）
+VECTOR_INDEX_DIR = Path(os.getenv("VECTOR_INDEX_DIR", str(DATA_DIR / "vectors")))
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "hashing")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "")
+EMBEDDING_CHUNK_CHARS = int(os.getenv("EMBEDDING_CHUNK_CHARS", "500"))
+
+# 生成的Markdown文档目录，以及记录文档版本的目录索引
+OUTPUT_DIR = Path(os.getenv("OUTPUT_DIR", "./output/markdowns"))
+DOCUMENT_CATALOG_PATH = Path(os.getenv("DOCUMENT_CATALOG_PATH", str(DATA_DIR / "documents.db")))
+
+# 批量分析任务队列：任务库路径、是否在 API 进程内运行 worker、每个 worker 同时处理的任务数、
+# 任务租约时长（worker 异常退出后，租约过期的任务会被其他 worker 接手）与轮询间隔（秒）
+JOB_DB_PATH = Path(os.getenv("JOB_DB_PATH", str(DATA_DIR / "jobs.db")))
+INPROCESS_WORKER = os.getenv("INPROCESS_WORKER", "1") == "1"
+WORKER_JOBS = int(os.getenv("WORKER_JOBS", "2"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+
+# B站搜索结果缓存：新鲜期、过期后仍可先返回旧结果并后台刷新的时长（秒）、最大条目数，
+# 以及可选的共享后端（memory 仅进程内 / sqlite 多个 worker 进程共享）
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "300"))
+SEARCH_CACHE_STALE_TTL = int(os.getenv("SEARCH_CACHE_STALE_TTL", "1800"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000"))
+SEARCH_CACHE_BACKEND = os.getenv("SEARCH_CACHE_BACKEND", "sqlite" if WORKERS > 1 else "memory")
+SEARCH_CACHE_PATH = Path(os.getenv("SEARCH_CACHE_PATH", str(DATA_DIR / "search_cache.db")))
+
+# 多页搜索：每页条数（B站上限 50）与同时请求的页数
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "50"))
+SEARCH_PAGE_CONCURRENCY = int(os.getenv("SEARCH_PAGE_CONCURRENCY", "4"))
+
+# 视频下载：保存目录、读写块大小、单个文件的分段大小与并行段数、同时下载的视频数
+DOWNLOAD_DIR = Path(os.getenv("DOWNLOAD_DIR", str(DATA_DIR / "videos")))
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))
+DOWNLOAD_SEGMENT_SIZE = int(os.getenv("DOWNLOAD_SEGMENT_SIZE", str(16 * 1024 * 1024)))
+DOWNLOAD_SEGMENTS = int(os.getenv("DOWNLOAD_SEGMENTS", "4"))
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "2"))
+
+# 导出：后台导出文件目录与保留时间，超过 EXPORT_BACKGROUND_ROWS 行的导出在后台生成
+EXPORT_DIR = Path(os.getenv("EXPORT_DIR", str(DATA_DIR / "exports")))
+EXPORT_TTL = int(os.getenv("EXPORT_TTL", str(24 * 3600)))
+EXPORT_BACKGROUND_ROWS = int(os.getenv("EXPORT_BACKGROUND_ROWS", "5000"))
+
+# 模型路由：按 analysis_type 选择通义千问模型，未配置的类型使用 TONGYI_DEFAULT_MODEL
+# chunk 为长字幕分段摘要（map 阶段）使用的模型
+TONGYI_DEFAULT_MODEL = os.getenv("TONGYI_DEFAULT_MODEL", "qwen-max")
+TONGYI_MODEL_ROUTES = os.getenv(
+    "TONGYI_MODEL_ROUTES", "summary=qwen-turbo,chunk=qwen-turbo,detailed=qwen-max,educational=qwen-max"
+)
+
+# 是否记录每个 HTTP 接口的耗时（/metrics 中的 ka_http_request_seconds）
+METRICS_MIDDLEWARE = os.getenv("METRICS_MIDDLEWARE", "1") == "1"
+
+# 上游地址，可指向本地模拟服务（benchmarks/mock_upstreams.py）做离线压测
+BILIBILI_API_BASE = os.getenv("BILIBILI_API_BASE", "https://api.bilibili.com").rstrip("/")
+DASHSCOPE_API_BASE = os.getenv("DASHSCOPE_API_BASE", "https://dashscope.aliyuncs.com").rstrip("/")
+
+# 分析前去重：同一UP主的视频标题+简介 MinHash 相似度不低于 DEDUP_THRESHOLD 时只分析一个（设为 1 关闭近似去重），
+# 不同UP主的视频还要求相似度不低于 DEDUP_CROSS_AUTHOR_THRESHOLD 且时长相差不超过 DEDUP_DURATION_TOLERANCE 秒；
+# ANALYSE_REUSE_EXISTING=1 时知识库中已有同类型结果的视频不再分析（请求中可用 dedup / reuse_existing 参数关闭）
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.7"))
+DEDUP_CROSS_AUTHOR_THRESHOLD = float(os.getenv("DEDUP_CROSS_AUTHOR_THRESHOLD", "0.9"))
+DEDUP_DURATION_TOLERANCE = int(os.getenv("DEDUP_DURATION_TOLERANCE", "2"))
+ANALYSE_REUSE_EXISTING = os.getenv("ANALYSE_REUSE_EXISTING", "1") == "1"
+
+# 文档大纲缓存目录：每个文档解析一次，按内容哈希存为 JSON；内存中保留最近使用的大纲数
+OUTLINE_CACHE_DIR = Path(os.getenv("OUTLINE_CACHE_DIR", str(OUTPUT_DIR / ".outlines")))
+OUTLINE_MEMORY_ENTRIES = int(os.getenv("OUTLINE_MEMORY_ENTRIES", "64"))
@@ -0,0 +1,15 @@
+import sqlite3
+from pathlib import Path
+
+
+def connect(path) -> sqlite3.Connection:
+    """
+    打开 SQLite 连接：WAL 模式，多进程可同时读写；
+    连接可跨线程使用，调用方需自行加锁
+    """
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
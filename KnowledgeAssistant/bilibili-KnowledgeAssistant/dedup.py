@@ -0,0 +1,158 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+import config
+import minhash
+from knowledge_store import knowledge_store
+from normalize import clean_html_tags, parse_duration
+
+# 分析前的视频去重，依次：
+#   1. 同一批中 bvid / avid 相同的视频只保留第一个
+#   2. 标题+简介 MinHash 相似的视频（搬运、重复投稿）只保留第一个：
+#      同一UP主的视频相似度不低于 DEDUP_THRESHOLD 即算重复，不同UP主的视频还要求
+#      相似度不低于 DEDUP_CROSS_AUTHOR_THRESHOLD 且时长一致；集数、分P编号不同的标题永远不合并
+#   3. 知识库中已有同类型分析结果的视频直接复用，不再调用大模型
+
+# 标题中的编号：阿拉伯数字、“第十二集”之类的中文集数、“（上）”“下篇”
+_NUMBERS = re.compile(
+    r"\d+"
+    r"|第\s*[零〇一二两三四五六七八九十百千]+\s*[集期话讲课章节部季篇回]"
+    r"|[(（\[【]\s*[上中下]\s*[)）\]】]"
+    r"|[上中下](?:篇|集|部)"
+)
+_SPACE = re.compile(r"\s+")
+
+
+def _text(video: Dict) -> str:
+    return f"{clean_html_tags(video.get('title'))} {clean_html_tags(video.get('description'))}"
+
+
+def title_numbers(title: Optional[str]) -> Tuple[str, ...]:
+    """标题中的集数、分P等编号（数字去掉前导 0）"""
+    numbers = []
+    for match in _NUMBERS.findall(clean_html_tags(title)):
+        numbers.append((match.lstrip("0") or "0") if match.isdigit() else _SPACE.sub("", match))
+    return tuple(numbers)
+
+
+def _duration(video: Dict) -> Optional[int]:
+    seconds = video.get("duration_seconds")
+    return seconds if seconds is not None else parse_duration(video.get("duration"))
+
+
+def is_duplicate(video: Dict, other: Dict, score: float, threshold: float) -> bool:
+    """MinHash 相似度为 score 的两个视频是否重复：再按标题编号、作者和时长确认"""
+    if title_numbers(video.get("title")) != title_numbers(other.get("title")):
+        return False
+    author = (video.get("author") or "").strip()
+    if author and author == (other.get("author") or "").strip():
+        return score >= threshold
+    if score < max(threshold, config.DEDUP_CROSS_AUTHOR_THRESHOLD):
+        return False
+    duration, other_duration = _duration(video), _duration(other)
+    return (duration is not None and other_duration is not None
+            and abs(duration - other_duration) <= config.DEDUP_DURATION_TOLERANCE)
+
+
+def _similar(videos: List[Dict], candidates: List[int], threshold: float) -> Dict[int, int]:
+    """
+    返回 被合并的下标 -> 保留的下标；每个视频只与已保留的视频比较（LSH 中只放保留的视频），
+    不做传递合并，A≈B、B≈C 时不会把并不重复的 A 和 C 归为一组
+    """
+    hasher = minhash.MinHasher()
+    lsh = minhash.MinHashLSH(hasher.num_perm)
+    empty = (minhash._MAX_HASH,) * hasher.num_perm
+    signatures: Dict[int, Tuple[int, ...]] = {}
+    merged: Dict[int, int] = {}
+
+    for index in candidates:
+        signature = hasher.signature(_text(videos[index]))
+        # 空文本不与任何视频合并
+        if signature == empty:
+            continue
+        for other in sorted(lsh.query(signature)):
+            if is_duplicate(videos[index], videos[other], minhash.similarity(signature, signatures[other]), threshold):
+                merged[index] = other
+                break
+        else:
+            signatures[index] = signature
+            lsh.insert(index, signature)
+    return merged
+
+
+def dedup_videos(videos: List[Dict], analysis_type: Optional[str] = None, threshold: Optional[float] = None,
+                 dedup: bool = True, reuse_existing: Optional[bool] = None) -> Dict:
+    """
+    videos 为视频字典列表，dedup=False 时不合并重复视频，reuse_existing=False 时不复用知识库中的结果；
+    返回：
+      unique     需要分析的视频在 videos 中的下标
+      collapsed  被合并的视频：{"index", "bvid", "duplicate_of", "reason"}
+      reused     知识库中已有结果的视频：{"index", "bvid", "knowledge_id"}
+    """
+    threshold = config.DEDUP_THRESHOLD if threshold is None else threshold
+    reuse_existing = config.ANALYSE_REUSE_EXISTING if reuse_existing is None else reuse_existing
+    collapsed = []
+    candidates = []
+    seen_bvid: Dict[str, str] = {}
+    seen_avid: Dict[str, str] = {}
+
+    for index, video in enumerate(videos):
+        bvid = video.get("bvid")
+        avid = str(video.get("avid") or "")
+        if dedup and bvid in seen_bvid:
+            collapsed.append({"index": index, "bvid": bvid, "duplicate_of": seen_bvid[bvid], "reason": "same_bvid"})
+            continue
+        if dedup and avid and avid in seen_avid:
+            collapsed.append({"index": index, "bvid": bvid, "duplicate_of": seen_avid[avid], "reason": "same_avid"})
+            continue
+        seen_bvid[bvid] = bvid
+        if avid:
+            seen_avid[avid] = bvid
+        candidates.append(index)
+
+    unique = candidates
+    if dedup and threshold < 1:
+        merged = _similar(videos, candidates, threshold)
+        unique = [index for index in candidates if index not in merged]
+        for index, keep in merged.items():
+            collapsed.append({"index": index, "bvid": videos[index].get("bvid"),
+                              "duplicate_of": videos[keep].get("bvid"), "reason": "similar_title"})
+
+    reused = []
+    if reuse_existing and unique:
+        existing = knowledge_store.find_by_bvids((videos[i].get("bvid") for i in unique), analysis_type)
+        remaining = []
+        for index in unique:
+            item = existing.get(videos[index].get("bvid"))
+            if item is None:
+                remaining.append(index)
+            else:
+                reused.append({"index": index, "bvid": item.bvid, "knowledge_id": item.id})
+        unique = remaining
+
+    collapsed.sort(key=lambda entry: entry["index"])
+    return {"unique": sorted(unique), "collapsed": collapsed, "reused": reused}
+
+
+def collapsed_result(video: Dict, entry: Dict) -> Dict:
+    """被合并视频在任务结果中的记录"""
+    return {
+        "bvid": video.get("bvid"),
+        "title": video.get("title"),
+        "status": "duplicate",
+        "duplicate_of": entry["duplicate_of"],
+        "reason": entry["reason"],
+    }
+
+
+def reused_result(video: Dict, entry: Dict, analysis_type: str, document: Dict) -> Dict:
+    """复用知识库已有结果的视频在任务结果中的记录，document 为已有结果对应的Markdown文档"""
+    return {
+        "bvid": video.get("bvid"),
+        "title": video.get("title"),
+        "status": "reused",
+        "knowledge_id": entry["knowledge_id"],
+        "markdown_file": document["filename"],
+        "file_path": str(config.OUTPUT_DIR / document["filename"]),
+        "analysis_type": analysis_type,
+    }
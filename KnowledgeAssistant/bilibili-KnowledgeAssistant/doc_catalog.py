@@ -0,0 +1,155 @@
+import base64
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import config
+import db
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _encode_cursor(created_at: float, filename: str) -> str:
+    return base64.urlsafe_b64encode(f"{created_at!r}|{filename}".encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, str]:
+    created_at, filename = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+    return float(created_at), filename
+
+
+class DocumentCatalog:
+    """
+    已生成Markdown文档的目录：bvid -> 各个版本（文件名、大小、生成时间、内容哈希），
+    写文档时登记，启动时与输出目录对账，接口查询不再扫描文件系统
+    """
+
+    def __init__(self, path, output_dir):
+        self.path = path
+        self.output_dir = Path(output_dir)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        if self._conn is None:
+            conn = db.connect(self.path)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "filename TEXT PRIMARY KEY, bvid TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, sha256 TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_bvid ON documents(bvid, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_created ON documents(created_at, filename)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _to_dict(row) -> Dict:
+        return {
+            "filename": row["filename"],
+            "bvid": row["bvid"],
+            "size": row["size"],
+            "created_at": row["created_at"],
+            "sha256": row["sha256"],
+        }
+
+    def register(self, filename: str, content: str, created_at: Optional[float] = None):
+        """登记一个新写入的文档"""
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO documents (filename, bvid, size, created_at, sha256) VALUES (?, ?, ?, ?, ?)",
+                    (filename, filename.split("_")[0], len(content.encode("utf-8")),
+                     created_at if created_at is not None else time.time(), content_hash(content)),
+                )
+
+    def remove(self, filename: str):
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.execute("DELETE FROM documents WHERE filename = ?", (filename,))
+
+    def latest(self, bvid: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT * FROM documents WHERE bvid = ? ORDER BY created_at DESC, filename DESC LIMIT 1", (bvid,)
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def find(self, bvid: str, sha256: str) -> Optional[Dict]:
+        """内容哈希为 sha256 的最新文档"""
+        with self._lock:
+            row = self._db().execute(
+                "SELECT * FROM documents WHERE bvid = ? AND sha256 = ? ORDER BY created_at DESC, filename DESC LIMIT 1",
+                (bvid, sha256),
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def versions(self, bvid: str) -> List[Dict]:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT * FROM documents WHERE bvid = ? ORDER BY created_at DESC, filename DESC", (bvid,)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def list(self, limit: int = 50, cursor: Optional[str] = None,
+             bvid: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """按生成时间倒序分页，返回 (当前页, 下一页游标)"""
+        conditions = []
+        params = []
+        if bvid:
+            conditions.append("bvid = ?")
+            params.append(bvid)
+        if cursor:
+            conditions.append("(created_at, filename) < (?, ?)")
+            params.extend(_decode_cursor(cursor))
+        sql = "SELECT * FROM documents"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY created_at DESC, filename DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._db().execute(sql, params).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["filename"])
+        return [self._to_dict(row) for row in rows], next_cursor
+
+    def reconcile(self) -> Dict[str, int]:
+        """
+        与输出目录对账：登记目录中新增的文件（计算哈希），删除文件已不存在的记录
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        on_disk = {entry.name: entry for entry in os.scandir(self.output_dir)
+                   if entry.is_file() and entry.name.endswith(".md")}
+        with self._lock:
+            known = {row["filename"]: row["size"] for row in
+                     self._db().execute("SELECT filename, size FROM documents")}
+
+        added = 0
+        for name, entry in on_disk.items():
+            stat = entry.stat()
+            if known.get(name) == stat.st_size:
+                continue
+            with open(entry.path, "r", encoding="utf-8") as f:
+                self.register(name, f.read(), created_at=stat.st_ctime)
+            added += 1
+
+        removed = [name for name in known if name not in on_disk]
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.executemany("DELETE FROM documents WHERE filename = ?", [(name,) for name in removed])
+        return {"added": added, "removed": len(removed), "total": len(on_disk)}
+
+
+doc_catalog = DocumentCatalog(config.DOCUMENT_CATALOG_PATH, config.OUTPUT_DIR)
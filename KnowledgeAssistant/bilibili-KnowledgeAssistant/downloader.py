@@ -0,0 +1,169 @@
+import asyncio
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import aiofiles
+
+import config
+import http_client
+
+# 流式下载：按固定大小的块边下边写，内存占用与文件大小无关；
+# 支持 Range 的大文件切成多段并行下载，进度记录在 .part.json 中，中断后可续传。
+# 请求与其他B站请求一样经过 http_client 的限流器、熔断器和重试
+
+DOWNLOAD_HEADERS = {"Referer": "https://www.bilibili.com/"}
+
+_UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def sanitize_filename(name: str, max_length: int = 120) -> str:
+    """去掉文件名中不安全的字符，防止路径穿越"""
+    name = _UNSAFE_CHARS.sub("", name).strip().strip(".")
+    name = re.sub(r"\s+", " ", name)[:max_length].strip()
+    return name or "video"
+
+
+async def _probe(url: str) -> Tuple[Optional[int], bool]:
+    """请求第一个字节，返回 (文件大小, 是否支持 Range)"""
+    headers = {**DOWNLOAD_HEADERS, "Range": "bytes=0-0"}
+    async with http_client.stream("bilibili_web", "GET", url, headers=headers) as response:
+        http_client.raise_for_status("bilibili_web", response)
+        content_range = response.headers.get("content-range", "")
+        if response.status_code == 206 and "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            return (int(total) if total.isdigit() else None), True
+        length = response.headers.get("content-length")
+        return (int(length) if length and length.isdigit() else None), False
+
+
+async def _fetch_range(url: str, path: Path, start: int, end: Optional[int], on_synced=None, sync_bytes: int = 0):
+    """
+    把 [start, end] 区间的内容流式写入文件对应位置；end 为 None 时写到结尾。
+    每写入 sync_bytes 字节（以及结束或中断时）flush + fsync 一次，再以落盘的字节数回调 on_synced，
+    续传进度只记录确实已写到磁盘上的数据
+    """
+    headers = dict(DOWNLOAD_HEADERS)
+    if start > 0 or end is not None:
+        headers["Range"] = f"bytes={start}-{'' if end is None else end}"
+    async with http_client.stream("bilibili_web", "GET", url, headers=headers) as response:
+        http_client.raise_for_status("bilibili_web", response)
+        if start > 0 and response.status_code != 206:
+            raise RuntimeError("服务器不支持断点续传")
+        async with aiofiles.open(path, "r+b") as f:
+            await f.seek(start)
+            pending = 0
+
+            async def sync():
+                nonlocal pending
+                await f.flush()
+                await asyncio.to_thread(os.fsync, f.fileno())
+                if on_synced is not None and pending:
+                    on_synced(pending)
+                pending = 0
+
+            try:
+                async for chunk in response.aiter_bytes(config.DOWNLOAD_CHUNK_SIZE):
+                    await f.write(chunk)
+                    pending += len(chunk)
+                    if sync_bytes and pending >= sync_bytes:
+                        await sync()
+            finally:
+                await sync()
+
+
+def _write_state(state_path: Path, state: Dict):
+    """先写临时文件再替换，中断时不会留下写了一半的进度文件"""
+    tmp_path = state_path.with_name(state_path.name + ".tmp")
+    tmp_path.write_text(json.dumps(state))
+    os.replace(tmp_path, state_path)
+
+
+def _load_state(state_path: Path, total: int, segments: List[Tuple[int, int]]) -> List[int]:
+    """读取各段已下载的字节数；文件大小或分段方式变化时从头开始"""
+    if state_path.exists():
+        try:
+            state = json.loads(state_path.read_text())
+            if state.get("total") == total and state.get("segments") == [list(s) for s in segments]:
+                return state["done"]
+        except (ValueError, KeyError):
+            pass
+    return [0] * len(segments)
+
+
+async def download_file(url: str, dest: Path) -> Path:
+    """
+    下载单个文件到 dest：先写入 dest.part，完成后重命名
+    """
+    if dest.exists():
+        return dest
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part_path = dest.with_name(dest.name + ".part")
+    state_path = dest.with_name(dest.name + ".part.json")
+
+    total, ranged = await _probe(url)
+
+    if not ranged or not total:
+        # 不支持 Range：单连接流式下载，无法续传
+        part_path.write_bytes(b"")
+        await _fetch_range(url, part_path, 0, None)
+        os.replace(part_path, dest)
+        return dest
+
+    segment_size = max(config.DOWNLOAD_SEGMENT_SIZE, -(-total // 64))
+    segments = [(start, min(start + segment_size, total) - 1) for start in range(0, total, segment_size)]
+    done = _load_state(state_path, total, segments)
+    if not part_path.exists() or sum(done) == 0:
+        done = [0] * len(segments)
+        with open(part_path, "wb") as f:
+            f.truncate(total)
+
+    def save_state():
+        _write_state(state_path, {"total": total, "segments": segments, "done": done})
+
+    semaphore = asyncio.Semaphore(max(1, config.DOWNLOAD_SEGMENTS))
+
+    async def fetch_segment(index: int):
+        start, end = segments[index]
+        if start + done[index] > end:
+            return
+
+        def on_synced(size: int):
+            done[index] += size
+            save_state()
+
+        async with semaphore:
+            # 每写满一个分段大小的 1/4 落盘并记录一次进度，中断时最多重下这部分
+            await _fetch_range(url, part_path, start + done[index], end, on_synced, max(1, segment_size // 4))
+
+    tasks = [asyncio.create_task(fetch_segment(i)) for i in range(len(segments))]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # 任一段失败时停止其余分段，已写入的进度保留用于续传
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    os.replace(part_path, dest)
+    if state_path.exists():
+        state_path.unlink()
+    return dest
+
+
+async def download_video(title: str, audio_url: str, video_url: str, output_dir: Optional[Path] = None) -> Dict:
+    """并行下载一个视频的音频流和视频流"""
+    output_dir = Path(output_dir or config.DOWNLOAD_DIR)
+    name = sanitize_filename(title)
+    audio_path, video_path = await asyncio.gather(
+        download_file(audio_url, output_dir / f"{name}.mp3"),
+        download_file(video_url, output_dir / f"{name}.mp4"),
+    )
+    return {
+        "title": title,
+        "audio_file": str(audio_path),
+        "video_file": str(video_path),
+        "size": audio_path.stat().st_size + video_path.stat().st_size,
+    }
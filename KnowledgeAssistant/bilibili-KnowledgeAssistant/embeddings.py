@@ -0,0 +1,127 @@
+import asyncio
+import zlib
+from typing import TYPE_CHECKING, List
+
+import config
+import http_client
+from search_index import tokenize
+
+# numpy 在第一次向量化/检索时才导入，不影响启动速度
+if TYPE_CHECKING:
+    import numpy as np
+
+# 文本向量化：所有实现都返回 L2 归一化的 float32 矩阵（每行一条文本），
+# 新的实现写好后在 EMBEDDERS 中注册，并通过 EMBEDDING_PROVIDER 选择
+
+
+def _normalize(matrix: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class HashingEmbedder:
+    """
+    纯 CPU 的特征哈希向量：复用全文检索的分词（中文二元组/英文单词），
+    每个词哈希到固定维度并带正负号，无需下载模型
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _embed_one(self, text: str) -> "np.ndarray":
+        import numpy as np
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        tokens = tokenize(text)
+        if tokens:
+            hashes = np.fromiter((zlib.crc32(t.encode("utf-8")) for t in tokens), dtype=np.uint32, count=len(tokens))
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(vector, hashes % self.dim, signs)
+        return vector
+
+    async def embed(self, texts: List[str]) -> "np.ndarray":
+        import numpy as np
+
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        # 导入时一批有几百篇笔记，分词和哈希放到线程中执行
+        return await asyncio.to_thread(self._embed_many, texts)
+
+    def _embed_many(self, texts: List[str]) -> "np.ndarray":
+        import numpy as np
+
+        return _normalize(np.stack([self._embed_one(text) for text in texts]))
+
+
+class SentenceTransformerEmbedder:
+    """本地 sentence-transformers 模型（CPU 推理），需要安装 sentence-transformers"""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str = ""):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name or "paraphrase-multilingual-MiniLM-L12-v2", device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    async def embed(self, texts: List[str]) -> "np.ndarray":
+        import numpy as np
+
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        # 模型推理是 CPU 密集型操作，放到线程中避免阻塞事件循环
+        matrix = await asyncio.to_thread(self.model.encode, texts, batch_size=32, convert_to_numpy=True)
+        return _normalize(matrix)
+
+
+class DashScopeEmbedder:
+    """通义 text-embedding 接口，每次最多提交 25 条文本"""
+
+    name = "dashscope"
+    API_URL = f"{config.DASHSCOPE_API_BASE}/api/v1/services/embeddings/text-embedding/text-embedding"
+    BATCH_SIZE = 25
+
+    def __init__(self, model_name: str = ""):
+        self.model = model_name or "text-embedding-v2"
+        self.dim = 1536
+
+    async def embed(self, texts: List[str]) -> "np.ndarray":
+        import numpy as np
+
+        rows = []
+        headers = {"Authorization": f"Bearer {config.TONGYI_API_KEY}"}
+        for start in range(0, len(texts), self.BATCH_SIZE):
+            batch = texts[start:start + self.BATCH_SIZE]
+            response = await http_client.request(
+                "tongyi", "POST", self.API_URL, headers=headers,
+                json={"model": self.model, "input": {"texts": batch}, "parameters": {"text_type": "document"}}
+            )
+            http_client.raise_for_status("tongyi", response)
+            embeddings = sorted(response.json()["output"]["embeddings"], key=lambda e: e["text_index"])
+            rows.extend(e["embedding"] for e in embeddings)
+        if not rows:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return _normalize(np.asarray(rows, dtype=np.float32))
+
+
+EMBEDDERS = {
+    "hashing": lambda: HashingEmbedder(),
+    "sentence-transformers": lambda: SentenceTransformerEmbedder(config.EMBEDDING_MODEL),
+    "dashscope": lambda: DashScopeEmbedder(config.EMBEDDING_MODEL),
+}
+
+_embedder = None
+
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        if config.EMBEDDING_PROVIDER not in EMBEDDERS:
+            raise ValueError(f"不支持的向量化方式: {config.EMBEDDING_PROVIDER}")
+        _embedder = EMBEDDERS[config.EMBEDDING_PROVIDER]()
+    return _embedder
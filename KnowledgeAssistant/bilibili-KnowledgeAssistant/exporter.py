@@ -0,0 +1,241 @@
+import asyncio
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import quote
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Set
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+import config
+
+# 导出：逐行写出，内存占用与行数无关
+#   csv      边生成边返回
+#   ndjson   每行一个 JSON 对象，边生成边返回，可直接用于知识库导入
+#   xlsx     openpyxl 只写模式写入临时文件，再以文件流返回
+#   parquet  pyarrow 按批写入临时文件（需要安装 pyarrow）
+# 行数较多的导出在后台生成到 EXPORT_DIR，通过 /exports/{export_id} 下载
+
+exports = APIRouter()
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXPORT_FORMATS = tuple(MEDIA_TYPES)
+
+# Excel 单元格最多 32767 个字符
+_XLSX_CELL_LIMIT = 32767
+_PARQUET_BATCH_ROWS = 5000
+
+_background: Set[asyncio.Task] = set()
+
+
+def check_format(fmt: str):
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的导出格式: {fmt}，可选 {', '.join(EXPORT_FORMATS)}")
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="导出 Parquet 需要安装 pyarrow")
+
+
+def _cell(value: Any) -> Any:
+    if isinstance(value, (list, tuple)):
+        return ",".join(str(v) for v in value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(columns: List[str], rows: Iterable[Dict]) -> Iterator[bytes]:
+    """逐行生成 CSV（带 BOM，Excel 打开中文不乱码）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_cell(row.get(column)) for column in columns])
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def write_csv(path: Path, columns: List[str], rows: Iterable[Dict]):
+    with open(path, "wb") as f:
+        for chunk in iter_csv(columns, rows):
+            f.write(chunk)
+
+
+def iter_ndjson(columns: List[str], rows: Iterable[Dict]) -> Iterator[bytes]:
+    """逐行生成 NDJSON，列表保持为 JSON 数组"""
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps({column: row.get(column) for column in columns}, ensure_ascii=False,
+                          default=_cell) + "\n"
+        lines.append(line)
+        size += len(line)
+        if size >= 64 * 1024:
+            yield "".join(lines).encode("utf-8")
+            lines = []
+            size = 0
+    yield "".join(lines).encode("utf-8")
+
+
+def write_ndjson(path: Path, columns: List[str], rows: Iterable[Dict]):
+    with open(path, "wb") as f:
+        for chunk in iter_ndjson(columns, rows):
+            f.write(chunk)
+
+
+def write_xlsx(path: Path, columns: List[str], rows: Iterable[Dict]):
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(columns)
+    for row in rows:
+        values = []
+        for column in columns:
+            value = _cell(row.get(column))
+            if isinstance(value, str):
+                value = ILLEGAL_CHARACTERS_RE.sub("", value)[:_XLSX_CELL_LIMIT]
+            values.append(value)
+        sheet.append(values)
+    workbook.save(path)
+
+
+def write_parquet(path: Path, columns: List[str], rows: Iterable[Dict]):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(column, pa.string()) for column in columns])
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= _PARQUET_BATCH_ROWS:
+                writer.write_batch(_parquet_batch(pa, schema, columns, batch))
+                batch = []
+        if batch:
+            writer.write_batch(_parquet_batch(pa, schema, columns, batch))
+
+
+def _parquet_batch(pa, schema, columns: List[str], rows: List[Dict]):
+    arrays = []
+    for column in columns:
+        values = [_cell(row.get(column)) for row in rows]
+        arrays.append(pa.array([None if v is None else str(v) for v in values], type=pa.string()))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+WRITERS: Dict[str, Callable[[Path, List[str], Iterable[Dict]], None]] = {
+    "csv": write_csv,
+    "xlsx": write_xlsx,
+    "parquet": write_parquet,
+    "ndjson": write_ndjson,
+}
+
+# 可以边生成边返回的格式
+STREAMERS: Dict[str, Callable[[List[str], Iterable[Dict]], Iterator[bytes]]] = {
+    "csv": iter_csv,
+    "ndjson": iter_ndjson,
+}
+
+
+def _content_disposition(filename: str) -> str:
+    return f"attachment; filename*=UTF-8''{quote(filename)}"
+
+
+async def stream_export(fmt: str, filename: str, columns: List[str], rows: Iterable[Dict]):
+    """直接以下载形式返回导出文件"""
+    headers = {"Content-Disposition": _content_disposition(f"{filename}.{fmt}")}
+    if fmt in STREAMERS:
+        # 同步生成器由 Starlette 放到线程池中迭代，不阻塞事件循环
+        return StreamingResponse(STREAMERS[fmt](columns, rows), media_type=MEDIA_TYPES[fmt], headers=headers)
+
+    fd, tmp = tempfile.mkstemp(suffix=f".{fmt}")
+    os.close(fd)
+    try:
+        await asyncio.to_thread(WRITERS[fmt], Path(tmp), columns, rows)
+    except Exception:
+        os.unlink(tmp)
+        raise
+    return FileResponse(tmp, media_type=MEDIA_TYPES[fmt], headers=headers,
+                        background=BackgroundTask(os.unlink, tmp))
+
+
+def _export_path(export_id: str, suffix: str) -> Path:
+    return config.EXPORT_DIR / f"{export_id}{suffix}"
+
+
+def _cleanup_expired():
+    """删除超过 EXPORT_TTL 的导出文件"""
+    if not config.EXPORT_DIR.exists():
+        return
+    deadline = time.time() - config.EXPORT_TTL
+    for entry in os.scandir(config.EXPORT_DIR):
+        if entry.is_file() and entry.stat().st_mtime < deadline:
+            os.unlink(entry.path)
+
+
+def _run_export(export_id: str, fmt: str, filename: str, columns: List[str], rows: Iterable[Dict]):
+    part = _export_path(export_id, ".part")
+    try:
+        WRITERS[fmt](part, columns, rows)
+        _export_path(export_id, ".name").write_text(f"{filename}.{fmt}", encoding="utf-8")
+        os.replace(part, _export_path(export_id, f".{fmt}"))
+    except Exception as e:
+        print(f"导出失败 {export_id}: {e}")
+        if part.exists():
+            part.unlink()
+        _export_path(export_id, ".error").write_text(str(e), encoding="utf-8")
+
+
+def start_background_export(fmt: str, filename: str, columns: List[str], rows: Iterable[Dict]) -> Dict:
+    """在后台线程生成导出文件，返回下载地址"""
+    config.EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    _cleanup_expired()
+    export_id = uuid.uuid4().hex
+    _export_path(export_id, ".part").touch()
+    task = asyncio.create_task(asyncio.to_thread(_run_export, export_id, fmt, filename, columns, rows))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return {"export_id": export_id, "status": "processing", "download_url": f"/exports/{export_id}"}
+
+
+@exports.get("/{export_id}")
+async def download_export(export_id: str):
+    """
+    下载后台导出的文件；尚未完成时返回 202
+    """
+    if not export_id.isalnum():
+        raise HTTPException(status_code=404, detail="导出不存在")
+    error = _export_path(export_id, ".error")
+    if error.exists():
+        raise HTTPException(status_code=500, detail=f"导出失败: {error.read_text(encoding='utf-8')}")
+    for fmt in EXPORT_FORMATS:
+        path = _export_path(export_id, f".{fmt}")
+        if path.exists():
+            name = _export_path(export_id, ".name")
+            filename = name.read_text(encoding="utf-8") if name.exists() else path.name
+            return FileResponse(path, media_type=MEDIA_TYPES[fmt],
+                                headers={"Content-Disposition": _content_disposition(filename)})
+    if _export_path(export_id, ".part").exists():
+        return JSONResponse(status_code=202, content={"export_id": export_id, "status": "processing"})
+    raise HTTPException(status_code=404, detail="导出不存在")
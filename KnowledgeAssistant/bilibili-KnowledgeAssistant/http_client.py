@@ -0,0 +1,189 @@
+import asyncio
+import importlib.util
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+import config
+import metrics
+from ratelimit import get_limiter
+from resilience import UpstreamError, UpstreamThrottled, get_breaker
+
+# 应用级共享的 HTTP 客户端：每个上游一个连接池，在 FastAPI lifespan 中创建和关闭
+
+BILIBILI_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36 Edg/138.0.0.0",
+    "Cookie": config.BILIBILI_COOKIE,
+}
+
+# 上游名称 -> (默认请求头, 读超时)
+# bilibili: api.bilibili.com；bilibili_web: 视频页面与 CDN；tongyi: DashScope
+UPSTREAMS = {
+    "bilibili": (BILIBILI_HEADERS, config.BILIBILI_TIMEOUT),
+    "bilibili_web": (BILIBILI_HEADERS, config.BILIBILI_TIMEOUT),
+    "tongyi": ({}, config.TONGYI_TIMEOUT),
+}
+
+# 上游限流或风控（B站风控返回 412），需要降低请求速率后重试
+THROTTLE_STATUS = {412, 429}
+# 这些状态码视为临时错误，可以重试
+RETRY_STATUS = {500, 502, 503, 504} | THROTTLE_STATUS
+# B站接口 HTTP 200 但 code 为这些值时表示被风控或请求过于频繁
+BILIBILI_RISK_CODES = {-412, -352, -509, -799}
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _build_client(upstream: str) -> httpx.AsyncClient:
+    headers, read_timeout = UPSTREAMS.get(upstream, ({}, config.BILIBILI_TIMEOUT))
+    # HTTP/2 需要安装 h2，未安装时退回 HTTP/1.1 keep-alive
+    http2 = config.HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+    return httpx.AsyncClient(
+        headers=headers,
+        http2=http2,
+        timeout=httpx.Timeout(read_timeout, connect=config.HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_MAX_KEEPALIVE,
+        ),
+        follow_redirects=True,
+    )
+
+
+async def startup():
+    """创建所有上游的连接池"""
+    for upstream in UPSTREAMS:
+        if upstream not in _clients:
+            _clients[upstream] = _build_client(upstream)
+
+
+async def shutdown():
+    """关闭所有连接池"""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+def get_client(upstream: str) -> httpx.AsyncClient:
+    """获取上游对应的共享客户端，未启动时（如脚本中调用）按需创建"""
+    if upstream not in _clients:
+        _clients[upstream] = _build_client(upstream)
+    return _clients[upstream]
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _risk_code(upstream: str, response: httpx.Response) -> Optional[int]:
+    """B站接口被风控时返回 HTTP 200，错误码在 JSON 的 code 字段中（这类响应很短，只检查短响应）"""
+    if upstream != "bilibili" or response.status_code != 200 or len(response.content) > 1024:
+        return None
+    try:
+        code = response.json().get("code")
+    except (ValueError, AttributeError):
+        return None
+    return code if code in BILIBILI_RISK_CODES else None
+
+
+def _backoff(attempt: int, retry_after: Optional[float] = None) -> float:
+    """带全抖动的指数退避，多个请求同时失败时不会在同一时刻一起重试；上游给出 Retry-After 时以它为准"""
+    if retry_after is not None:
+        return min(retry_after, config.HTTP_BACKOFF_MAX)
+    return random.uniform(0, min(config.HTTP_BACKOFF_MAX, config.HTTP_BACKOFF * (2 ** attempt)))
+
+
+async def _send(upstream: str, method: str, url: str, retries: Optional[int], stream: bool,
+                **kwargs) -> httpx.Response:
+    client = get_client(upstream)
+    limiter = get_limiter(upstream)
+    breaker = get_breaker(upstream)
+    retries = config.HTTP_RETRIES if retries is None else retries
+
+    for attempt in range(retries + 1):
+        # 熔断中直接失败，不再发出请求
+        breaker.check(retry=attempt > 0)
+        await limiter.acquire()
+        start = time.perf_counter()
+        retry_after = None
+        try:
+            response = await client.send(client.build_request(method, url, **kwargs), stream=stream)
+        except httpx.TransportError as e:
+            metrics.upstream_requests.inc(upstream=upstream, status="error")
+            if attempt == retries:
+                breaker.record_failure()
+                raise UpstreamError(upstream, f"网络错误: {e!r}") from e
+        else:
+            metrics.upstream_seconds.observe(time.perf_counter() - start, upstream=upstream)
+            metrics.upstream_requests.inc(upstream=upstream, status=response.status_code)
+            status = response.status_code
+            code = None if stream else _risk_code(upstream, response)
+            throttled = status in THROTTLE_STATUS or code is not None
+            if throttled:
+                retry_after = _retry_after(response)
+                limiter.penalize(retry_after)
+            elif status < 500:
+                limiter.reward()
+            if not throttled and status not in RETRY_STATUS:
+                breaker.record_success()
+                return response
+            if stream:
+                await response.aread()
+                await response.aclose()
+            if attempt == retries:
+                breaker.record_failure()
+                message = f"HTTP {status}: {response.text[:200]}"
+                if throttled:
+                    raise UpstreamThrottled(upstream, message, status=status, code=code, retry_after=retry_after)
+                raise UpstreamError(upstream, message, status=status)
+        await asyncio.sleep(_backoff(attempt, retry_after))
+
+
+async def request(upstream: str, method: str, url: str, retries: int = None, **kwargs) -> httpx.Response:
+    """
+    通过共享连接池发送请求：先检查熔断器并经过上游限流器，遇到网络错误、限流/风控或临时状态码时
+    按带抖动的指数退避重试；重试后仍失败时抛出 UpstreamError（限流/风控为 UpstreamThrottled），
+    其他状态码（如 4xx）的响应原样返回
+    """
+    return await _send(upstream, method, url, retries, False, **kwargs)
+
+
+@asynccontextmanager
+async def stream(upstream: str, method: str, url: str, retries: int = None, **kwargs) -> AsyncIterator[httpx.Response]:
+    """与 request 相同的熔断、限流和重试策略（只在收到响应头之前重试），响应体以流的方式读取"""
+    response = await _send(upstream, method, url, retries, True, **kwargs)
+    try:
+        yield response
+    finally:
+        await response.aclose()
+
+
+def raise_for_status(upstream: str, response: httpx.Response):
+    """非 2xx 响应转换为 UpstreamError（流式响应未读取响应体时错误信息中不含响应体）"""
+    if not response.is_success:
+        try:
+            body = response.text[:200]
+        except httpx.ResponseNotRead:
+            body = ""
+        raise UpstreamError(upstream, f"HTTP {response.status_code}: {body}", status=response.status_code)
+
+
+def bilibili_json(response: httpx.Response, upstream: str = "bilibili") -> Dict:
+    """
+    解析B站接口返回的 JSON；请求失败或被风控（HTTP 200 但 code 为 -412/-352 等）时抛出 UpstreamError，
+    其他非 0 的 code（如视频不存在）由调用方处理
+    """
+    raise_for_status(upstream, response)
+    data = response.json()
+    code = data.get("code")
+    if code in BILIBILI_RISK_CODES:
+        raise UpstreamThrottled(upstream, data.get("message") or "请求被风控拦截",
+                                status=response.status_code, code=code)
+    return data
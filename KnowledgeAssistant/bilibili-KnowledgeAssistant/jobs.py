@@ -0,0 +1,199 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import config
+import db
+import metrics
+
+
+class JobStore:
+    """
+    持久化的批量分析任务表：
+      jobs       任务状态与租约（哪个 worker 持有、何时过期）
+      job_items  任务中的每个视频及其分析结果，作为断点续跑的检查点
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        if self._conn is None:
+            conn = db.connect(self.path)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "task_id TEXT PRIMARY KEY, status TEXT NOT NULL, analysis_type TEXT NOT NULL, "
+                "total INTEGER NOT NULL, completed INTEGER NOT NULL DEFAULT 0, "
+                "created_at REAL NOT NULL, completed_at REAL, error TEXT, "
+                "worker_id TEXT, lease_expires REAL, options TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+            # 旧版本的任务库没有 options 列（任务参数，JSON）
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "options" not in columns:
+                try:
+                    conn.execute("ALTER TABLE jobs ADD COLUMN options TEXT")
+                except sqlite3.OperationalError:
+                    # 其他进程已同时完成升级
+                    pass
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_items ("
+                "task_id TEXT NOT NULL, seq INTEGER NOT NULL, bvid TEXT NOT NULL, video TEXT NOT NULL, "
+                "status TEXT NOT NULL DEFAULT 'pending', result TEXT, finished_at REAL, "
+                "PRIMARY KEY (task_id, seq))"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def create(self, task_id: str, videos: List[Dict], analysis_type: str, options: Optional[Dict] = None):
+        """options 为任务参数（如 dedup / reuse_existing），worker 执行时原样取回"""
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.execute(
+                    "INSERT INTO jobs (task_id, status, analysis_type, total, created_at, options) "
+                    "VALUES (?, 'pending', ?, ?, ?, ?)",
+                    (task_id, analysis_type, len(videos), time.time(), json.dumps(options or {})),
+                )
+                conn.executemany(
+                    "INSERT INTO job_items (task_id, seq, bvid, video) VALUES (?, ?, ?, ?)",
+                    [(task_id, seq, video["bvid"], json.dumps(video, ensure_ascii=False, default=str))
+                     for seq, video in enumerate(videos)],
+                )
+
+    def claim(self, worker_id: str) -> Optional[str]:
+        """
+        领取一个待处理的任务，或租约已过期（原 worker 已退出）的处理中任务
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT task_id FROM jobs WHERE status = 'pending' "
+                    "OR (status = 'processing' AND lease_expires < ?) ORDER BY created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'processing', worker_id = ?, lease_expires = ? WHERE task_id = ?",
+                        (worker_id, now + config.JOB_LEASE_SECONDS, row["task_id"]),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return row["task_id"] if row else None
+
+    def renew(self, task_id: str, worker_id: str):
+        """续租，证明 worker 仍在处理该任务"""
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.execute(
+                    "UPDATE jobs SET lease_expires = ? WHERE task_id = ? AND worker_id = ? AND status = 'processing'",
+                    (time.time() + config.JOB_LEASE_SECONDS, task_id, worker_id),
+                )
+
+    def release(self, worker_id: str):
+        """worker 正常退出时交还未完成的任务，其他 worker 可立即接手"""
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.execute(
+                    "UPDATE jobs SET status = 'pending', worker_id = NULL, lease_expires = NULL "
+                    "WHERE worker_id = ? AND status = 'processing'",
+                    (worker_id,),
+                )
+
+    def pending_items(self, task_id: str) -> List[Tuple[int, Dict]]:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT seq, video FROM job_items WHERE task_id = ? AND status = 'pending' ORDER BY seq",
+                (task_id,),
+            ).fetchall()
+        return [(row["seq"], json.loads(row["video"])) for row in rows]
+
+    def complete_item(self, task_id: str, seq: int, result: Dict):
+        """保存单个视频的结果（检查点），并更新任务进度"""
+        # 去重后被合并或复用已有结果的视频也算完成
+        status = "done" if result.get("status") in ("success", "duplicate", "reused") else "error"
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.execute(
+                    "UPDATE job_items SET status = ?, result = ?, finished_at = ? WHERE task_id = ? AND seq = ?",
+                    (status, json.dumps(result, ensure_ascii=False, default=str), time.time(), task_id, seq),
+                )
+                conn.execute(
+                    "UPDATE jobs SET completed = (SELECT COUNT(*) FROM job_items "
+                    "WHERE task_id = ? AND status != 'pending') WHERE task_id = ?",
+                    (task_id, task_id),
+                )
+
+    def finish(self, task_id: str, status: str = "completed", error: Optional[str] = None):
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, completed_at = ?, worker_id = NULL, lease_expires = NULL "
+                    "WHERE task_id = ?",
+                    (status, error, time.time(), task_id),
+                )
+
+    def counts(self) -> Dict[str, int]:
+        """各状态的任务数"""
+        with self._lock:
+            rows = self._db().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        with self._lock:
+            conn = self._db()
+            job = conn.execute("SELECT * FROM jobs WHERE task_id = ?", (task_id,)).fetchone()
+            if job is None:
+                return None
+            rows = conn.execute(
+                "SELECT result FROM job_items WHERE task_id = ? AND status != 'pending' ORDER BY finished_at",
+                (task_id,),
+            ).fetchall()
+        return {
+            "task_id": job["task_id"],
+            "status": job["status"],
+            "analysis_type": job["analysis_type"],
+            "options": json.loads(job["options"]) if job["options"] else {},
+            "progress": f"{job['completed']}/{job['total']}",
+            "completed": job["completed"],
+            "total": job["total"],
+            "results": [json.loads(row["result"]) for row in rows],
+            "error": job["error"],
+            "created_at": datetime.fromtimestamp(job["created_at"]).isoformat(),
+            "completed_at": datetime.fromtimestamp(job["completed_at"]).isoformat() if job["completed_at"] else None,
+        }
+
+
+job_store = JobStore(config.JOB_DB_PATH)
+
+
+def _collect_job_counts():
+    return [("ka_jobs", "gauge", "各状态的批量分析任务数", {"status": status}, count)
+            for status, count in job_store.counts().items()]
+
+
+metrics.register_collector(_collect_job_counts)
+
+
+# 同一进程内的 worker 在此等待新任务，不必等到下一次轮询
+new_job_event = asyncio.Event()
+
+
+def notify_new_job():
+    new_job_event.set()
@@ -0,0 +1,309 @@
+import base64
+import json
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import config
+import db
+from models import KnowledgeItem
+
+
+class KnowledgeStore(ABC):
+    """
+    知识库存储接口，新的存储后端实现全部抽象方法后在 STORE_BACKENDS 中注册即可
+    （缺少任何一个方法的后端在创建时就会报错）
+    """
+
+    @abstractmethod
+    def get(self, knowledge_id: str) -> Optional[KnowledgeItem]:
+        ...
+
+    @abstractmethod
+    def save(self, item: KnowledgeItem):
+        ...
+
+    @abstractmethod
+    def delete(self, knowledge_id: str) -> Optional[KnowledgeItem]:
+        ...
+
+    @abstractmethod
+    def toggle_favorite(self, knowledge_id: str) -> Optional[bool]:
+        ...
+
+    @abstractmethod
+    def list(self, limit: int = 50, cursor: Optional[str] = None, bvid: Optional[str] = None,
+             author: Optional[str] = None, analysis_type: Optional[str] = None,
+             is_favorite: Optional[bool] = None) -> Tuple[List[KnowledgeItem], Optional[str]]:
+        """按创建时间倒序分页，返回 (当前页, 下一页游标)"""
+        ...
+
+    @abstractmethod
+    def find_by_bvids(self, bvids: Iterable[str], analysis_type: Optional[str] = None) -> Dict[str, KnowledgeItem]:
+        """批量查找视频已有的知识库项，每个 bvid 取最新的一条"""
+        ...
+
+    @abstractmethod
+    def save_many(self, items: List[KnowledgeItem]) -> List[Tuple[KnowledgeItem, bool]]:
+        """
+        在一个事务中批量保存，按 (bvid, analysis_type) 去重：已存在时更新原有的项，
+        返回 [(保存后的项, 是否新建)]
+        """
+        ...
+
+    @abstractmethod
+    def delete_many(self, knowledge_ids: Iterable[str]) -> List[KnowledgeItem]:
+        """在一个事务中批量删除，返回被删除的项"""
+        ...
+
+    @abstractmethod
+    def update_many(self, knowledge_ids: Iterable[str], is_favorite: Optional[bool] = None,
+                    add_tags: Iterable[str] = (), remove_tags: Iterable[str] = ()) -> List[str]:
+        """在一个事务中批量设置收藏状态、增删标签，返回实际更新的 id"""
+        ...
+
+
+def encode_cursor(created_at: str, knowledge_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{created_at}|{knowledge_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    created_at, knowledge_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+    return created_at, knowledge_id
+
+
+def _ts(value: datetime) -> str:
+    # 固定到微秒，保证字符串顺序与时间顺序一致
+    return value.isoformat(timespec="microseconds")
+
+
+def _batches(values: List, size: int = 500):
+    # 分批查询，避免超出 SQLite 的参数个数上限
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class SQLiteKnowledgeStore(KnowledgeStore):
+    """
+    SQLite（WAL 模式）知识库存储，多个 worker 进程可共享同一个数据库文件
+    """
+
+    FILTER_COLUMNS = ("bvid", "author", "analysis_type", "is_favorite")
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        if self._conn is None:
+            conn = db.connect(self.path)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS knowledge ("
+                "id TEXT PRIMARY KEY, bvid TEXT NOT NULL, title TEXT NOT NULL, author TEXT NOT NULL, "
+                "markdown_content TEXT NOT NULL, analysis_type TEXT NOT NULL, tags TEXT NOT NULL DEFAULT '[]', "
+                "is_favorite INTEGER NOT NULL DEFAULT 0, created_at TEXT NOT NULL, updated_at TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_created ON knowledge(created_at, id)")
+            # 每个过滤列都带上 created_at，过滤后的分页同样走索引
+            for column in self.FILTER_COLUMNS:
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_knowledge_{column} ON knowledge({column}, created_at, id)"
+                )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _to_item(row) -> KnowledgeItem:
+        return KnowledgeItem(
+            id=row["id"],
+            bvid=row["bvid"],
+            title=row["title"],
+            author=row["author"],
+            markdown_content=row["markdown_content"],
+            analysis_type=row["analysis_type"],
+            tags=json.loads(row["tags"]),
+            is_favorite=bool(row["is_favorite"]),
+            created_at=datetime.fromisoformat(row["created_at"]),
+            updated_at=datetime.fromisoformat(row["updated_at"]),
+        )
+
+    def get(self, knowledge_id: str) -> Optional[KnowledgeItem]:
+        with self._lock:
+            row = self._db().execute("SELECT * FROM knowledge WHERE id = ?", (knowledge_id,)).fetchone()
+        return self._to_item(row) if row else None
+
+    _INSERT = (
+        "INSERT OR REPLACE INTO knowledge (id, bvid, title, author, markdown_content, analysis_type, "
+        "tags, is_favorite, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+
+    @staticmethod
+    def _params(item: KnowledgeItem) -> Tuple:
+        return (item.id, item.bvid, item.title, item.author, item.markdown_content, item.analysis_type,
+                json.dumps(item.tags, ensure_ascii=False), int(item.is_favorite),
+                _ts(item.created_at), _ts(item.updated_at))
+
+    def save(self, item: KnowledgeItem):
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.execute(self._INSERT, self._params(item))
+
+    def save_many(self, items: List[KnowledgeItem]) -> List[Tuple[KnowledgeItem, bool]]:
+        # 同一批中 (bvid, analysis_type) 相同的以最后一条为准
+        items = list({(item.bvid, item.analysis_type): item for item in items}.values())
+        bvids = list(dict.fromkeys(item.bvid for item in items))
+        results = []
+        with self._lock:
+            conn = self._db()
+            with conn:
+                # 查询前就取得写锁：多个进程同时保存同一视频时，后到的等前一个提交后再查，不会都当作新项插入
+                conn.execute("BEGIN IMMEDIATE")
+                existing = {}
+                for batch in _batches(bvids):
+                    rows = conn.execute(
+                        "SELECT id, bvid, analysis_type, tags, is_favorite, created_at FROM knowledge "
+                        f"WHERE bvid IN ({','.join('?' * len(batch))}) ORDER BY created_at", batch
+                    ).fetchall()
+                    for row in rows:
+                        existing[(row["bvid"], row["analysis_type"])] = row
+                now = datetime.now()
+                for item in items:
+                    row = existing.get((item.bvid, item.analysis_type))
+                    if row is not None:
+                        # 更新已有的项：保留 id 和创建时间，合并标签和收藏状态
+                        item = item.model_copy(update={
+                            "id": row["id"],
+                            "tags": list(dict.fromkeys(json.loads(row["tags"]) + item.tags)),
+                            "is_favorite": item.is_favorite or bool(row["is_favorite"]),
+                            "created_at": datetime.fromisoformat(row["created_at"]),
+                            "updated_at": now,
+                        })
+                    results.append((item, row is None))
+                conn.executemany(self._INSERT, [self._params(item) for item, _ in results])
+        return results
+
+    def delete(self, knowledge_id: str) -> Optional[KnowledgeItem]:
+        with self._lock:
+            conn = self._db()
+            with conn:
+                row = conn.execute("SELECT * FROM knowledge WHERE id = ?", (knowledge_id,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute("DELETE FROM knowledge WHERE id = ?", (knowledge_id,))
+        return self._to_item(row)
+
+    def delete_many(self, knowledge_ids: Iterable[str]) -> List[KnowledgeItem]:
+        knowledge_ids = list(dict.fromkeys(knowledge_ids))
+        deleted = []
+        with self._lock:
+            conn = self._db()
+            with conn:
+                for batch in _batches(knowledge_ids):
+                    placeholders = ",".join("?" * len(batch))
+                    deleted.extend(conn.execute(
+                        f"SELECT * FROM knowledge WHERE id IN ({placeholders})", batch
+                    ).fetchall())
+                    conn.execute(f"DELETE FROM knowledge WHERE id IN ({placeholders})", batch)
+        return [self._to_item(row) for row in deleted]
+
+    def update_many(self, knowledge_ids: Iterable[str], is_favorite: Optional[bool] = None,
+                    add_tags: Iterable[str] = (), remove_tags: Iterable[str] = ()) -> List[str]:
+        knowledge_ids = list(dict.fromkeys(knowledge_ids))
+        add_tags = list(add_tags)
+        remove_tags = set(remove_tags)
+        now = _ts(datetime.now())
+        updates = []
+        with self._lock:
+            conn = self._db()
+            with conn:
+                for batch in _batches(knowledge_ids):
+                    rows = conn.execute(
+                        f"SELECT id, tags, is_favorite FROM knowledge WHERE id IN ({','.join('?' * len(batch))})",
+                        batch,
+                    ).fetchall()
+                    for row in rows:
+                        tags = [tag for tag in dict.fromkeys(json.loads(row["tags"]) + add_tags)
+                                if tag not in remove_tags]
+                        favorite = row["is_favorite"] if is_favorite is None else int(is_favorite)
+                        updates.append((json.dumps(tags, ensure_ascii=False), favorite, now, row["id"]))
+                conn.executemany(
+                    "UPDATE knowledge SET tags = ?, is_favorite = ?, updated_at = ? WHERE id = ?", updates
+                )
+        return [update[-1] for update in updates]
+
+    def toggle_favorite(self, knowledge_id: str) -> Optional[bool]:
+        with self._lock:
+            conn = self._db()
+            with conn:
+                # 在一条 UPDATE 中取反，多进程并发切换也不会丢失更新
+                cursor = conn.execute(
+                    "UPDATE knowledge SET is_favorite = 1 - is_favorite, updated_at = ? WHERE id = ?",
+                    (_ts(datetime.now()), knowledge_id),
+                )
+                if cursor.rowcount == 0:
+                    return None
+                row = conn.execute("SELECT is_favorite FROM knowledge WHERE id = ?", (knowledge_id,)).fetchone()
+        return bool(row["is_favorite"])
+
+    def find_by_bvids(self, bvids: Iterable[str], analysis_type: Optional[str] = None) -> Dict[str, KnowledgeItem]:
+        bvids = list(dict.fromkeys(bvids))
+        found: Dict[str, KnowledgeItem] = {}
+        for batch in _batches(bvids):
+            sql = f"SELECT * FROM knowledge WHERE bvid IN ({','.join('?' * len(batch))})"
+            params = list(batch)
+            if analysis_type is not None:
+                sql += " AND analysis_type = ?"
+                params.append(analysis_type)
+            with self._lock:
+                rows = self._db().execute(sql + " ORDER BY created_at", params).fetchall()
+            for row in rows:
+                found[row["bvid"]] = self._to_item(row)
+        return found
+
+    def list(self, limit: int = 50, cursor: Optional[str] = None, bvid: Optional[str] = None,
+             author: Optional[str] = None, analysis_type: Optional[str] = None,
+             is_favorite: Optional[bool] = None) -> Tuple[List[KnowledgeItem], Optional[str]]:
+        conditions = []
+        params = []
+        for column, value in (("bvid", bvid), ("author", author), ("analysis_type", analysis_type),
+                              ("is_favorite", None if is_favorite is None else int(is_favorite))):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if cursor:
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+
+        sql = "SELECT * FROM knowledge"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        # 多取一条用来判断是否还有下一页
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._db().execute(sql, params).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        return [self._to_item(row) for row in rows], next_cursor
+
+
+STORE_BACKENDS = {
+    "sqlite": SQLiteKnowledgeStore,
+}
+
+
+def create_store(backend: str, path) -> KnowledgeStore:
+    if backend not in STORE_BACKENDS:
+        raise ValueError(f"不支持的知识库存储后端: {backend}")
+    return STORE_BACKENDS[backend](path)
+
+
+knowledge_store = create_store(config.KNOWLEDGE_STORE, config.KNOWLEDGE_DB_PATH)
@@ -1,13 +1,199 @@
-from fastapi import FastAPI
-import uvicorn
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
+import math
+import os
+import signal
+import threading
+import time
+import config
+import http_client
+import metrics
+import search_index
+from doc_catalog import doc_catalog
+from resilience import CircuitOpenError, UpstreamError, UpstreamThrottled
+
+
+def _begin_drain(app: FastAPI, prestop: float):
+    """收到关闭信号：/healthz 立即返回 503，worker 停止领取新任务；返回本进程的关闭截止时间"""
+    if app.state.shutdown_deadline is None:
+        app.state.ready = False
+        app.state.shutdown_deadline = time.monotonic() + prestop + config.SHUTDOWN_GRACE_SECONDS
+        worker = app.state.analysis_worker
+        if worker is not None:
+            worker.drain()
+    return app.state.shutdown_deadline
+
+
+def _install_drain_handlers(app: FastAPI) -> dict:
+    """
+    在 uvicorn 的信号处理之前插一层：SIGTERM 时先摘流，继续服务 SHUTDOWN_PRESTOP_SECONDS 秒后
+    再交给 uvicorn 停止接受新连接；SIGINT（Ctrl+C）不等待。重复收到信号时直接交给 uvicorn
+    """
+    # 只有主线程能设置信号处理（TestClient 等在其他线程运行 lifespan）
+    if threading.current_thread() is not threading.main_thread():
+        return {}
+    loop = asyncio.get_running_loop()
+    previous = {}
+
+    def handle(sig, frame):
+        handler = previous[sig]
+        if app.state.shutdown_deadline is not None:
+            handler(sig, frame)
+            return
+        prestop = config.SHUTDOWN_PRESTOP_SECONDS if sig == signal.SIGTERM else 0
+        print(f"收到信号 {signal.Signals(sig).name}，{prestop} 秒后停止接受新连接")
+        # 信号处理函数中不直接操作事件循环里的对象
+        loop.call_soon_threadsafe(_begin_drain, app, prestop)
+        loop.call_soon_threadsafe(loop.call_later, prestop, handler, sig, frame)
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        handler = signal.getsignal(sig)
+        if callable(handler):
+            previous[sig] = handler
+            signal.signal(sig, handle)
+    return previous
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+    app.state.analysis_worker = None
+    app.state.shutdown_deadline = None
+    # 启动时创建共享连接池，关闭时释放
+    await http_client.startup()
+    config.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    # 文档目录与输出目录对账（补登记新增文件、清理已删除文件）
+    print("文档目录对账:", await asyncio.to_thread(doc_catalog.reconcile))
+    # 补齐全文索引：已有的知识库项和文档、对账时新登记的文档（多进程同时启动时失败不影响服务）
+    try:
+        print("全文索引对账:", await asyncio.to_thread(search_index.reconcile))
+    except Exception as e:
+        print(f"全文索引对账失败: {e}")
+    # 在 API 进程内运行批量分析 worker（也可以设置 INPROCESS_WORKER=0 并单独运行 python -m worker）
+    analysis_worker = None
+    if config.INPROCESS_WORKER:
+        from worker import Worker
+        analysis_worker = Worker()
+        analysis_worker.start()
+    app.state.analysis_worker = analysis_worker
+    previous_handlers = _install_drain_handlers(app)
+    app.state.ready = True
+    yield
+    # 关闭：uvicorn 已等完进行中的请求，分析任务用剩下的时间收尾；
+    # 没有经过信号处理（如非主线程运行）时从现在起计时
+    deadline = _begin_drain(app, 0)
+    if analysis_worker is not None:
+        await analysis_worker.stop(grace=max(0.0, deadline - time.monotonic()))
+    for sig, handler in previous_handlers.items():
+        signal.signal(sig, handler)
+    await http_client.shutdown()
+
+
+app=FastAPI(lifespan=lifespan)
+
+
+def _route_template(request: Request) -> str:
+    """
+    请求匹配到的路由模板，如 /analyse/markdown/{bvid}；
+    子路由的 path 不一定包含前缀，前缀取实际路径中多出来的前几段
+    """
+    route = request.scope.get("route")
+    if route is None:
+        return "unmatched"
+    segments = request.url.path.split("/")
+    route_segments = route.path.split("/")
+    prefix = "/".join(segments[:len(segments) - len(route_segments) + 1])
+    return prefix + route.path
+
+
+if config.METRICS_MIDDLEWARE:
+    @app.middleware("http")
+    async def record_request_time(request: Request, call_next):
+        """按路由模板（而不是实际路径）记录接口耗时，避免标签数量无限增长"""
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            metrics.http_request_seconds.observe(
+                time.perf_counter() - start,
+                method=request.method,
+                route=_route_template(request),
+                status=status,
+            )
+
+
+@app.exception_handler(UpstreamError)
+async def upstream_error_handler(request: Request, exc: UpstreamError):
+    """上游失败统一返回 502；上游限流、风控或熔断中返回 503，并带上 Retry-After"""
+    headers = {}
+    status_code = 502
+    if isinstance(exc, (UpstreamThrottled, CircuitOpenError)):
+        status_code = 503
+        if exc.retry_after:
+            headers["Retry-After"] = str(math.ceil(exc.retry_after))
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": str(exc), "upstream": exc.upstream, "error_type": type(exc).__name__},
+        headers=headers
+    )
+
+
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """
+    就绪检查：启动完成、未在关闭中且数据库可访问时返回 200，否则返回 503
+    """
+    from jobs import job_store
+    from knowledge_store import knowledge_store
+
+    worker = getattr(app.state, "analysis_worker", None)
+    status = {
+        "status": "ok",
+        "pid": os.getpid(),
+        "worker_id": worker.worker_id if worker is not None else None,
+        "draining": getattr(app.state, "shutdown_deadline", None) is not None or bool(worker is not None and worker.draining),
+    }
+    if not getattr(app.state, "ready", False):
+        return JSONResponse(status_code=503, content={**status, "status": "starting_or_stopping"})
+    if config.DRAIN_FILE and os.path.exists(config.DRAIN_FILE):
+        return JSONResponse(status_code=503, content={**status, "status": "draining"})
+    try:
+        status["jobs"] = await asyncio.to_thread(job_store.counts)
+        await asyncio.to_thread(knowledge_store.list, 1)
+    except Exception as e:
+        return JSONResponse(status_code=503, content={**status, "status": "unavailable", "error": str(e)})
+    return status
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus 文本格式的指标"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
-app=FastAPI()
 from repository import repository
 from videosearch import search
 from analyse import analyse
+from exporter import exports
 app.include_router(repository,prefix="/repository",tags=["知识仓库接口"])
 app.include_router(search,prefix="/search",tags=["搜索视频接口"])
 app.include_router(analyse,prefix="/analyse",tags=["解析视频接口"])
+app.include_router(exports,prefix="/exports",tags=["导出接口"])
 
 if __name__ == "__main__":
-    uvicorn.run(app,port=8000)
\ No newline at end of file
+    import uvicorn
+
+    # WORKERS>1 时以多进程方式运行（需要以导入字符串传入应用）；
+    # 收到 SIGTERM 后继续服务 SHUTDOWN_PRESTOP_SECONDS 秒再停止接受新连接，之后最多等待 SHUTDOWN_GRACE_SECONDS 秒
+    # 让进行中的请求完成，分析任务只能用这段时间剩下的部分（见 lifespan）
+    uvicorn.run(
+        "main:app" if config.WORKERS > 1 else app,
+        host=config.HOST,
+        port=config.PORT,
+        workers=config.WORKERS,
+        timeout_graceful_shutdown=int(config.SHUTDOWN_GRACE_SECONDS)
+    )
\ No newline at end of file
@@ -0,0 +1,212 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# 进程内指标，/metrics 以 Prometheus 文本格式输出，不依赖 prometheus_client
+# 多 worker 进程部署时每个进程各自统计，由 Prometheus 分别抓取后聚合
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_registry: List["_Metric"] = []
+Sample = Tuple[str, str, str, Dict[str, str], float]
+# 抓取时才计算的指标：缓存命中率、任务数等
+_collectors: List[Callable[[], List[Sample]]] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in values.items()
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in values.items()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 每组标签：各桶计数（不累加）、总和、总数
+        self._values: Dict[Tuple, List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """计时上下文，async 函数中同样可用"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        lines = self._header()
+        for key, (counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def register_collector(collector: Callable[[], List[Sample]]):
+    """注册抓取时计算的指标，collector 返回 (名称, 类型, 说明, 标签, 值) 列表"""
+    _collectors.append(collector)
+
+
+def register_cache(name: str, stats: Callable[[], Dict]):
+    """把缓存的 stats() 输出为命中/未命中计数和命中率"""
+    def collect() -> List[Sample]:
+        data = stats()
+        labels = {"cache": name}
+        return [
+            ("ka_cache_hits_total", "counter", "缓存命中次数（含过期后仍返回的结果）", labels,
+             data.get("hits", 0) + data.get("stale_hits", 0)),
+            ("ka_cache_misses_total", "counter", "缓存未命中次数", labels, data.get("misses", 0)),
+            ("ka_cache_hit_ratio", "gauge", "缓存命中率", labels, data.get("hit_ratio", 0.0)),
+        ]
+    register_collector(collect)
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+
+    # 同名指标需要连续输出，按名称分组
+    grouped: Dict[str, List[Sample]] = {}
+    for collector in _collectors:
+        try:
+            for sample in collector():
+                grouped.setdefault(sample[0], []).append(sample)
+        except Exception as e:
+            print(f"采集指标失败: {e}")
+    for name, samples in grouped.items():
+        _, kind, documentation, _, _ = samples[0]
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {kind}")
+        for _, _, _, labels, value in samples:
+            lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# 各处埋点共用的指标
+stage_seconds = Histogram(
+    "ka_stage_seconds", "各处理阶段耗时（秒）", ["stage"]
+)
+upstream_requests = Counter(
+    "ka_upstream_requests_total", "上游请求次数，按上游和状态码（网络错误为 error）", ["upstream", "status"]
+)
+upstream_seconds = Histogram(
+    "ka_upstream_request_seconds", "单次上游请求耗时（秒，不含限流等待）", ["upstream"]
+)
+llm_tokens = Counter(
+    "ka_llm_tokens_total", "大模型消耗的 token 数（取自 DashScope 返回的 usage）", ["model", "kind"]
+)
+analyses_inflight = Gauge(
+    "ka_analyses_inflight", "本进程正在分析的视频数"
+)
+http_request_seconds = Histogram(
+    "ka_http_request_seconds", "HTTP 接口耗时（秒）", ["method", "route", "status"]
+)
+
+
+def record_llm_usage(model: str, usage: Optional[Dict]):
+    if not usage:
+        return
+    for kind in ("input_tokens", "output_tokens"):
+        if usage.get(kind):
+            llm_tokens.inc(usage[kind], model=model, kind=kind[:-len("_tokens")])
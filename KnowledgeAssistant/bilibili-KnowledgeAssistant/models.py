@@ -20,6 +20,7 @@ class VideoBase(BaseModel):
 class VideoItem(VideoBase):
     description: Optional[str] = None
     duration: str = Field(..., description="视频时长")
+    duration_seconds: Optional[int] = Field(None, description="视频时长（秒）")
     play: int = 0
     danmaku: int = 0
     pubdate: Optional[datetime] = None
@@ -47,6 +48,10 @@ class AnalysisRequest(BaseModel):
     videos: List[VideoItem]
     analysis_type: str = "summary"  # summary, detailed, educational, etc.
 
+class TopicRequest(BaseModel):
+    topic: str = Field(..., description="主题名称")
+    videos: List[VideoItem]
+
 class AnalysisResponse(BaseModel):
     status: str
     task_id: Optional[str] = None
@@ -85,6 +90,34 @@ class KnowledgeItem(BaseModel):
     updated_at: datetime = Field(default_factory=datetime.now)
 
 
+class KnowledgeDraft(BaseModel):
+    """批量保存/导入的知识库项，id 和创建时间可省略"""
+    id: Optional[str] = None
+    bvid: str
+    title: str
+    author: str
+    markdown_content: str
+    analysis_type: str
+    tags: List[str] = []
+    is_favorite: bool = False
+    created_at: Optional[datetime] = None
+
+
+class KnowledgeBulkSave(BaseModel):
+    items: List[KnowledgeDraft] = Field(..., max_length=1000)
+
+
+class KnowledgeBulkDelete(BaseModel):
+    ids: List[str] = Field(..., max_length=1000)
+
+
+class KnowledgeBulkUpdate(BaseModel):
+    ids: List[str] = Field(..., max_length=1000)
+    is_favorite: Optional[bool] = None
+    add_tags: List[str] = []
+    remove_tags: List[str] = []
+
+
 class VideoExportRequest(BaseModel):
     videos: List[VideoItem]
     keyword: str
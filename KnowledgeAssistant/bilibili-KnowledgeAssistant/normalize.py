@@ -0,0 +1,143 @@
+import html
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from models import VideoItem
+
+# B站搜索结果的规范化：标题/简介中的 <em class="keyword"> 高亮和 HTML 实体、
+# 时长字符串、发布时间戳、播放量等字段一次性转换成 VideoItem 需要的类型
+
+_TAG = re.compile(r"<[^>]*>")
+
+VIDEO_URL = "https://www.bilibili.com/video/{}"
+_VIDEO_URL_PREFIX = VIDEO_URL.format("")
+
+
+def clean_html_tags(text: Optional[str]) -> str:
+    """去掉HTML标签（保留 <em> 高亮中的关键词），解码HTML实体，合并空白"""
+    if not text:
+        return ""
+    if "<" in text:
+        # B站只用 <em class="keyword"> 标出关键词，先直接替换，还有其他标签时再用正则
+        text = text.replace('<em class="keyword">', "").replace("</em>", "")
+        if "<" in text:
+            text = _TAG.sub("", text)
+    if "&" in text:
+        text = text.replace("&lt;", "<").replace("&gt;", ">").replace("&quot;", '"').replace("&#39;", "'")
+        if "&" in text:
+            # 剩下的都是 &amp; 时直接替换（放在最后，"&amp;lt;" 只解码一次），还有其他实体时交给 html.unescape
+            if text.count("&") == text.count("&amp;"):
+                text = text.replace("&amp;", "&")
+            else:
+                text = html.unescape(text)
+    # 除空格外的空白字符都不是 printable，没有连续空格和首尾空格时无需再合并
+    if text.isprintable() and "  " not in text and text[:1] != " " and text[-1:] != " ":
+        return text
+    return " ".join(text.split())
+
+
+def parse_duration(value: Any) -> Optional[int]:
+    """
+    '1:02:03' / '12:34' / 秒数 -> 秒数；无法解析、含负数或非首位的分/秒不小于 60 时返回 None
+    """
+    if isinstance(value, int):
+        return value if value >= 0 else None
+    if not value:
+        return None
+    seconds = 0
+    for i, part in enumerate(str(value).split(":")):
+        part = part.strip()
+        # isdecimal 排除了负号、小数点等
+        if not part.isdecimal():
+            return None
+        number = int(part)
+        if i and number >= 60:
+            return None
+        seconds = seconds * 60 + number
+    return seconds
+
+
+def format_duration(seconds: Optional[int]) -> str:
+    if seconds is None:
+        return ""
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def _duration(value: Any) -> Tuple[Optional[int], str]:
+    """(秒数, 规范化的时长字符串)；搜索结果的时长几乎都是 'M:SS'，单独走快速路径"""
+    if type(value) is str:
+        minutes, sep, seconds = value.partition(":")
+        if sep and minutes.isdecimal() and seconds.isdecimal():
+            seconds = int(seconds)
+            if seconds >= 60:
+                return None, ""
+            minutes = int(minutes)
+            if minutes < 60:
+                return minutes * 60 + seconds, f"{minutes:02d}:{seconds:02d}"
+            return minutes * 60 + seconds, f"{minutes // 60}:{minutes % 60:02d}:{seconds:02d}"
+    total = parse_duration(value)
+    return total, format_duration(total)
+
+
+def parse_count(value: Any) -> int:
+    """播放量、弹幕数：整数原样返回，'--' 等占位符按 0 处理"""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = value.strip()
+        return int(value) if value.isdecimal() else 0
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def parse_pubdate(value: Any) -> Optional[datetime]:
+    """Unix 时间戳 -> datetime"""
+    if not value:
+        return None
+    try:
+        return datetime.fromtimestamp(int(value))
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+
+
+def video_fields(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """把一条原始搜索结果转换为 VideoItem 的字段（键顺序与模型一致，值已是目标类型）"""
+    get = raw.get
+    bvid = get("bvid") or ""
+    seconds, duration = _duration(get("duration"))
+    play = get("play")
+    danmaku = get("danmaku") if "danmaku" in raw else get("video_review")
+    pubdate = get("pubdate")
+    return {
+        "bvid": bvid,
+        "title": clean_html_tags(get("title")),
+        "author": get("author") or "",
+        "description": clean_html_tags(get("description")) or None,
+        "duration": duration,
+        "duration_seconds": seconds,
+        "play": play if type(play) is int else parse_count(play),
+        "danmaku": danmaku if type(danmaku) is int else parse_count(danmaku),
+        "pubdate": datetime.fromtimestamp(pubdate) if type(pubdate) is int and pubdate > 0 else parse_pubdate(pubdate),
+        "url": _VIDEO_URL_PREFIX + bvid,
+        "avid": str(get("aid") or ""),
+    }
+
+
+def to_video_item(raw: Dict[str, Any]) -> VideoItem:
+    """单条结果转换为 VideoItem（NDJSON 流式输出时逐条使用）"""
+    return VideoItem.model_validate(video_fields(raw))
+
+
+def normalize_results(results: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    批量转换为 VideoItem 字段字典：循环中不逐条构造模型（model_construct 在 pydantic 2 中比校验还慢），
+    接口返回时由 response_model=SearchResponse 统一校验一次
+    """
+    return [video_fields(raw) for raw in results]
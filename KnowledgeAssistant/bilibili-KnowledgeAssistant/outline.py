@@ -0,0 +1,110 @@
+import re
+from typing import Dict, List, Optional
+
+# Markdown -> 大纲树（思维导图 JSON）
+# 节点：{"id": "0.1.2", "text": "...", "children": [...]}，可选 "links"、"sources"
+# 标题按级别嵌套，列表项按缩进挂在最近的标题下，正文段落忽略
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_LIST_ITEM = re.compile(r"^(\s*)(?:[-*+]|\d+[.)])\s+(.*)$")
+_LINK = re.compile(r"\[([^\]]*)\]\(([^)\s]+)[^)]*\)")
+_BVID = re.compile(r"\bBV[0-9A-Za-z]{10}\b")
+# 文本末尾的出处标注，如 [BV1xxxxxxxxx, BV1yyyyyyyyy]
+_SOURCE_REFS = re.compile(r"\s*[\[（(]\s*BV[0-9A-Za-z]{10}(?:\s*[,，、]\s*BV[0-9A-Za-z]{10})*\s*[\]）)]")
+_EMPHASIS = re.compile(r"(\*\*|__|\*|_|`)(.+?)\1")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+
+
+def _node(text: str) -> Dict:
+    node = {"text": "", "children": []}
+    links = [{"text": label, "url": url} for label, url in _LINK.findall(text)]
+    if links:
+        node["links"] = links
+    sources = sorted(set(_BVID.findall(text)))
+    if sources:
+        node["sources"] = sources
+    text = _SOURCE_REFS.sub("", _LINK.sub(r"\1", text))
+    node["text"] = _EMPHASIS.sub(r"\2", text).strip()
+    return node
+
+
+def _assign_ids(node: Dict, node_id: str):
+    node["id"] = node_id
+    for index, child in enumerate(node["children"]):
+        _assign_ids(child, f"{node_id}.{index}")
+
+
+def parse_outline(markdown: str, title: Optional[str] = None) -> Dict:
+    """
+    解析 Markdown 为大纲树；顶层只有一个节点（通常是一级标题）时以它为根，否则以 title 为根
+    """
+    root = {"text": title or "", "children": []}
+    # 标题栈：(级别, 节点)；列表栈：(缩进, 节点)
+    headings: List = [(0, root)]
+    items: List = []
+    in_fence = False
+
+    for line in markdown.splitlines():
+        if _FENCE.match(line):
+            in_fence = not in_fence
+            continue
+        if in_fence or not line.strip():
+            continue
+
+        match = _HEADING.match(line)
+        if match:
+            level = len(match.group(1))
+            while headings[-1][0] >= level:
+                headings.pop()
+            node = _node(match.group(2))
+            headings[-1][1]["children"].append(node)
+            headings.append((level, node))
+            items = []
+            continue
+
+        match = _LIST_ITEM.match(line)
+        if match:
+            indent = len(match.group(1).expandtabs(4))
+            while items and items[-1][0] >= indent:
+                items.pop()
+            parent = items[-1][1] if items else headings[-1][1]
+            node = _node(match.group(2))
+            parent["children"].append(node)
+            items.append((indent, node))
+
+    if len(root["children"]) == 1:
+        root = root["children"][0]
+    _assign_ids(root, "0")
+    return root
+
+
+def count_nodes(node: Dict) -> int:
+    return 1 + sum(count_nodes(child) for child in node["children"])
+
+
+def find_node(root: Dict, node_id: str) -> Optional[Dict]:
+    """按节点 id（从根开始的下标路径，如 "0.1.2"）查找子树，不存在时返回 None"""
+    parts = node_id.split(".")
+    if parts[0] != root["id"]:
+        return None
+    node = root
+    for part in parts[1:]:
+        if not part.isdigit() or int(part) >= len(node["children"]):
+            return None
+        node = node["children"][int(part)]
+    return node
+
+
+def prune(node: Dict, depth: int) -> Dict:
+    """
+    只保留 depth 层子节点，更深的子节点不返回，改为在节点上记录 "more": 子节点数，
+    前端展开该节点时再按 id 请求子树
+    """
+    pruned = {key: value for key, value in node.items() if key != "children"}
+    if depth <= 0:
+        if node["children"]:
+            pruned["more"] = len(node["children"])
+        pruned["children"] = []
+    else:
+        pruned["children"] = [prune(child, depth - 1) for child in node["children"]]
+    return pruned
@@ -0,0 +1,95 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+
+import config
+from doc_catalog import content_hash
+from outline import find_node, parse_outline, prune
+
+
+def outline_key(sha256: str, title: Optional[str] = None) -> str:
+    """
+    大纲缓存键：顶层有多个节点时大纲以 title 为根，所以键由内容哈希和标题共同决定；
+    没有标题时就是内容哈希
+    """
+    return content_hash(f"{sha256}\n{title}") if title else sha256
+
+
+class OutlineCache:
+    """
+    文档大纲缓存：每个文档只解析一次，以内容哈希和标题为键存为紧凑 JSON，
+    文档内容或标题变化后键随之变化，不需要主动失效；最近使用的大纲同时保留在内存中，
+    前端逐层展开子树时不必重复读文件
+    """
+
+    def __init__(self, cache_dir, memory_entries: int = 64):
+        self.cache_dir = Path(cache_dir)
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _remember(self, key: str, tree: Dict):
+        with self._lock:
+            self._memory[key] = tree
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def lookup(self, sha256: str, title: Optional[str] = None) -> Optional[Dict]:
+        """按内容哈希和标题取已解析的大纲，没有缓存时返回 None"""
+        key = outline_key(sha256, title)
+        with self._lock:
+            tree = self._memory.get(key)
+            if tree is not None:
+                self._memory.move_to_end(key)
+                return tree
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                tree = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        self._remember(key, tree)
+        return tree
+
+    def build(self, content: str, title: Optional[str] = None, sha256: Optional[str] = None) -> Dict:
+        """解析文档并写入缓存（已有缓存时直接返回）"""
+        sha256 = sha256 or content_hash(content)
+        tree = self.lookup(sha256, title)
+        if tree is not None:
+            return tree
+        tree = parse_outline(content, title=title)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        key = outline_key(sha256, title)
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(tree, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+        self._remember(key, tree)
+        return tree
+
+
+outline_cache = OutlineCache(config.OUTLINE_CACHE_DIR, config.OUTLINE_MEMORY_ENTRIES)
+
+
+def outline_response(request: Request, sha256: str, tree: Dict, node: str, depth: int,
+                     title: Optional[str] = None, **extra):
+    """
+    返回大纲中以 node 为根、展开 depth 层的子树；ETag 由内容哈希、标题和请求的子树决定
+    """
+    subtree = find_node(tree, node)
+    if subtree is None:
+        raise HTTPException(status_code=404, detail="大纲节点不存在")
+    etag = f'"{outline_key(sha256, title)}-{node}-{depth}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse({**extra, "sha256": sha256, "node": prune(subtree, depth)}, headers={"ETag": etag})
@@ -0,0 +1,197 @@
+from string import Formatter
+from typing import Dict, List, Optional, Tuple
+
+import config
+from subtitle import estimate_tokens
+
+# 提示词模板与模型路由：
+#   每种 analysis_type 对应一个模型档位、一个字幕 token 预算和一套模板，
+#   简单的摘要走便宜快速的模型，详细分析和教学笔记走能力更强的模型
+
+
+class PromptTemplate:
+    """
+    预先解析好的提示词模板：构造时把模板拆成 (文本, 字段名) 片段，
+    渲染时只做拼接；模板固定文本的 token 数也只计算一次
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self._parts: List[Tuple[str, Optional[str]]] = [
+            (literal, field) for literal, field, _, _ in Formatter().parse(text)
+        ]
+        self.fields = [field for _, field in self._parts if field]
+        self.overhead_tokens = estimate_tokens("".join(literal for literal, _ in self._parts))
+
+    def render(self, **values) -> str:
+        return "".join(literal + (str(values[field]) if field else "") for literal, field in self._parts)
+
+
+class ModelRoute:
+    def __init__(self, model: str, subtitle_budget: int, template: PromptTemplate,
+                 fallback_template: PromptTemplate):
+        self.model = model
+        # 字幕部分允许的最大 token 数，超出时先分段摘要，仍超出时截断
+        self.subtitle_budget = subtitle_budget
+        self.template = template
+        # 没有字幕时使用的模板
+        self.fallback_template = fallback_template
+
+
+SYSTEM_PROMPT = "你是一个专业的知识整理助手，擅长从视频内容中提取关键信息并生成结构化的学习笔记。"
+
+_VIDEO_INFO = """视频标题：{title}
+UP主：{author}
+视频时长：{duration}
+更新时间：{pubdate}
+"""
+
+SUMMARY_TEMPLATE = PromptTemplate("""
+请简要总结以下B站视频的内容：
+
+""" + _VIDEO_INFO + """
+视频字幕内容：
+{subtitle}
+
+请用Markdown输出：
+1. 一段话的视频概要
+2. 不超过8条的核心知识点列表
+""")
+
+DETAILED_TEMPLATE = PromptTemplate("""
+请分析以下B站视频内容并生成详细的学习笔记：
+
+""" + _VIDEO_INFO + """
+视频字幕内容：
+{subtitle}
+
+请生成结构化的Markdown文档，包括：
+1. 视频概要
+2. 核心知识点
+3. 详细内容解析
+4. 学习要点总结
+5. 相关拓展思考
+""")
+
+EDUCATIONAL_TEMPLATE = PromptTemplate("""
+请把以下B站视频整理成一份教学讲义：
+
+""" + _VIDEO_INFO + """
+视频字幕内容：
+{subtitle}
+
+请生成结构化的Markdown文档，包括：
+1. 学习目标
+2. 前置知识
+3. 知识点讲解（按视频顺序，保留关键时间戳和例子）
+4. 练习题与参考答案
+5. 复习要点
+""")
+
+NO_SUBTITLE_TEMPLATE = PromptTemplate("""
+请基于以下B站视频信息生成学习笔记：
+
+""" + _VIDEO_INFO + """视频链接：{url}
+
+由于无法获取字幕内容，请根据视频标题和基本信息进行分析，生成包含：
+1. 基于标题的内容推测
+2. 可能的知识点分析
+3. 学习建议
+4. 相关资源推荐
+
+请用Markdown格式输出。
+""")
+
+CHUNK_TEMPLATE = PromptTemplate("""
+以下是B站视频《{title}》字幕的第 {index}/{total} 部分：
+
+{chunk}
+
+请按时间顺序概括这一部分讲解的主要内容和知识点，保留关键的时间戳、术语、公式和例子，用简洁的Markdown列表输出。
+""")
+
+TOPIC_TEMPLATE = PromptTemplate("""
+以下是关于主题「{topic}」的多个B站视频，以及从它们的摘要中整理并去重后的知识点
+（方括号内为出处视频的BV号，按被提及的视频数从多到少排列）：
+
+视频列表：
+{videos}
+
+知识点：
+{points}
+
+请把这些知识点整合成一份关于该主题的层级大纲，用Markdown输出：
+1. 一级标题为主题名称
+2. 二级标题为分主题，三级标题为更细的分类，知识点用列表项
+3. 合并重复内容，按由浅入深的学习顺序组织
+4. 在知识点末尾保留出处BV号，如 [BV1xxxxxxxxx]
+""")
+
+
+def _route_models() -> Dict[str, str]:
+    """TONGYI_MODEL_ROUTES 形如 summary=qwen-turbo,detailed=qwen-max"""
+    routes = {}
+    for pair in config.TONGYI_MODEL_ROUTES.split(","):
+        if "=" in pair:
+            analysis_type, model = pair.split("=", 1)
+            routes[analysis_type.strip()] = model.strip()
+    return routes
+
+
+_models = _route_models()
+
+MODEL_ROUTES: Dict[str, ModelRoute] = {
+    "summary": ModelRoute(_models.get("summary", config.TONGYI_DEFAULT_MODEL),
+                          config.SUBTITLE_TOKEN_BUDGET // 2, SUMMARY_TEMPLATE, NO_SUBTITLE_TEMPLATE),
+    "detailed": ModelRoute(_models.get("detailed", config.TONGYI_DEFAULT_MODEL),
+                           config.SUBTITLE_TOKEN_BUDGET, DETAILED_TEMPLATE, NO_SUBTITLE_TEMPLATE),
+    "educational": ModelRoute(_models.get("educational", config.TONGYI_DEFAULT_MODEL),
+                              config.SUBTITLE_TOKEN_BUDGET, EDUCATIONAL_TEMPLATE, NO_SUBTITLE_TEMPLATE),
+}
+
+# 字幕分段摘要（map 阶段）只做概括，使用便宜的模型
+CHUNK_MODEL = _models.get("chunk", config.TONGYI_DEFAULT_MODEL)
+# 主题汇总（reduce）需要整合大量知识点，使用能力更强的模型
+TOPIC_MODEL = _models.get("topic", config.TONGYI_DEFAULT_MODEL)
+
+
+def get_route(analysis_type: str) -> ModelRoute:
+    """未知的 analysis_type 按详细分析处理"""
+    return MODEL_ROUTES.get(analysis_type) or MODEL_ROUTES["detailed"]
+
+
+def trim_to_budget(text: str, max_tokens: int) -> str:
+    """按行保留文本直到用完 token 预算；单行超出时按字符截断"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    kept = []
+    used = 0
+    for line in text.splitlines():
+        tokens = estimate_tokens(line) + 1
+        if used + tokens > max_tokens:
+            remaining = max_tokens - used
+            if remaining > 0 and not kept:
+                kept.append(line[:remaining])
+            break
+        kept.append(line)
+        used += tokens
+    return "\n".join(kept)
+
+
+def build_prompt(video, subtitle: Optional[str], analysis_type: str) -> str:
+    """根据 analysis_type 选择模板，字幕按该档位的 token 预算截断"""
+    route = get_route(analysis_type)
+    values = {
+        "title": video.title,
+        "author": video.author,
+        "duration": video.duration,
+        "pubdate": video.pubdate or "未知",
+        "url": video.url,
+    }
+    if not subtitle:
+        return route.fallback_template.render(**values)
+    return route.template.render(subtitle=trim_to_budget(subtitle, route.subtitle_budget), **values)
+
+
+def build_chunk_prompt(title: str, index: int, total: int, chunk: str) -> str:
+    return CHUNK_TEMPLATE.render(title=title, index=index, total=total, chunk=chunk)
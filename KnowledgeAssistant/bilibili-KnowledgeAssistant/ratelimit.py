@@ -0,0 +1,90 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+import config
+import metrics
+
+
+class RateLimiter:
+    """
+    自适应令牌桶限流器：按 rate 个/秒发放令牌，最多积累 burst 个；
+    上游返回限流/风控响应时 penalize() 把速率减半并暂停发放令牌，
+    之后每次成功 reward() 按配置速率的 5% 逐步恢复（加性增、乘性减）
+    """
+
+    def __init__(self, rate: float, burst: int = 1, min_factor: float = config.RATE_MIN_FACTOR):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = rate * min_factor
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """等待直到拿到一个令牌"""
+        if self.max_rate <= 0 and not self.paused_until:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                if self.max_rate <= 0:
+                    return
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def penalize(self, retry_after: Optional[float] = None):
+        """上游返回 412/429 等限流响应：速率减半，并在 retry_after（默认一个令牌间隔）内暂停发放"""
+        now = time.monotonic()
+        if self.max_rate > 0:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0
+            self.updated = now
+        pause = retry_after if retry_after is not None else (1 / self.rate if self.rate > 0 else 0)
+        self.paused_until = max(self.paused_until, now + pause)
+
+    def reward(self):
+        """请求成功：速率逐步恢复到配置值"""
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+# 每个上游主机一个限流器：tongyi -> dashscope.aliyuncs.com，bilibili -> api.bilibili.com
+# 多进程部署时每个进程只使用 1/WORKERS 的配额，合计不超过配置的 QPS
+_limiters: Dict[str, RateLimiter] = {
+    "tongyi": RateLimiter(config.TONGYI_QPS / config.WORKERS),
+    "bilibili": RateLimiter(config.BILIBILI_QPS / config.WORKERS),
+}
+
+
+def get_limiter(upstream: str) -> RateLimiter:
+    """获取指定上游的限流器，未配置的上游不限流"""
+    if upstream not in _limiters:
+        _limiters[upstream] = RateLimiter(0)
+    return _limiters[upstream]
+
+
+
+def _collect_rates():
+    return [("ka_ratelimit_rate", "gauge", "各上游当前允许的请求速率（次/秒，0 表示不限流）", {"upstream": name},
+             limiter.rate)
+            for name, limiter in _limiters.items()]
+
+
+metrics.register_collector(_collect_rates)
@@ -1,18 +1,169 @@
-from fastapi import APIRouter, HTTPException
-from typing import List,Dict
-from models import KnowledgeItem
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from typing import List,Dict,Optional
+from models import KnowledgeItem, KnowledgeDraft, KnowledgeBulkSave, KnowledgeBulkDelete, KnowledgeBulkUpdate
+from knowledge_store import knowledge_store
+from outline_cache import outline_cache, outline_response
+from doc_catalog import content_hash
+import search_index
+import exporter
+import metrics
+from vector_index import vector_index
 import uuid
+import asyncio
+from datetime import datetime
+from pydantic import ValidationError
 
 repository = APIRouter()
 
-# 内存中存储知识库项（生产环境应该用数据库）
-knowledge_base: Dict[str, KnowledgeItem] = {}
+# 导入时每批写入的条数
+IMPORT_BATCH_SIZE = 500
 
 
 @repository.get("/knowledge", response_model=List[KnowledgeItem])
-async def get_knowledge_items():
-    """获取所有知识库项"""
-    return list(knowledge_base.values())
+async def get_knowledge_items(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    bvid: Optional[str] = None,
+    author: Optional[str] = None,
+    analysis_type: Optional[str] = None,
+    is_favorite: Optional[bool] = None
+):
+    """
+    分页获取知识库项（按创建时间倒序）
+    下一页的游标放在响应头 X-Next-Cursor 中，没有下一页时不返回该响应头
+    """
+    try:
+        items, next_cursor = await asyncio.to_thread(
+            knowledge_store.list,
+            limit=limit,
+            cursor=cursor,
+            bvid=bvid,
+            author=author,
+            analysis_type=analysis_type,
+            is_favorite=is_favorite
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
+
+
+def _iter_knowledge(**filters):
+    """按游标逐页读取知识库项，任意时刻只有一页在内存中"""
+    cursor = None
+    while True:
+        items, cursor = knowledge_store.list(limit=500, cursor=cursor, **filters)
+        for item in items:
+            yield item.model_dump()
+        if not cursor:
+            return
+
+
+@repository.get("/knowledge/export")
+async def export_knowledge_items(
+    format: str = "csv",
+    background: bool = False,
+    bvid: Optional[str] = None,
+    author: Optional[str] = None,
+    analysis_type: Optional[str] = None,
+    is_favorite: Optional[bool] = None
+):
+    """
+    导出知识库（format: csv / xlsx / parquet / ndjson），默认直接下载；
+    ndjson 每行一个完整的知识库项，可通过 /knowledge/import 导入；
+    background=true 时在后台生成，返回下载地址
+    """
+    exporter.check_format(format)
+    columns = list(KnowledgeItem.model_fields)
+    rows = _iter_knowledge(bvid=bvid, author=author, analysis_type=analysis_type, is_favorite=is_favorite)
+    if background:
+        return exporter.start_background_export(format, "知识库", columns, rows)
+    return await exporter.stream_export(format, "知识库", columns, rows)
+
+
+@repository.get("/search")
+async def search_knowledge(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    kind: Optional[str] = Query(None, description="knowledge 或 document")
+):
+    """
+    全文检索知识库项和已生成的Markdown文档，按相关度排序并返回命中片段
+    """
+    with metrics.stage_seconds.time(stage="fulltext_search"):
+        results = await asyncio.to_thread(search_index.search, q, limit, kind)
+    return {
+        "query": q,
+        "count": len(results),
+        "results": results
+    }
+
+
+@repository.get("/semantic-search")
+async def semantic_search(q: str = Query(..., min_length=1), k: int = Query(10, ge=1, le=50)):
+    """
+    按语义相似度检索知识库项
+    """
+    with metrics.stage_seconds.time(stage="semantic_search"):
+        matches = await vector_index.search(q, k=k)
+    return {
+        "query": q,
+        "results": await asyncio.to_thread(_with_items, matches)
+    }
+
+
+@repository.get("/knowledge/{knowledge_id}/related")
+async def related_knowledge(knowledge_id: str, k: int = Query(5, ge=1, le=50)):
+    """
+    获取与指定知识库项语义相近的其他项
+    """
+    if await asyncio.to_thread(knowledge_store.get, knowledge_id) is None:
+        raise HTTPException(status_code=404, detail="知识库项不存在")
+    matches = await vector_index.related(knowledge_id, k)
+    return {
+        "knowledge_id": knowledge_id,
+        "related": await asyncio.to_thread(_with_items, matches)
+    }
+
+
+@repository.get("/knowledge/{knowledge_id}/outline")
+async def knowledge_outline(
+    knowledge_id: str,
+    request: Request,
+    node: str = "0",
+    depth: int = Query(2, ge=0, le=20)
+):
+    """
+    知识库项的大纲树（思维导图），只返回 node 节点下 depth 层，
+    带有 "more" 的节点展开时以其 id 作为 node 再次请求
+    """
+    item = await asyncio.to_thread(knowledge_store.get, knowledge_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="知识库项不存在")
+    sha256 = content_hash(item.markdown_content)
+    tree = outline_cache.lookup(sha256, item.title)
+    if tree is None:
+        tree = await asyncio.to_thread(outline_cache.build, item.markdown_content, item.title, sha256)
+    return outline_response(request, sha256, tree, node, depth, title=item.title, id=item.id, bvid=item.bvid)
+
+
+def _with_items(matches: List[Dict]) -> List[Dict]:
+    """给向量检索结果补上知识库项的标题等信息，跳过已不存在的项"""
+    results = []
+    for match in matches:
+        item = knowledge_store.get(match["id"])
+        if item is not None:
+            results.append({
+                "id": item.id,
+                "bvid": item.bvid,
+                "title": item.title,
+                "author": item.author,
+                "score": match["score"],
+                "chunk": match["chunk"]
+            })
+    return results
 
 
 @repository.post("/knowledge/save")
@@ -29,7 +180,18 @@ async def save_to_knowledge(bvid: str, markdown_content: str, title: str, author
         analysis_type=analysis_type
     )
 
-    knowledge_base[knowledge_id] = knowledge_item
+    def save():
+        knowledge_store.save(knowledge_item)
+        search_index.index_knowledge_item(knowledge_item)
+
+    with metrics.stage_seconds.time(stage="knowledge_save"):
+        await asyncio.to_thread(save)
+    try:
+        with metrics.stage_seconds.time(stage="vector_index"):
+            await vector_index.add_item(knowledge_id, f"{title}\n\n{markdown_content}")
+    except Exception as e:
+        # 向量化失败不影响保存，只是暂时无法被语义检索到
+        print(f"向量化失败 {knowledge_id}: {e}")
 
     return {
         "message": "保存成功",
@@ -41,26 +203,157 @@ async def save_to_knowledge(bvid: str, markdown_content: str, title: str, author
 @repository.post("/knowledge/{knowledge_id}/favorite")
 async def toggle_favorite(knowledge_id: str):
     """切换收藏状态"""
-    if knowledge_id not in knowledge_base:
+    is_favorite = await asyncio.to_thread(knowledge_store.toggle_favorite, knowledge_id)
+    if is_favorite is None:
         raise HTTPException(status_code=404, detail="知识库项不存在")
 
-    knowledge_base[knowledge_id].is_favorite = not knowledge_base[knowledge_id].is_favorite
-
     return {
         "message": "收藏状态已更新",
-        "is_favorite": knowledge_base[knowledge_id].is_favorite
+        "is_favorite": is_favorite
     }
 
 
 @repository.delete("/knowledge/{knowledge_id}")
 async def delete_knowledge_item(knowledge_id: str):
     """删除知识库项"""
-    if knowledge_id not in knowledge_base:
-        raise HTTPException(status_code=404, detail="知识库项不存在")
+    def delete() -> Optional[KnowledgeItem]:
+        deleted = knowledge_store.delete(knowledge_id)
+        if deleted is not None:
+            search_index.remove_knowledge_item(knowledge_id)
+            vector_index.remove_item(knowledge_id)
+        return deleted
 
-    deleted_item = knowledge_base.pop(knowledge_id)
+    deleted_item = await asyncio.to_thread(delete)
+    if deleted_item is None:
+        raise HTTPException(status_code=404, detail="知识库项不存在")
 
     return {
         "message": "删除成功",
         "deleted_item": deleted_item
-    }
\ No newline at end of file
+    }
+
+def _draft_to_item(draft: KnowledgeDraft) -> KnowledgeItem:
+    now = datetime.now()
+    return KnowledgeItem(
+        id=draft.id or str(uuid.uuid4()),
+        bvid=draft.bvid,
+        title=draft.title,
+        author=draft.author,
+        markdown_content=draft.markdown_content,
+        analysis_type=draft.analysis_type,
+        tags=draft.tags,
+        is_favorite=draft.is_favorite,
+        created_at=draft.created_at or now,
+        updated_at=now
+    )
+
+
+async def _save_items(items: List[KnowledgeItem], vectorize: bool = True) -> Dict:
+    """批量写入知识库和全文索引（各一个事务），再整批向量化（一次向量化调用、一个事务）"""
+    with metrics.stage_seconds.time(stage="knowledge_save"):
+        saved = await asyncio.to_thread(knowledge_store.save_many, items)
+        await asyncio.to_thread(search_index.index_knowledge_items, [item for item, _ in saved])
+    if vectorize and saved:
+        try:
+            with metrics.stage_seconds.time(stage="vector_index"):
+                await vector_index.add_items(
+                    (item.id, f"{item.title}\n\n{item.markdown_content}") for item, _ in saved
+                )
+        except Exception as e:
+            # 向量化失败不影响保存，只是暂时无法被语义检索到
+            print(f"向量化失败（{len(saved)} 项）: {e}")
+    created = sum(1 for _, is_new in saved if is_new)
+    return {
+        "created": created,
+        "updated": len(saved) - created,
+        "items": [
+            {"id": item.id, "bvid": item.bvid, "analysis_type": item.analysis_type, "created": is_new}
+            for item, is_new in saved
+        ]
+    }
+
+
+@repository.post("/knowledge/bulk/save")
+async def bulk_save_knowledge(request: KnowledgeBulkSave):
+    """
+    批量保存分析结果到知识库（一个事务）
+    按 (bvid, analysis_type) 去重：知识库中已有的项会被更新而不是重复新建
+    """
+    result = await _save_items([_draft_to_item(draft) for draft in request.items])
+    return {"message": "保存成功", **result}
+
+
+@repository.post("/knowledge/bulk/delete")
+async def bulk_delete_knowledge(request: KnowledgeBulkDelete):
+    """批量删除知识库项（一个事务），返回实际删除的 id 和不存在的 id"""
+    def delete() -> List[str]:
+        deleted_ids = [item.id for item in knowledge_store.delete_many(request.ids)]
+        search_index.remove_knowledge_items(deleted_ids)
+        vector_index.remove_items(deleted_ids)
+        return deleted_ids
+
+    deleted_ids = await asyncio.to_thread(delete)
+    found = set(deleted_ids)
+    return {
+        "message": "删除成功",
+        "deleted": deleted_ids,
+        "missing": [knowledge_id for knowledge_id in dict.fromkeys(request.ids) if knowledge_id not in found]
+    }
+
+
+@repository.post("/knowledge/bulk/update")
+async def bulk_update_knowledge(request: KnowledgeBulkUpdate):
+    """批量设置收藏状态（is_favorite）、添加/移除标签（一个事务）"""
+    updated = await asyncio.to_thread(
+        knowledge_store.update_many, request.ids, request.is_favorite, request.add_tags, request.remove_tags
+    )
+    return {"message": "更新成功", "updated": updated}
+
+
+@repository.post("/knowledge/import")
+async def import_knowledge(request: Request, vectorize: bool = True):
+    """
+    从 NDJSON 导入知识库：每行一个知识库项（与 format=ndjson 导出的格式相同，id 和时间可省略）
+    请求体边读边解析，每 IMPORT_BATCH_SIZE 条写入一次，内存占用与文件大小无关；
+    按 (bvid, analysis_type) 去重，无法解析的行跳过并在结果中报告行号
+    """
+    totals = {"created": 0, "updated": 0, "failed": 0}
+    errors = []
+    batch: List[KnowledgeItem] = []
+
+    async def flush():
+        if batch:
+            result = await _save_items(batch, vectorize)
+            totals["created"] += result["created"]
+            totals["updated"] += result["updated"]
+            batch.clear()
+
+    async def handle(line_no: int, line: bytearray):
+        if not line.strip():
+            return
+        try:
+            batch.append(_draft_to_item(KnowledgeDraft.model_validate_json(line)))
+        except ValidationError as e:
+            totals["failed"] += 1
+            # 只保留前若干条错误，避免整个文件出错时结果过大
+            if len(errors) < 100:
+                errors.append({"line": line_no, "error": e.errors(include_url=False)[0]["msg"]})
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush()
+
+    line_no = 0
+    # 未读完的一行；只在新到的块里找换行，超长的行也不会被反复拷贝和扫描
+    buffer = bytearray()
+    async for chunk in request.stream():
+        end = chunk.rfind(b"\n")
+        if end < 0:
+            buffer += chunk
+            continue
+        buffer += chunk[:end]
+        for line in buffer.split(b"\n"):
+            line_no += 1
+            await handle(line_no, line)
+        buffer = bytearray(chunk[end + 1:])
+    await handle(line_no + 1, buffer)
+    await flush()
+    return {"message": "导入完成", **totals, "errors": errors}
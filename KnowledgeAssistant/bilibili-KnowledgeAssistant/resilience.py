@@ -0,0 +1,104 @@
+import threading
+import time
+from typing import Dict, Optional
+
+import config
+import metrics
+
+# 上游容错：类型化的上游错误与熔断器
+# 熔断器按上游统计连续失败次数，达到 CIRCUIT_FAILURES 后熔断 CIRCUIT_RESET_SECONDS 秒，
+# 期间请求直接失败（不占用限流配额、不发出请求）；到期后放行一个试探请求，成功则恢复，失败则继续熔断
+
+
+class UpstreamError(Exception):
+    """上游请求失败（已按策略重试），status 为 HTTP 状态码，code 为上游业务错误码"""
+
+    def __init__(self, upstream: str, message: str, status: Optional[int] = None, code: Optional[int] = None):
+        super().__init__(f"{upstream}: {message}")
+        self.upstream = upstream
+        self.message = message
+        self.status = status
+        self.code = code
+
+
+class UpstreamThrottled(UpstreamError):
+    """上游限流或风控（HTTP 412/429，或B站的风控错误码）"""
+
+    def __init__(self, upstream: str, message: str, status: Optional[int] = None, code: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(upstream, message, status, code)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamError):
+    """上游处于熔断状态，请求未发出"""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(upstream, f"上游暂不可用，{retry_after:.0f} 秒后重试")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, upstream: str, failures: int, reset_seconds: float):
+        self.upstream = upstream
+        self.max_failures = failures
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def check(self, retry: bool = False):
+        """
+        请求前调用：熔断中直接抛出 CircuitOpenError；到期后只放行一个试探请求
+        retry=True 表示已放行请求的重试，只在其间被其他请求触发熔断时才失败
+        """
+        with self._lock:
+            if self.state == self.CLOSED or (retry and self.state == self.HALF_OPEN):
+                return
+            now = time.monotonic()
+            remaining = self.opened_at + self.reset_seconds - now
+            if remaining <= 0:
+                # 熔断到期（或上一个试探请求迟迟没有结果），放行一个试探请求
+                self.state = self.HALF_OPEN
+                self.opened_at = now
+                return
+        raise CircuitOpenError(self.upstream, max(remaining, 1.0))
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        if self.max_failures <= 0 or self.reset_seconds <= 0:
+            return
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.max_failures:
+                if self.state != self.OPEN:
+                    print(f"上游 {self.upstream} 连续失败 {self.failures} 次，熔断 {self.reset_seconds} 秒")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(upstream: str) -> CircuitBreaker:
+    if upstream not in _breakers:
+        _breakers[upstream] = CircuitBreaker(upstream, config.CIRCUIT_FAILURES, config.CIRCUIT_RESET_SECONDS)
+    return _breakers[upstream]
+
+
+def _collect_breakers():
+    return [("ka_circuit_open", "gauge", "上游是否处于熔断状态（1 熔断 / 0 正常）", {"upstream": name},
+             0 if breaker.state == CircuitBreaker.CLOSED else 1)
+            for name, breaker in _breakers.items()]
+
+
+metrics.register_collector(_collect_breakers)
@@ -0,0 +1,276 @@
+import html
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import config
+import db
+
+try:
+    import jieba
+except ImportError:
+    jieba = None
+
+# 全文检索：文本先在 Python 中分词（有 jieba 用 jieba，否则中日韩文字按二元组切分），
+# 再以空格分隔的形式写入 FTS5，由 FTS5 负责倒排索引和 bm25 排序
+
+_CJK_RUN = re.compile("[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+")
+_WORD = re.compile(r"[0-9a-z]+")
+_SEGMENT = re.compile("([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+|[0-9A-Za-z]+)")
+
+SNIPPET_CHARS = 60
+
+
+def _cjk_tokens(run: str) -> List[str]:
+    if jieba is not None:
+        return [t for t in jieba.cut_for_search(run) if t.strip()]
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for segment in _SEGMENT.findall(text.lower()):
+        if _CJK_RUN.fullmatch(segment):
+            tokens.extend(_cjk_tokens(segment))
+        else:
+            tokens.extend(_WORD.findall(segment))
+    return tokens
+
+
+def _match_expression(query: str) -> str:
+    """把查询转换成 FTS5 MATCH 表达式：所有词都要出现；单个汉字按前缀匹配二元组"""
+    terms = []
+    for token in tokenize(query):
+        quoted = '"' + token.replace('"', '""') + '"'
+        if jieba is None and _CJK_RUN.fullmatch(token) and len(token) == 1:
+            quoted += "*"
+        terms.append(quoted)
+    return " ".join(dict.fromkeys(terms))
+
+
+def make_snippet(content: str, query: str) -> str:
+    """取第一个命中词附近的一段原文，命中词用 <mark> 标出"""
+    words = [w for w in re.split(r"\s+", query.strip()) if w]
+    lower = content.lower()
+    positions = [lower.find(w.lower()) for w in words]
+    positions = [p for p in positions if p >= 0]
+    start = max(0, min(positions) - SNIPPET_CHARS // 2) if positions else 0
+    end = min(len(content), start + SNIPPET_CHARS * 2)
+    snippet = html.escape(content[start:end].replace("\n", " "))
+    for word in sorted(words, key=len, reverse=True):
+        snippet = re.sub(re.escape(html.escape(word)), lambda m: f"<mark>{m.group(0)}</mark>", snippet, flags=re.I)
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(content) else "")
+
+
+class SearchIndex:
+    """
+    增量全文索引：知识库项（knowledge:<id>）和生成的Markdown文档（document:<文件名>）
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        if self._conn is None:
+            conn = db.connect(self.path)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS docs ("
+                "id INTEGER PRIMARY KEY, doc_id TEXT NOT NULL UNIQUE, kind TEXT NOT NULL, ref TEXT NOT NULL, "
+                "title TEXT NOT NULL, content TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            # rowid 与 docs.id 一一对应
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(title, body)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _remove(conn, doc_id: str):
+        row = conn.execute("SELECT id FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()
+        if row is not None:
+            conn.execute("DELETE FROM docs_fts WHERE rowid = ?", (row["id"],))
+            conn.execute("DELETE FROM docs WHERE id = ?", (row["id"],))
+
+    def _index(self, conn, doc_id: str, kind: str, ref: str, title: str, content: str):
+        self._remove(conn, doc_id)
+        cursor = conn.execute(
+            "INSERT INTO docs (doc_id, kind, ref, title, content, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (doc_id, kind, ref, title, content, time.time()),
+        )
+        conn.execute(
+            "INSERT INTO docs_fts (rowid, title, body) VALUES (?, ?, ?)",
+            (cursor.lastrowid, " ".join(tokenize(title)), " ".join(tokenize(content))),
+        )
+
+    def index_document(self, doc_id: str, kind: str, ref: str, title: str, content: str):
+        """新增或更新一篇文档"""
+        self.index_documents([(doc_id, kind, ref, title, content)])
+
+    def index_documents(self, documents: Iterable[Tuple[str, str, str, str, str]]):
+        """在一个事务中新增或更新多篇文档，每项为 (doc_id, kind, ref, title, content)"""
+        with self._lock:
+            conn = self._db()
+            with conn:
+                for document in documents:
+                    self._index(conn, *document)
+
+    def remove_document(self, doc_id: str):
+        self.remove_documents([doc_id])
+
+    def remove_documents(self, doc_ids: Iterable[str]):
+        with self._lock:
+            conn = self._db()
+            with conn:
+                for doc_id in doc_ids:
+                    self._remove(conn, doc_id)
+
+    def indexed(self, kind: str) -> Dict[str, float]:
+        """已索引的某类文档：ref -> 索引时间"""
+        with self._lock:
+            rows = self._db().execute("SELECT ref, updated_at FROM docs WHERE kind = ?", (kind,)).fetchall()
+        return {row["ref"]: row["updated_at"] for row in rows}
+
+    def clear(self):
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.execute("DELETE FROM docs_fts")
+                conn.execute("DELETE FROM docs")
+
+    def search(self, query: str, limit: int = 20, kind: Optional[str] = None) -> List[Dict]:
+        """按 bm25 相关度返回命中的文档（标题权重更高）"""
+        expression = _match_expression(query)
+        if not expression:
+            return []
+        sql = (
+            "SELECT docs.doc_id, docs.kind, docs.ref, docs.title, docs.content, "
+            "bm25(docs_fts, 5.0, 1.0) AS score "
+            "FROM docs_fts JOIN docs ON docs.id = docs_fts.rowid WHERE docs_fts MATCH ?"
+        )
+        params = [expression]
+        if kind:
+            sql += " AND docs.kind = ?"
+            params.append(kind)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._db().execute(sql, params).fetchall()
+        return [
+            {
+                "doc_id": row["doc_id"],
+                "kind": row["kind"],
+                "ref": row["ref"],
+                "title": row["title"],
+                "snippet": make_snippet(row["content"], query),
+                "score": round(-row["score"], 4),
+            }
+            for row in rows
+        ]
+
+
+search_index = SearchIndex(config.SEARCH_INDEX_PATH)
+
+
+def index_knowledge_item(item):
+    search_index.index_document(f"knowledge:{item.id}", "knowledge", item.id, item.title, item.markdown_content)
+
+
+def remove_knowledge_item(knowledge_id: str):
+    search_index.remove_document(f"knowledge:{knowledge_id}")
+
+
+def index_knowledge_items(items):
+    search_index.index_documents(
+        (f"knowledge:{item.id}", "knowledge", item.id, item.title, item.markdown_content) for item in items
+    )
+
+
+def remove_knowledge_items(knowledge_ids):
+    search_index.remove_documents(f"knowledge:{knowledge_id}" for knowledge_id in knowledge_ids)
+
+
+def index_markdown_file(filename: str, title: str, content: str):
+    search_index.index_document(f"document:{filename}", "document", filename, title, content)
+
+
+def search(query: str, limit: int = 20, kind: Optional[str] = None) -> List[Dict]:
+    return search_index.search(query, limit=limit, kind=kind)
+
+
+def _markdown_title(content: str, fallback: str) -> str:
+    for line in content.splitlines():
+        if line.startswith("# "):
+            return line[2:].strip()
+    return fallback
+
+
+def reconcile(batch_size: int = 500) -> Dict[str, int]:
+    """
+    与知识库和文档目录对账：补索引尚未索引（或索引后又被修改）的知识库项和Markdown文档，
+    删除已不存在的项的索引；启动时在文档目录对账之后执行
+    """
+    from doc_catalog import doc_catalog
+    from knowledge_store import knowledge_store
+
+    stats = {"knowledge_added": 0, "knowledge_removed": 0, "documents_added": 0, "documents_removed": 0}
+
+    indexed = search_index.indexed("knowledge")
+    seen = set()
+    cursor = None
+    while True:
+        items, cursor = knowledge_store.list(limit=batch_size, cursor=cursor)
+        seen.update(item.id for item in items)
+        stale = [item for item in items
+                 if item.id not in indexed or item.updated_at.timestamp() > indexed[item.id]]
+        index_knowledge_items(stale)
+        stats["knowledge_added"] += len(stale)
+        if not cursor:
+            break
+    removed = [knowledge_id for knowledge_id in indexed if knowledge_id not in seen]
+    remove_knowledge_items(removed)
+    stats["knowledge_removed"] = len(removed)
+
+    indexed = search_index.indexed("document")
+    seen = set()
+    cursor = None
+    while True:
+        documents, cursor = doc_catalog.list(limit=batch_size, cursor=cursor)
+        batch = []
+        for document in documents:
+            filename = document["filename"]
+            seen.add(filename)
+            if filename in indexed and document["created_at"] <= indexed[filename]:
+                continue
+            try:
+                with open(doc_catalog.output_dir / filename, "r", encoding="utf-8") as f:
+                    content = f.read()
+            except OSError as e:
+                print(f"读取文档失败 {filename}: {e}")
+                continue
+            batch.append((f"document:{filename}", "document", filename, _markdown_title(content, filename), content))
+        search_index.index_documents(batch)
+        stats["documents_added"] += len(batch)
+        if not cursor:
+            break
+    removed = [filename for filename in indexed if filename not in seen]
+    search_index.remove_documents(f"document:{filename}" for filename in removed)
+    stats["documents_removed"] = len(removed)
+    return stats
+
+
+if __name__ == "__main__":
+    # python -m search_index [--rebuild]：补齐全文索引，--rebuild 时清空后全部重建
+    import argparse
+
+    parser = argparse.ArgumentParser(description="全文索引对账/重建")
+    parser.add_argument("--rebuild", action="store_true", help="清空索引后全部重建")
+    args = parser.parse_args()
+    if args.rebuild:
+        search_index.clear()
+    print(reconcile())
@@ -0,0 +1,139 @@
+import json
+import re
+import time
+from typing import Dict, List, Optional
+
+import aiofiles
+
+import config
+import http_client
+import metrics
+from async_cache import AsyncTTLCache, SQLiteCacheBackend
+from resilience import UpstreamError
+
+# 字幕获取流程：view 接口取 cid -> player/v2 取字幕列表 -> 下载字幕 JSON -> 转为带时间戳的纯文本
+VIEW_API = f"{config.BILIBILI_API_BASE}/x/web-interface/view"
+PLAYER_API = f"{config.BILIBILI_API_BASE}/x/player/v2"
+
+# 优先选择的字幕语言，找不到时使用第一条
+PREFERRED_LANS = ("zh-CN", "zh-Hans", "ai-zh", "zh-Hant")
+# 视频没有字幕的结果也缓存，但一天后重新检查（AI 字幕可能稍后生成）
+NO_SUBTITLE_TTL = 24 * 3600
+
+_CJK = re.compile("[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+
+cid_cache = AsyncTTLCache(ttl=config.CID_CACHE_TTL, max_entries=10000,
+                          backend=SQLiteCacheBackend(config.CID_CACHE_PATH, "cid"))
+metrics.register_cache("cid", cid_cache.stats)
+
+
+async def _fetch_cid(bvid: str) -> Optional[int]:
+    response = await http_client.request("bilibili", "GET", VIEW_API, params={"bvid": bvid})
+    data = http_client.bilibili_json(response)
+    if data.get("code") != 0:
+        return None
+    return data["data"].get("cid")
+
+
+async def get_cid(bvid: str) -> Optional[int]:
+    """获取视频第一个分P的 cid（带缓存，查不到的视频不缓存）"""
+    return await cid_cache.get_or_fetch(bvid, lambda: _fetch_cid(bvid))
+
+
+def _pick_subtitle(subtitles: List[Dict]) -> Optional[Dict]:
+    for lan in PREFERRED_LANS:
+        for item in subtitles:
+            if item.get("lan") == lan:
+                return item
+    return subtitles[0] if subtitles else None
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def normalize_subtitle(body: List[Dict]) -> str:
+    """把字幕 JSON 的 body 转成每行 "[mm:ss] 文本" 的纯文本"""
+    lines = []
+    for item in body:
+        content = (item.get("content") or "").strip()
+        if content:
+            lines.append(f"[{format_timestamp(item.get('from', 0))}] {content}")
+    return "\n".join(lines)
+
+
+def _cache_path(bvid: str, cid: int):
+    return config.SUBTITLE_CACHE_DIR / f"{bvid}_{cid}.txt"
+
+
+async def fetch_subtitle(bvid: str, cid: Optional[int] = None) -> Optional[str]:
+    """
+    获取视频字幕文本，结果按 bvid/cid 缓存在磁盘上；没有字幕时返回 None
+    """
+    if cid is None:
+        cid = await get_cid(bvid)
+        if cid is None:
+            return None
+
+    path = _cache_path(bvid, cid)
+    if path.exists():
+        stat = path.stat()
+        if stat.st_size > 0:
+            async with aiofiles.open(path, "r", encoding="utf-8") as f:
+                return await f.read()
+        if time.time() - stat.st_mtime < NO_SUBTITLE_TTL:
+            return None
+
+    response = await http_client.request("bilibili", "GET", PLAYER_API, params={"bvid": bvid, "cid": cid})
+    data = http_client.bilibili_json(response)
+    # 没有字幕时 subtitle 可能是 null
+    subtitles = ((data.get("data") or {}).get("subtitle") or {}).get("subtitles") or []
+    picked = _pick_subtitle(subtitles)
+
+    text = ""
+    if picked and picked.get("subtitle_url"):
+        url = picked["subtitle_url"]
+        if url.startswith("//"):
+            url = "https:" + url
+        subtitle_response = await http_client.request("bilibili_web", "GET", url)
+        http_client.raise_for_status("bilibili_web", subtitle_response)
+        try:
+            body = json.loads(subtitle_response.content).get("body") or []
+        except (ValueError, AttributeError) as e:
+            raise UpstreamError("bilibili_web", f"字幕文件无法解析: {e}") from e
+        text = normalize_subtitle(body)
+
+    config.SUBTITLE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    async with aiofiles.open(path, "w", encoding="utf-8") as f:
+        await f.write(text)
+    return text or None
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日韩字符按 1 个计，其余按约 4 个字符 1 个计"""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def split_transcript(text: str, max_tokens: int) -> List[str]:
+    """按行把字幕切成若干段，每段不超过 max_tokens（单行过长时单独成段）"""
+    chunks = []
+    current = []
+    current_tokens = 0
+    for line in text.splitlines():
+        tokens = estimate_tokens(line) + 1
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current = []
+            current_tokens = 0
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# 测试使用临时数据目录，且不访问真实上游；必须在导入项目模块（读取 config）之前设置
+_DATA_DIR = tempfile.mkdtemp(prefix="ka-test-")
+os.environ["DATA_DIR"] = _DATA_DIR
+os.environ["OUTPUT_DIR"] = os.path.join(_DATA_DIR, "markdowns")
+os.environ["EMBEDDING_PROVIDER"] = "hashing"
+os.environ["BILIBILI_API_BASE"] = "http://127.0.0.1:9"
+os.environ["DASHSCOPE_API_BASE"] = "http://127.0.0.1:9"
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
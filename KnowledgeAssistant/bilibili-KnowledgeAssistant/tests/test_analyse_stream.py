@@ -0,0 +1,63 @@
+import json
+
+import aiofiles
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import analyse
+import prompts
+from doc_catalog import content_hash, doc_catalog
+from llm_cache import llm_cache
+
+VIDEO = {"bvid": "BVstream1", "title": "流式视频", "author": "up", "duration": "01:00",
+         "url": "https://www.bilibili.com/video/BVstream1", "avid": "1"}
+CHUNKS = ["# 摘要\n", "第一段", "第二段\n"]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def no_subtitle(bvid):
+        return None
+
+    async def stream(prompt, analysis_type=None, use_cache=True, model=None):
+        for text in CHUNKS:
+            yield text
+
+    monkeypatch.setattr(analyse, "extract_bilibili_subtitle", no_subtitle)
+    monkeypatch.setattr(analyse, "stream_tongyi_qianwen", stream)
+    analyse.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    app = FastAPI()
+    app.include_router(analyse.analyse, prefix="/analyse")
+    return TestClient(app)
+
+
+def events(body: str):
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        yield lines.get("event", "message"), json.loads(lines["data"])
+
+
+def test_stream_saves_document_and_cache_without_reading_back(client, monkeypatch):
+    opened = []
+    real_open = aiofiles.open
+
+    def tracking_open(path, mode="r", *args, **kwargs):
+        opened.append(mode)
+        return real_open(path, mode, *args, **kwargs)
+
+    monkeypatch.setattr(analyse.aiofiles, "open", tracking_open)
+    response = client.post("/analyse/single/stream", json=VIDEO, params={"no_cache": "true"})
+    received = list(events(response.text))
+    assert [data["text"] for event, data in received if event == "message"] == CHUNKS
+    event, done = received[-1]
+    assert event == "done"
+    # 只写一次文件，不再读回
+    assert opened == ["w"]
+
+    content = (analyse.OUTPUT_DIR / done["markdown_file"]).read_text(encoding="utf-8")
+    assert "".join(CHUNKS) in content
+    assert doc_catalog.find(VIDEO["bvid"], content_hash(content))["filename"] == done["markdown_file"]
+    video = analyse.VideoItem(**VIDEO)
+    prompt = prompts.build_prompt(video, None, "summary")
+    assert llm_cache.get(analyse._cache_key(prompt, "summary", done["model"])) == "".join(CHUNKS)
@@ -0,0 +1,87 @@
+import uuid
+
+import dedup
+from knowledge_store import knowledge_store
+from models import KnowledgeItem
+
+
+def video(bvid, title, author, duration="10:00", description="Python 入门教程，从零开始学习编程"):
+    return {"bvid": bvid, "title": title, "author": author, "duration": duration,
+            "description": description, "avid": bvid[2:]}
+
+
+def collapsed(videos, **kwargs):
+    kwargs.setdefault("reuse_existing", False)
+    return [(entry["bvid"], entry["duplicate_of"]) for entry in dedup.dedup_videos(videos, **kwargs)["collapsed"]]
+
+
+def test_episodes_are_not_merged():
+    videos = [video(f"BV{i}", f"Python教程 第{i}集 & 实战", "up") for i in range(10)]
+    assert collapsed(videos) == []
+
+
+def test_chinese_and_part_numbers_are_not_merged():
+    videos = [video("BV1", "算法精讲 第十二集", "up"), video("BV2", "算法精讲 第十三集", "up"),
+              video("BV3", "算法精讲（上）", "up"), video("BV4", "算法精讲（下）", "up")]
+    assert collapsed(videos) == []
+
+
+def test_same_author_reupload_is_merged():
+    videos = [video("BV1", "Python零基础入门全套教程", "upA"), video("BV2", "Python零基础入门全套教程（高清）", "upA")]
+    assert collapsed(videos) == [("BV2", "BV1")]
+
+
+def test_other_author_needs_high_similarity_and_same_duration():
+    videos = [video("BV1", "Python零基础入门全套教程", "upA"),
+              video("BV2", "Python零基础入门全套教程", "upB", duration="10:01"),
+              video("BV3", "Python零基础入门全套教程", "upC", duration="12:00"),
+              video("BV4", "Java零基础入门全套教程", "upD")]
+    assert collapsed(videos) == [("BV2", "BV1")]
+
+
+def test_no_transitive_merge():
+    # B 与 A、C 都相似，但 A 与 C 不相似：C 不能因为 B 被合并到 A
+    a = video("BV1", "深度学习入门教程 卷积神经网络", "up", description="")
+    b = video("BV2", "深度学习入门教程 卷积神经网络 循环神经网络", "up", description="")
+    c = video("BV3", "卷积神经网络 循环神经网络 注意力机制", "up", description="")
+    result = dict(collapsed([a, b, c], threshold=0.5))
+    assert result.get("BV3") != "BV1"
+
+
+def test_same_bvid_and_opt_out():
+    videos = [video("BV1", "标题", "up"), video("BV1", "标题", "up")]
+    assert collapsed(videos) == [("BV1", "BV1")]
+    assert collapsed(videos, dedup=False) == []
+
+
+def test_reuse_existing_result():
+    bvid = f"BV{uuid.uuid4().hex[:8]}"
+    knowledge_store.save(KnowledgeItem(id=str(uuid.uuid4()), bvid=bvid, title="t", author="up",
+                                       markdown_content="# 已有结果", analysis_type="summary"))
+    videos = [video(bvid, "已分析的视频", "up", description="旧"), video("BVnew", "新视频", "up", description="新")]
+    report = dedup.dedup_videos(videos, "summary")
+    assert [entry["bvid"] for entry in report["reused"]] == [bvid]
+    assert report["unique"] == [1]
+    # 其他分析类型、或请求中关闭复用时照常分析
+    assert dedup.dedup_videos(videos, "detailed")["reused"] == []
+    assert dedup.dedup_videos(videos, "summary", reuse_existing=False)["unique"] == [0, 1]
+
+
+def test_reused_result_has_markdown_file():
+    import asyncio
+
+    import config
+    from analyse import dedup_results
+
+    bvid = f"BV{uuid.uuid4().hex[:8]}"
+    knowledge_store.save(KnowledgeItem(id=str(uuid.uuid4()), bvid=bvid, title="t", author="up",
+                                       markdown_content="# 已有结果", analysis_type="summary"))
+    config.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    report, results = asyncio.run(dedup_results([video(bvid, "已分析的视频", "up")], "summary"))
+    assert report["unique"] == []
+    result = results[0]
+    assert result["status"] == "reused"
+    assert (config.OUTPUT_DIR / result["markdown_file"]).read_text(encoding="utf-8") == "# 已有结果"
+    # 再次复用时使用同一个文档，不重复写文件
+    _, again = asyncio.run(dedup_results([video(bvid, "已分析的视频", "up")], "summary"))
+    assert again[0]["markdown_file"] == result["markdown_file"]
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import time
+
+import httpx
+import pytest
+
+import config
+import downloader
+import http_client
+from resilience import CircuitBreaker, CircuitOpenError, get_breaker
+
+DATA = bytes(range(256)) * 16  # 4096 字节
+
+
+class FailingStream(httpx.AsyncByteStream):
+    """先返回 fail_after 字节，然后连接中断"""
+
+    def __init__(self, body: bytes, fail_after: int):
+        self.body = body
+        self.fail_after = fail_after
+
+    async def __aiter__(self):
+        for i in range(0, self.fail_after, 100):
+            yield self.body[i:min(i + 100, self.fail_after)]
+        raise httpx.ReadError("connection reset")
+
+
+@pytest.fixture
+def cdn(monkeypatch):
+    """支持 Range 的模拟 CDN，注入为 bilibili_web 的共享客户端；记录返回的字节数"""
+    state = {"requests": 0, "served": 0, "fail": None}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        state["requests"] += 1
+        start, end = request.headers["range"].removeprefix("bytes=").split("-")
+        start, end = int(start), (int(end) if end else len(DATA) - 1)
+        body = DATA[start:end + 1]
+        headers = {"content-range": f"bytes {start}-{end}/{len(DATA)}", "content-length": str(len(body))}
+        if state["fail"] is not None and start <= state["fail"] <= end:
+            # 在 fail 偏移处断开一次
+            fail_after = state["fail"] - start
+            state["fail"] = None
+            state["served"] += fail_after
+            return httpx.Response(206, headers=headers, stream=FailingStream(body, fail_after))
+        state["served"] += len(body)
+        return httpx.Response(206, headers=headers, content=body)
+
+    monkeypatch.setattr(config, "DOWNLOAD_SEGMENT_SIZE", 1024)
+    monkeypatch.setattr(config, "DOWNLOAD_CHUNK_SIZE", 100)
+    monkeypatch.setattr(config, "HTTP_RETRIES", 0)
+    monkeypatch.setitem(http_client._clients, "bilibili_web",
+                        httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return state
+
+
+def test_download_in_segments(cdn, tmp_path):
+    dest = asyncio.run(downloader.download_file("https://cdn.example/v.mp4", tmp_path / "v.mp4"))
+    assert dest.read_bytes() == DATA
+    assert not (tmp_path / "v.mp4.part").exists()
+    assert not (tmp_path / "v.mp4.part.json").exists()
+    # 1 次探测 + 4 个分段
+    assert cdn["requests"] == 5
+
+
+def test_resume_after_interruption(cdn, monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "DOWNLOAD_SEGMENTS", 1)
+    cdn["fail"] = 2048 + 700
+    with pytest.raises(httpx.ReadError):
+        asyncio.run(downloader.download_file("https://cdn.example/v.mp4", tmp_path / "v.mp4"))
+    assert (tmp_path / "v.mp4.part.json").exists()
+
+    cdn["served"] = 0
+    dest = asyncio.run(downloader.download_file("https://cdn.example/v.mp4", tmp_path / "v.mp4"))
+    assert dest.read_bytes() == DATA
+    # 已落盘的前两段半不再重新下载
+    assert cdn["served"] <= len(DATA) - 2048 - 700 + 1
+
+
+def test_progress_is_recorded_only_after_fsync(cdn, monkeypatch, tmp_path):
+    events = []
+    real_fsync, real_write_state = os.fsync, downloader._write_state
+    part_path = tmp_path / "v.mp4.part"
+
+    def fsync(fd):
+        real_fsync(fd)
+        events.append("fsync")
+
+    def write_state(state_path, state):
+        # 记录的每一段进度都必须已经写进文件
+        content = part_path.read_bytes()
+        for (start, _), done in zip(state["segments"], state["done"]):
+            assert content[start:start + done] == DATA[start:start + done]
+        # 各段并行写入，每次记录进度之前该段都已 fsync 过一次
+        events.append("state")
+        assert events.count("fsync") >= events.count("state")
+        real_write_state(state_path, state)
+
+    monkeypatch.setattr(os, "fsync", fsync)
+    monkeypatch.setattr(downloader, "_write_state", write_state)
+    asyncio.run(downloader.download_file("https://cdn.example/v.mp4", tmp_path / "v.mp4"))
+    assert events.count("state") >= 4
+
+
+def test_open_circuit_skips_request(cdn, tmp_path):
+    breaker = get_breaker("bilibili_web")
+    breaker.state, breaker.opened_at = CircuitBreaker.OPEN, time.monotonic()
+    try:
+        with pytest.raises(CircuitOpenError):
+            asyncio.run(downloader.download_file("https://cdn.example/v.mp4", tmp_path / "v.mp4"))
+    finally:
+        breaker.record_success()
+    assert cdn["requests"] == 0
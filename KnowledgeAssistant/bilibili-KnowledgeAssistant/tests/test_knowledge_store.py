@@ -0,0 +1,109 @@
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+import knowledge_store
+from knowledge_store import KnowledgeStore, SQLiteKnowledgeStore
+from models import KnowledgeItem
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteKnowledgeStore(tmp_path / "knowledge.db")
+
+
+def item(bvid="BV1", analysis_type="summary", created_at=None, **kwargs):
+    return KnowledgeItem(id=str(uuid.uuid4()), bvid=bvid, title=f"标题 {bvid}", author="up",
+                         markdown_content=f"# {bvid}", analysis_type=analysis_type,
+                         created_at=created_at or datetime.now(), **kwargs)
+
+
+def test_incomplete_backend_fails_at_construction():
+    class Incomplete(KnowledgeStore):
+        def get(self, knowledge_id):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_save_get_delete(store):
+    saved = item()
+    store.save(saved)
+    assert store.get(saved.id).markdown_content == "# BV1"
+    assert store.toggle_favorite(saved.id) is True
+    assert store.delete(saved.id).id == saved.id
+    assert store.get(saved.id) is None
+    assert store.toggle_favorite(saved.id) is None
+
+
+def test_cursor_pagination_is_stable(store):
+    # 同一时间戳的多项按 id 排序，翻页过程中新增的项不影响后续页
+    base = datetime(2024, 1, 1)
+    items = [item(f"BV{i}", created_at=base + timedelta(seconds=i // 2)) for i in range(7)]
+    for saved in items:
+        store.save(saved)
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = store.list(limit=3, cursor=cursor)
+        seen.extend(page)
+        store.save(item("BVnew"))
+        if not cursor:
+            break
+    assert sorted(saved.id for saved in seen) == sorted(saved.id for saved in items)
+    assert [saved.created_at for saved in seen] == sorted((saved.created_at for saved in seen), reverse=True)
+
+
+def test_invalid_cursor(store):
+    with pytest.raises(ValueError):
+        store.list(cursor="not-a-cursor")
+
+
+def test_save_many_updates_existing(store):
+    first = item("BV1", tags=["a"])
+    store.save(first)
+    results = store.save_many([item("BV1", tags=["b"], is_favorite=True), item("BV2"), item("BV2")])
+    assert [created for _, created in results] == [False, True]
+    updated = store.get(first.id)
+    assert updated.tags == ["a", "b"] and updated.is_favorite
+    assert updated.created_at == first.created_at
+    assert set(store.find_by_bvids(["BV1", "BV2"], "summary")) == {"BV1", "BV2"}
+    assert store.find_by_bvids(["BV1"], "detailed") == {}
+
+
+def test_update_and_delete_many(store):
+    items = [item(f"BV{i}", tags=["old"]) for i in range(3)]
+    for saved in items:
+        store.save(saved)
+    ids = [saved.id for saved in items]
+    assert sorted(store.update_many(ids + ["missing"], is_favorite=True, add_tags=["new"], remove_tags=["old"])) == sorted(ids)
+    assert all(store.get(i).tags == ["new"] and store.get(i).is_favorite for i in ids)
+    assert len(store.delete_many(ids[:2] + ["missing"])) == 2
+    assert [saved.id for saved in store.list()[0]] == ids[2:]
+
+
+def test_concurrent_save_many_from_two_connections(tmp_path, monkeypatch):
+    path = tmp_path / "knowledge.db"
+    first, second = SQLiteKnowledgeStore(path), SQLiteKnowledgeStore(path)
+    selected = threading.Event()
+
+    class SlowDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            # 第一个连接查询完已有项之后、写入之前停一下，让第二个连接在这期间保存同一视频
+            if threading.current_thread().name == "first" and not selected.is_set():
+                selected.set()
+                threading.Event().wait(0.3)
+            return super().now(tz)
+
+    monkeypatch.setattr(knowledge_store, "datetime", SlowDatetime)
+    thread = threading.Thread(target=first.save_many, args=([item("BVrace", tags=["a"])],), name="first")
+    thread.start()
+    assert selected.wait(5)
+    assert [created for _, created in second.save_many([item("BVrace", tags=["b"])])] == [False]
+    thread.join()
+    rows = first._db().execute("SELECT tags FROM knowledge WHERE bvid = 'BVrace'").fetchall()
+    assert [row["tags"] for row in rows] == ['["a", "b"]']
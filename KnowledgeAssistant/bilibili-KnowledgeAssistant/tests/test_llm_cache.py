@@ -0,0 +1,45 @@
+import time
+
+import pytest
+
+from llm_cache import LLMCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMCache(tmp_path / "llm_cache.db", ttl=1000, max_entries=2)
+
+
+def accessed_at(cache, key):
+    return cache._db().execute("SELECT accessed_at FROM llm_cache WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_hit_only_touches_stale_access_time(cache):
+    cache.set("k", "v")
+    first = accessed_at(cache, "k")
+    assert cache.get("k") == "v"
+    # 刚写入或刚更新过的条目命中时不写库
+    assert accessed_at(cache, "k") == first
+
+    cache._db().execute("UPDATE llm_cache SET accessed_at = ? WHERE key = 'k'", (first - 20,))
+    cache._db().commit()
+    assert cache.get("k") == "v"
+    assert accessed_at(cache, "k") >= first
+    assert cache.stats()["hits"] == 2
+
+
+def test_expired_entry_is_a_miss(cache):
+    cache.set("k", "v")
+    cache._db().execute("UPDATE llm_cache SET created_at = ? WHERE key = 'k'", (time.time() - 2000,))
+    cache._db().commit()
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_evicts_least_recently_accessed(cache):
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache._db().execute("UPDATE llm_cache SET accessed_at = accessed_at - 100 WHERE key = 'b'")
+    cache._db().commit()
+    cache.set("c", "3")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("1", None, "3")
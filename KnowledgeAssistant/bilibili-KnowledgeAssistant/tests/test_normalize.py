@@ -0,0 +1,48 @@
+import pytest
+
+from models import SearchResponse
+from normalize import clean_html_tags, normalize_results, parse_duration, to_video_item
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("12:34", 754),
+    ("1:02:03", 3723),
+    ("90:00", 5400),
+    (62, 62),
+    ("1:60", None),
+    ("1:2:60", None),
+    ("-1:05", None),
+    ("1:-5", None),
+    (-3, None),
+    ("1:05.5", None),
+    ("--", None),
+    ("", None),
+])
+def test_parse_duration(value, expected):
+    assert parse_duration(value) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('<em class="keyword">Python</em> 教程', "Python 教程"),
+    ("<b>粗体</b>  多余\t空白 ", "粗体 多余 空白"),
+    ("A&amp;B &lt;第1期&gt; &quot;引号&quot; &#39;", "A&B <第1期> \"引号\" '"),
+    ("&amp;lt; 只解码一次", "&lt; 只解码一次"),
+    ("&copy;&nbsp;其他实体", "© 其他实体"),
+    ("全角　空格", "全角 空格"),
+    ("<br>", ""),
+    (None, ""),
+])
+def test_clean_html_tags(text, expected):
+    assert clean_html_tags(text) == expected
+
+
+def test_normalized_fields_validate_as_video_items():
+    raw = [{"bvid": "BV1", "aid": 1, "title": '<em class="keyword">视频</em>', "author": "up",
+            "description": "简介&amp;", "duration": "75:03", "play": "--", "video_review": 7,
+            "pubdate": 1700000000}]
+    fields = normalize_results(raw)
+    response = SearchResponse.model_validate({"keyword": "k", "count": 1, "videos": fields})
+    video = response.videos[0]
+    assert video == to_video_item(raw[0])
+    assert (video.title, video.description, video.duration, video.duration_seconds) == ("视频", "简介&", "1:15:03", 4503)
+    assert (video.play, video.danmaku, video.avid) == (0, 7, "1")
@@ -0,0 +1,18 @@
+from doc_catalog import content_hash
+from outline_cache import OutlineCache, outline_key
+
+# 顶层有两个标题，大纲以传入的 title 为根
+CONTENT = "## 第一部分\n- 要点\n## 第二部分\n- 要点\n"
+
+
+def test_title_is_part_of_the_key(tmp_path):
+    cache = OutlineCache(tmp_path, memory_entries=1)
+    sha256 = content_hash(CONTENT)
+    assert cache.build(CONTENT, "标题 A")["text"] == "标题 A"
+    assert cache.build(CONTENT, "标题 B")["text"] == "标题 B"
+    assert cache.build(CONTENT)["text"] == ""
+    # 内存只保留一项，其余从文件读取
+    assert cache.lookup(sha256, "标题 A")["text"] == "标题 A"
+    assert cache.lookup(sha256, "标题 C") is None
+    assert outline_key(sha256) == sha256
+    assert len({outline_key(sha256), outline_key(sha256, "标题 A"), outline_key(sha256, "标题 B")}) == 3
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import repository
+import search_index
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(repository.repository, prefix="/repository")
+    return TestClient(app)
+
+
+def draft(i: int, size: int = 10) -> str:
+    return json.dumps({"bvid": f"BVimport{i:04d}", "title": f"导入测试 {i}", "author": "up", "analysis_type": "summary",
+                       "markdown_content": f"# 导入测试 {i}\n" + "内容" * size}, ensure_ascii=False)
+
+
+def test_import_streamed_in_small_chunks_then_bulk_delete(client):
+    # 第 2 行远大于分块大小，跨越很多个块；第 3 行无法解析
+    body = "\n".join([draft(1), draft(2, size=20000), "not json", "", draft(3)]).encode("utf-8")
+
+    def chunks():
+        for start in range(0, len(body), 1000):
+            yield body[start:start + 1000]
+
+    response = client.post("/repository/knowledge/import", content=chunks())
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["created"], result["failed"]) == (3, 1)
+    assert result["errors"][0]["line"] == 3
+
+    items = {item["bvid"]: item for item in client.get("/repository/knowledge").json()}
+    ids = [items[f"BVimport{i:04d}"]["id"] for i in (1, 2, 3)]
+    assert len(items["BVimport0002"]["markdown_content"]) > 40000
+    assert search_index.search("导入测试", kind="knowledge")
+
+    response = client.post("/repository/knowledge/bulk/delete", json={"ids": ids + ["missing-id"]})
+    assert sorted(response.json()["deleted"]) == sorted(ids)
+    assert response.json()["missing"] == ["missing-id"]
+    assert not [hit for hit in search_index.search("导入测试", kind="knowledge") if hit["ref"] in ids]
@@ -0,0 +1,183 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import analyse
+import config
+import http_client
+import main
+import ratelimit
+import resilience
+from ratelimit import RateLimiter
+from resilience import CircuitBreaker, CircuitOpenError, UpstreamError, UpstreamThrottled
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", failures=3, reset_seconds=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    # 成功后重新计数
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError) as exc:
+        breaker.check()
+    assert 1 <= exc.value.retry_after <= 30
+
+
+def test_breaker_half_open_allows_one_probe():
+    breaker = CircuitBreaker("test", failures=1, reset_seconds=30)
+    breaker.record_failure()
+    breaker.opened_at = time.monotonic() - 31
+    breaker.check()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # 试探请求的重试照常放行，其他请求仍然失败
+    breaker.check(retry=True)
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    # 试探失败立即重新熔断
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    breaker.opened_at = time.monotonic() - 31
+    breaker.check()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.check()
+
+
+def test_breaker_disabled():
+    breaker = CircuitBreaker("test", failures=0, reset_seconds=30)
+    for _ in range(10):
+        breaker.record_failure()
+    breaker.check()
+
+
+def test_limiter_paces_requests():
+    limiter = RateLimiter(20, burst=2)
+
+    async def run():
+        start = time.monotonic()
+        for _ in range(6):
+            await limiter.acquire()
+        return time.monotonic() - start
+
+    # 2 个令牌立即可用，其余 4 个按 20 个/秒发放
+    assert 0.15 <= asyncio.run(run()) < 0.5
+
+
+def test_limiter_penalize_and_recover():
+    limiter = RateLimiter(10, min_factor=0.1)
+    limiter.penalize(0.2)
+    assert limiter.rate == 5
+    for _ in range(5):
+        limiter.penalize()
+    assert limiter.rate == 1  # 不低于 min_factor
+    for _ in range(10):
+        limiter.reward()
+    assert limiter.rate == pytest.approx(6)
+    for _ in range(20):
+        limiter.reward()
+    assert limiter.rate == 10
+
+
+def test_penalize_pauses_unlimited_upstream():
+    limiter = RateLimiter(0)
+
+    async def run():
+        start = time.monotonic()
+        await limiter.acquire()
+        limiter.penalize(0.2)
+        await limiter.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.2
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """独立的测试上游：依次返回 responses 中的状态码，记录请求次数"""
+    state = {"responses": [], "requests": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        state["requests"] += 1
+        status = state["responses"].pop(0) if state["responses"] else 200
+        return httpx.Response(status, headers={"retry-after": "0"} if status == 429 else {}, json={"code": 0})
+
+    monkeypatch.setattr(config, "HTTP_RETRIES", 1)
+    monkeypatch.setattr(config, "HTTP_BACKOFF", 0.001)
+    monkeypatch.setitem(http_client._clients, "test", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setitem(resilience._breakers, "test", CircuitBreaker("test", failures=2, reset_seconds=30))
+    monkeypatch.setitem(ratelimit._limiters, "test", RateLimiter(100))
+    return state
+
+
+def test_throttled_response_slows_limiter(upstream):
+    upstream["responses"] = [429, 429]
+    with pytest.raises(UpstreamThrottled):
+        asyncio.run(http_client.request("test", "GET", "https://upstream.example/"))
+    assert upstream["requests"] == 2
+    assert ratelimit._limiters["test"].rate == 25
+    # 之后的成功请求逐步恢复速率
+    asyncio.run(http_client.request("test", "GET", "https://upstream.example/"))
+    assert ratelimit._limiters["test"].rate == 30
+
+
+def test_failures_open_circuit_and_skip_requests(upstream):
+    upstream["responses"] = [503] * 4
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            asyncio.run(http_client.request("test", "GET", "https://upstream.example/"))
+    assert upstream["requests"] == 4
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(http_client.request("test", "GET", "https://upstream.example/"))
+    assert upstream["requests"] == 4
+
+
+VIDEO = {"bvid": "BV1", "title": "视频", "author": "up", "duration": "01:00", "url": "https://www.bilibili.com/video/BV1",
+         "avid": "1"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def no_subtitle(bvid):
+        return None
+
+    monkeypatch.setattr(analyse, "extract_bilibili_subtitle", no_subtitle)
+    app = FastAPI()
+    app.include_router(analyse.analyse, prefix="/analyse")
+    app.add_exception_handler(UpstreamError, main.upstream_error_handler)
+    return TestClient(app)
+
+
+def failing_llm(monkeypatch, error):
+    async def call(*args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(analyse, "call_tongyi_qianwen", call)
+
+
+@pytest.mark.parametrize("error, status, retry_after", [
+    (UpstreamThrottled("tongyi", "HTTP 429", status=429, retry_after=2.5), 503, "3"),
+    (CircuitOpenError("tongyi", 12), 503, "12"),
+    (UpstreamError("tongyi", "HTTP 500", status=500), 502, None),
+])
+def test_single_analysis_maps_upstream_errors(client, monkeypatch, error, status, retry_after):
+    failing_llm(monkeypatch, error)
+    response = client.post("/analyse/single", json=VIDEO, params={"no_cache": "true"})
+    assert response.status_code == status
+    assert response.headers.get("retry-after") == retry_after
+    assert response.json()["error_type"] == type(error).__name__
+
+
+def test_single_analysis_reports_other_errors_in_result(client, monkeypatch):
+    failing_llm(monkeypatch, ValueError("模板错误"))
+    response = client.post("/analyse/single", json=VIDEO, params={"no_cache": "true"})
+    assert response.status_code == 200
+    assert response.json()["results"][0]["error_type"] == "ValueError"
@@ -0,0 +1,31 @@
+import uuid
+
+import config
+import search_index
+from doc_catalog import doc_catalog
+from knowledge_store import knowledge_store
+from models import KnowledgeItem
+
+
+def test_reconcile_backfills_and_removes():
+    token = uuid.uuid4().hex[:8]
+    item = KnowledgeItem(id=str(uuid.uuid4()), bvid="BVfts", title=f"回填 {token}", author="up",
+                         markdown_content="未经接口保存的知识库项", analysis_type="summary")
+    knowledge_store.save(item)
+    config.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    filename = f"BVfts_{token}.md"
+    (config.OUTPUT_DIR / filename).write_text(f"# 文档 {token}\n\n正文", encoding="utf-8")
+    doc_catalog.reconcile()
+    assert search_index.search(token) == []
+
+    stats = search_index.reconcile()
+    assert stats["knowledge_added"] >= 1 and stats["documents_added"] >= 1
+    assert {hit["ref"] for hit in search_index.search(token)} == {item.id, filename}
+    # 再次对账不重复索引
+    assert search_index.reconcile()["documents_added"] == 0
+
+    knowledge_store.delete(item.id)
+    (config.OUTPUT_DIR / filename).unlink()
+    doc_catalog.reconcile()
+    search_index.reconcile()
+    assert search_index.search(token) == []
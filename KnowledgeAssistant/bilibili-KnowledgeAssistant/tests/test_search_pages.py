@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import config
+import videosearch
+
+
+def raw_video(i: int) -> dict:
+    return {"bvid": f"BV{i:06d}", "aid": i, "title": f"<em class=\"keyword\">视频</em> {i}", "author": "up",
+            "duration": "1:02", "play": i, "pubdate": 1700000000}
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """模拟B站搜索接口：每页 page_size 条，总共 total 条，记录请求的页和最大并发数"""
+    state = {"total": 230, "calls": [], "active": 0, "max_active": 0}
+
+    async def fetch(keyword, page=1, pagesize=10, order="totalrank"):
+        state["calls"].append((keyword, page, pagesize, order))
+        state["active"] += 1
+        state["max_active"] = max(state["max_active"], state["active"])
+        # 后面的页先返回，验证结果仍按页码顺序合并
+        await asyncio.sleep(0.01 * (10 - page % 10))
+        state["active"] -= 1
+        start = (page - 1) * pagesize
+        # 相邻页之间有一条重复的结果（B站翻页时常见）
+        return [raw_video(i) for i in range(max(0, start - 1), min(start + pagesize, state["total"]))]
+
+    monkeypatch.setattr(videosearch, "fetch_bilibili_videos", fetch)
+    monkeypatch.setattr(config, "SEARCH_PAGE_SIZE", 50)
+    monkeypatch.setattr(config, "SEARCH_PAGE_CONCURRENCY", 2)
+    videosearch.search_cache._entries.clear()
+    return state
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(videosearch.search, prefix="/search")
+    return TestClient(app)
+
+
+def test_search_videos_merges_pages_in_order(upstream):
+    videos = asyncio.run(videosearch.search_videos("python", max_results=120, order="click"))
+    assert [video["bvid"] for video in videos] == [f"BV{i:06d}" for i in range(120)]
+    assert sorted(page for _, page, _, _ in upstream["calls"]) == [1, 2, 3]
+    assert {order for *_, order in upstream["calls"]} == {"click"}
+    assert upstream["max_active"] <= 2
+
+
+def test_small_max_results_uses_one_small_page(upstream):
+    videos = asyncio.run(videosearch.search_videos("python", max_results=7))
+    assert len(videos) == 7
+    assert upstream["calls"] == [("python", 1, 7, "totalrank")]
+
+
+def test_results_shorter_than_requested(upstream):
+    upstream["total"] = 60
+    videos = asyncio.run(videosearch.search_videos("python", max_results=200))
+    assert len(videos) == 60
+
+
+def test_endpoint_rejects_unknown_order(upstream, client):
+    assert client.get("/search/python", params={"order": "random"}).status_code == 400
+
+
+def test_endpoint_returns_normalized_videos(upstream, client):
+    response = client.get("/search/python", params={"max_results": 60})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 60
+    assert body["videos"][0]["title"] == "视频 0"
+    assert body["videos"][0]["duration_seconds"] == 62
+
+
+def test_stream_returns_unique_items_up_to_max(upstream, client):
+    response = client.post("/search/query", params={"stream": "true"},
+                           json={"keyword": "python", "max_results": 101})
+    assert response.status_code == 200
+    items = [json.loads(line) for line in response.text.splitlines()]
+    bvids = [item["bvid"] for item in items]
+    assert len(bvids) == len(set(bvids)) == 101
+
+
+def test_repeated_search_is_served_from_cache(upstream):
+    asyncio.run(videosearch.search_videos("cached", max_results=100))
+    calls = len(upstream["calls"])
+    asyncio.run(videosearch.search_videos("cached", max_results=100))
+    assert len(upstream["calls"]) == calls
@@ -0,0 +1,63 @@
+import asyncio
+import signal
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import config
+import main
+
+
+class FakeWorker:
+    draining = False
+
+    def drain(self):
+        self.draining = True
+
+
+@pytest.fixture
+def uvicorn_handler():
+    """模拟 uvicorn 安装的信号处理函数，记录被调用的时间"""
+    calls = []
+    original = signal.signal(signal.SIGTERM, lambda sig, frame: calls.append((sig, time.monotonic())))
+    yield calls
+    signal.signal(signal.SIGTERM, original)
+
+
+def test_sigterm_flips_readiness_before_closing_listeners(uvicorn_handler, monkeypatch):
+    monkeypatch.setattr(config, "SHUTDOWN_PRESTOP_SECONDS", 0.2)
+    monkeypatch.setattr(config, "SHUTDOWN_GRACE_SECONDS", 10)
+    app = SimpleNamespace(state=SimpleNamespace(ready=True, shutdown_deadline=None, analysis_worker=FakeWorker()))
+
+    async def run():
+        previous = main._install_drain_handlers(app)
+        start = time.monotonic()
+        signal.raise_signal(signal.SIGTERM)
+        await asyncio.sleep(0.05)
+        # 已摘流、worker 不再领取新任务，但还没有交给 uvicorn
+        assert not app.state.ready
+        assert app.state.analysis_worker.draining
+        assert uvicorn_handler == []
+        await asyncio.sleep(0.3)
+        assert [sig for sig, _ in uvicorn_handler] == [signal.SIGTERM]
+        assert uvicorn_handler[0][1] - start >= 0.2
+        # 关闭的总时间从收到信号起算：预停 + 宽限
+        assert app.state.shutdown_deadline - start == pytest.approx(10.2, abs=0.1)
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+
+    asyncio.run(run())
+
+
+def test_healthz_reports_draining_when_drain_file_exists(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "INPROCESS_WORKER", False)
+    drain_file = tmp_path / "drain"
+    monkeypatch.setattr(config, "DRAIN_FILE", str(drain_file))
+    with TestClient(main.app) as client:
+        assert client.get("/healthz").status_code == 200
+        drain_file.touch()
+        response = client.get("/healthz")
+        assert response.status_code == 503
+        assert response.json()["status"] == "draining"
@@ -0,0 +1,51 @@
+import asyncio
+
+import httpx
+import pytest
+
+import config
+import http_client
+import subtitle
+from resilience import UpstreamError
+
+
+@pytest.fixture
+def upstream(monkeypatch, tmp_path):
+    """模拟 player/v2 接口和字幕文件；state 中设置接口返回的 subtitle 字段和字幕文件的响应"""
+    state = {"subtitle": None, "file": httpx.Response(200, json={"body": [{"from": 0, "to": 1, "content": "你好"}]})}
+
+    def api(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"code": 0, "data": {"subtitle": state["subtitle"]}})
+
+    def web(request: httpx.Request) -> httpx.Response:
+        return state["file"]
+
+    monkeypatch.setattr(config, "SUBTITLE_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(config, "HTTP_RETRIES", 0)
+    monkeypatch.setitem(http_client._clients, "bilibili", httpx.AsyncClient(transport=httpx.MockTransport(api)))
+    monkeypatch.setitem(http_client._clients, "bilibili_web", httpx.AsyncClient(transport=httpx.MockTransport(web)))
+    return state
+
+
+def with_subtitle(state):
+    state["subtitle"] = {"subtitles": [{"lan": "zh-CN", "subtitle_url": "//cdn.example/sub.json"}]}
+
+
+def test_null_subtitle_means_no_subtitle(upstream):
+    assert asyncio.run(subtitle.fetch_subtitle("BVnull", cid=1)) is None
+
+
+def test_subtitle_downloaded(upstream):
+    with_subtitle(upstream)
+    assert "你好" in asyncio.run(subtitle.fetch_subtitle("BVok", cid=1))
+
+
+@pytest.mark.parametrize("response", [
+    httpx.Response(404, text="not found"),
+    httpx.Response(200, text="<html>risk control</html>"),
+])
+def test_bad_subtitle_file_is_an_upstream_error(upstream, response):
+    with_subtitle(upstream)
+    upstream["file"] = response
+    with pytest.raises(UpstreamError):
+        asyncio.run(subtitle.fetch_subtitle("BVbad", cid=1))
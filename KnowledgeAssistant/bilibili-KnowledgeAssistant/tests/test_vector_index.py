@@ -0,0 +1,92 @@
+import asyncio
+import random
+
+import numpy as np
+import pytest
+
+from vector_index import VectorIndex
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return tmp_path / "vectors"
+
+
+def note(i: int) -> str:
+    return f"笔记 {i}\n\n第 {i} 篇笔记的内容，关键词 topic{i}\n\n补充段落 extra{i}"
+
+
+def add(index, ids):
+    asyncio.run(index.add_items((f"item{i}", note(i)) for i in ids))
+
+
+def search(index, query, k=5):
+    return [hit["id"] for hit in asyncio.run(index.search(query, k=k))]
+
+
+def state(index):
+    index._load()
+    alive = np.flatnonzero(index._alive)
+    return sorted((index._item_ids[index._item_codes[row]], bytes(index._matrix[row])) for row in alive)
+
+
+def test_add_search_related(directory):
+    index = VectorIndex(directory)
+    add(index, range(5))
+    assert search(index, "topic3")[0] == "item3"
+    assert "item2" not in [hit["id"] for hit in asyncio.run(index.related("item2"))]
+    # 重新写入同一项时旧向量失效
+    asyncio.run(index.add_item("item3", "全新的内容 replaced"))
+    assert search(index, "replaced")[0] == "item3"
+    assert search(index, "topic3", k=10).count("item3") <= 1
+
+
+def test_compaction_keeps_rows_added_by_other_process(directory):
+    first, second = VectorIndex(directory), VectorIndex(directory)
+    add(first, range(6))
+    first._load()
+    # 另一个进程追加之后，first 根据旧的内存视图触发压缩，不能丢失新追加的向量
+    add(second, [100])
+    first.remove_items([f"item{i}" for i in range(4)])
+    assert first._read_meta(first._db())["generation"] == "1"
+    for index in (first, second, VectorIndex(directory)):
+        assert search(index, "topic100")[0] == "item100"
+        assert search(index, "topic5")[0] == "item5"
+        assert not {f"item{i}" for i in range(4)} & set(search(index, "笔记", k=10))
+    assert state(first) == state(second) == state(VectorIndex(directory))
+
+
+def test_incremental_load_matches_full_reload(directory):
+    rng = random.Random(7)
+    reader, writer = VectorIndex(directory), VectorIndex(directory)
+    add(writer, range(20))
+    for step in range(30):
+        if rng.random() < 0.6:
+            add(writer, [rng.randrange(40)])
+        else:
+            writer.remove_items([f"item{rng.randrange(40)}"])
+        # reader 每次只增量加载变化的行，结果应与重新全量加载一致
+        assert state(reader) == state(VectorIndex(directory))
+
+
+def test_incremental_load_reads_only_changed_rows(directory):
+    reader, writer = VectorIndex(directory), VectorIndex(directory)
+    add(writer, range(50))
+    reader._load()
+    statements = []
+    reader._db().set_trace_callback(statements.append)
+    add(writer, [999])
+    reader._load()
+    # 只读取版本号大于上次加载版本的行，而不是全部重新读取（changed > -1）
+    loads = [sql for sql in statements if "WHERE changed >" in sql]
+    assert loads and not any("changed > -1" in sql for sql in loads)
+    assert search(reader, "topic999")[0] == "item999"
+
+
+def test_old_vector_files_are_removed(directory):
+    index = VectorIndex(directory)
+    for round_no in range(3):
+        add(index, range(round_no * 10, round_no * 10 + 10))
+        index.remove_items([f"item{i}" for i in range(round_no * 10, round_no * 10 + 10)])
+    # 只保留当前一代和上一代
+    assert len(list(directory.glob("vectors*.f32"))) <= 2
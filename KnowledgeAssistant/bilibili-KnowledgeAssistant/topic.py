@@ -0,0 +1,62 @@
+import re
+from typing import Dict, List
+
+import minhash
+import prompts
+from subtitle import estimate_tokens
+
+# 主题聚合：多个视频的摘要 -> 拆出知识点 -> MinHash 聚类去重 -> 一次汇总调用生成层级大纲
+
+_BULLET = re.compile(r"^\s*(?:[-*+]|\d+[.)、])\s+")
+_HEADING = re.compile(r"^\s*#")
+# 太短的行（如“概要”“总结”）不算知识点
+MIN_POINT_CHARS = 6
+
+
+def extract_points(summary: str) -> List[str]:
+    """从摘要中取出列表项和正文句子作为知识点，忽略标题"""
+    points = []
+    for line in summary.splitlines():
+        if not line.strip() or _HEADING.match(line):
+            continue
+        text = _BULLET.sub("", line).strip().strip("*").strip()
+        if len(text) >= MIN_POINT_CHARS:
+            points.append(text)
+    return points
+
+
+def merge_points(summaries: List[Dict], threshold: float = 0.5) -> List[Dict]:
+    """
+    合并各视频摘要中的知识点：相似的知识点归为一组，保留最完整（最长）的表述，
+    并记录出自哪些视频；按出现的视频数从多到少排序
+    """
+    points = []
+    for summary in summaries:
+        for text in extract_points(summary["summary"]):
+            points.append((summary["bvid"], text))
+
+    merged = []
+    for group in minhash.cluster((text for _, text in points), threshold=threshold):
+        texts = [points[i][1] for i in group]
+        sources = []
+        for i in group:
+            if points[i][0] not in sources:
+                sources.append(points[i][0])
+        merged.append({"text": max(texts, key=len), "sources": sources, "merged": len(group)})
+    merged.sort(key=lambda point: -len(point["sources"]))
+    return merged
+
+
+def build_reduce_prompt(topic: str, summaries: List[Dict], points: List[Dict], max_tokens: int) -> str:
+    """汇总调用的提示词：视频列表 + 去重后的知识点，知识点按重要程度截断到 token 预算内"""
+    videos = "\n".join(f"- {s['bvid']}：{s['title']}（{s['author']}）" for s in summaries)
+    lines = []
+    used = estimate_tokens(videos) + prompts.TOPIC_TEMPLATE.overhead_tokens + estimate_tokens(topic)
+    for point in points:
+        line = f"- {point['text']} [{', '.join(point['sources'])}]"
+        tokens = estimate_tokens(line) + 1
+        if used + tokens > max_tokens:
+            break
+        lines.append(line)
+        used += tokens
+    return prompts.TOPIC_TEMPLATE.render(topic=topic, videos=videos, points="\n".join(lines))
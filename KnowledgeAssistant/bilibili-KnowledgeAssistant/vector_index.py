@@ -0,0 +1,364 @@
+import asyncio
+import re
+import sqlite3
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+import config
+import db
+from embeddings import get_embedder
+
+# numpy 在第一次向量化/检索时才导入，不影响启动速度
+if TYPE_CHECKING:
+    import numpy as np
+
+# 语义向量索引：
+#   vectors.f32  所有分段向量按行追加的 float32 矩阵，查询时以 memmap 方式读取
+#                （压缩后写成新一代的 vectors.<generation>.f32）
+#   meta.db      每一行向量对应的知识库项、分段文本、是否已删除以及最后变化的版本号
+# 删除只做标记，失效行超过一半时整体重写（compact）
+
+_PARAGRAPH = re.compile(r"\n\s*\n|\n(?=#)")
+
+
+def split_markdown(text: str, max_chars: int) -> List[str]:
+    """按段落/标题切分Markdown，相邻短段合并，每段不超过 max_chars"""
+    chunks = []
+    current = ""
+    for part in _PARAGRAPH.split(text):
+        part = part.strip()
+        if not part:
+            continue
+        while len(part) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(part[:max_chars])
+            part = part[max_chars:]
+        if current and len(current) + len(part) + 1 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{part}" if current else part
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class VectorIndex:
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.vectors_path = self._vectors_file(0)
+        self._conn = None
+        self._lock = threading.Lock()
+        self._dim = None
+        # 内存中的只读视图：按 version 只加载变化的行，generation 变化（压缩、重建）时整体重新加载
+        self._matrix = None
+        self._alive = None
+        self._item_codes = None
+        self._item_ids: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self._loaded_version = None
+        self._generation = None
+
+    def _db(self):
+        if self._conn is None:
+            conn = db.connect(self.directory / "meta.db")
+            # changed：最后一次写入/删除该行时的版本号，加载时只读取上次加载之后变化的行
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "row INTEGER PRIMARY KEY, item_id TEXT NOT NULL, chunk_no INTEGER NOT NULL, "
+                "text TEXT NOT NULL, alive INTEGER NOT NULL DEFAULT 1, changed INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(chunks)")}
+            if "changed" not in columns:
+                try:
+                    conn.execute("ALTER TABLE chunks ADD COLUMN changed INTEGER NOT NULL DEFAULT 0")
+                except sqlite3.OperationalError:
+                    # 其他进程已同时完成升级
+                    pass
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_item ON chunks(item_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_changed ON chunks(changed)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _vectors_file(self, generation: int):
+        # 第 0 代沿用旧版本的文件名
+        return self.directory / ("vectors.f32" if not generation else f"vectors.{generation}.f32")
+
+    def _read_meta(self, conn) -> Dict[str, str]:
+        meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        self._dim = int(meta["dim"]) if "dim" in meta else None
+        self.vectors_path = self._vectors_file(int(meta.get("generation", 0)))
+        return meta
+
+    def _set_generation(self, conn, generation: int):
+        """行号重新编排（压缩、清空）时换一个新的向量文件，其他进程正在读取的旧文件不受影响"""
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('generation', ?)", (str(generation),))
+        self.vectors_path = self._vectors_file(generation)
+
+    def _remove_old_files(self, generation: int):
+        """删除更早的向量文件；保留上一代，刚读到旧版本的进程仍可打开"""
+        for path in self.directory.glob("vectors*.f32"):
+            parts = path.name.split(".")
+            old = int(parts[1]) if len(parts) == 3 and parts[1].isdigit() else 0
+            if old < generation - 1:
+                path.unlink(missing_ok=True)
+
+    def _ensure_dim(self, conn, meta: Dict[str, str], dim: int, provider: str):
+        """记录向量维度；更换向量化方式后旧向量不可比，清空重建"""
+        if "dim" in meta and (meta["dim"] != str(dim) or meta.get("provider") != provider):
+            print(f"向量化方式已变更（{meta.get('provider')} -> {provider}），清空向量索引")
+            conn.execute("DELETE FROM chunks")
+            self._set_generation(conn, int(meta.get("generation", 0)) + 1)
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dim', ?), ('provider', ?)", (str(dim), provider))
+        self._dim = dim
+
+    @staticmethod
+    def _bump_version(conn) -> int:
+        # 每次写入都递增版本号，其他进程据此发现索引已变化
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('version', '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+        return int(conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0])
+
+    @staticmethod
+    def _committed_rows(conn) -> int:
+        # 向量文件末尾可能有未提交（或已回滚）写入的行，只使用已提交的行
+        return conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM chunks").fetchone()[0]
+
+    def _row_count(self) -> int:
+        if not self.vectors_path.exists() or not self._dim:
+            return 0
+        return self.vectors_path.stat().st_size // (4 * self._dim)
+
+    def _load(self):
+        """
+        把向量文件映射到内存，并更新每行对应的知识库项编号与存活标记；
+        只读取上次加载之后变化的行，写入后的查询不会因索引变大而变慢
+        """
+        import numpy as np
+
+        conn = self._db()
+        # 在同一个读快照中取版本号和变化的行
+        conn.execute("BEGIN")
+        try:
+            meta = self._read_meta(conn)
+            version = int(meta.get("version", 0))
+            generation = int(meta.get("generation", 0))
+            if self._matrix is not None and (version, generation) == (self._loaded_version, self._generation):
+                return
+            full = self._matrix is None or generation != self._generation
+            committed = self._committed_rows(conn)
+            changes = conn.execute(
+                "SELECT row, item_id, alive FROM chunks WHERE changed > ?", (-1 if full else self._loaded_version,)
+            ).fetchall()
+        finally:
+            conn.execute("COMMIT")
+
+        rows = min(self._row_count(), committed)
+        if full:
+            self._alive = np.zeros(rows, dtype=bool)
+            self._item_codes = np.full(rows, -1, dtype=np.int64)
+            self._codes = {}
+            self._item_ids = []
+        elif rows != len(self._alive):
+            grow = max(0, rows - len(self._alive))
+            self._alive = np.concatenate([self._alive[:rows], np.zeros(grow, dtype=bool)])
+            self._item_codes = np.concatenate([self._item_codes[:rows], np.full(grow, -1, dtype=np.int64)])
+        if rows == 0:
+            self._matrix = np.zeros((0, self._dim or 1), dtype=np.float32)
+        else:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dim))
+
+        codes = self._codes
+        for record in changes:
+            if record["row"] >= rows:
+                continue
+            code = codes.get(record["item_id"])
+            if code is None:
+                code = codes[record["item_id"]] = len(self._item_ids)
+                self._item_ids.append(record["item_id"])
+            self._item_codes[record["row"]] = code
+            self._alive[record["row"]] = bool(record["alive"])
+        self._loaded_version = version
+        self._generation = generation
+
+    async def add_item(self, item_id: str, text: str):
+        """切分并批量向量化一篇笔记，已存在时先删除旧向量"""
+        await self.add_items([(item_id, text)])
+
+    async def add_items(self, items: Iterable[Tuple[str, str]]):
+        """
+        批量写入多篇笔记 [(知识库项 id, 文本)]：所有分段合并成一次向量化调用
+        （由向量化实现按各自的上限分批），再在一个事务中写入；已存在的项先删除旧向量
+        """
+        split = [(item_id, split_markdown(text, config.EMBEDDING_CHUNK_CHARS)) for item_id, text in items]
+        split = [(item_id, chunks) for item_id, chunks in split if chunks]
+        if not split:
+            return
+        embedder = get_embedder()
+        vectors = await embedder.embed([chunk for _, chunks in split for chunk in chunks])
+        # 文件写入和 SQLite 事务放到线程中执行，不阻塞事件循环
+        await asyncio.to_thread(self._append, split, vectors, embedder.name)
+
+    def _append(self, split: List[Tuple[str, List[str]]], vectors: "np.ndarray", provider: str):
+        import numpy as np
+
+        with self._lock:
+            conn = self._db()
+            # BEGIN IMMEDIATE 让多个进程的追加写串行执行
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                meta = self._read_meta(conn)
+                self._ensure_dim(conn, meta, vectors.shape[1], provider)
+                version = self._bump_version(conn)
+                conn.executemany(
+                    "UPDATE chunks SET alive = 0, changed = ? WHERE item_id = ? AND alive = 1",
+                    [(version, item_id) for item_id, _ in split],
+                )
+                start = self._committed_rows(conn)
+                with open(self.vectors_path, "ab") as f:
+                    f.truncate(start * 4 * self._dim)
+                    f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+                records = []
+                for item_id, chunks in split:
+                    for chunk_no, chunk in enumerate(chunks):
+                        records.append((start + len(records), item_id, chunk_no, chunk, version))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO chunks (row, item_id, chunk_no, text, alive, changed) "
+                    "VALUES (?, ?, ?, ?, 1, ?)",
+                    records,
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def remove_item(self, item_id: str):
+        self.remove_items([item_id])
+
+    def remove_items(self, item_ids: Iterable[str]):
+        with self._lock:
+            conn = self._db()
+            with conn:
+                version = self._bump_version(conn)
+                conn.executemany(
+                    "UPDATE chunks SET alive = 0, changed = ? WHERE item_id = ? AND alive = 1",
+                    [(version, item_id) for item_id in item_ids],
+                )
+                dead, total = conn.execute("SELECT COALESCE(SUM(1 - alive), 0), COUNT(*) FROM chunks").fetchone()
+            if total and dead * 2 > total:
+                self._compact(conn)
+
+    def _compact(self, conn):
+        """
+        失效行超过一半时去掉已删除的行，重写为新一代的向量文件；
+        整个过程在一个 BEGIN IMMEDIATE 事务中，期间其他进程无法追加，行数和存活标记都在事务内重新读取
+        """
+        import numpy as np
+
+        conn.execute("BEGIN IMMEDIATE")
+        new_path = None
+        try:
+            meta = self._read_meta(conn)
+            dead, total = conn.execute("SELECT COALESCE(SUM(1 - alive), 0), COUNT(*) FROM chunks").fetchone()
+            if not total or dead * 2 <= total:
+                # 其他进程已经压缩过
+                conn.execute("COMMIT")
+                return
+            records = conn.execute(
+                "SELECT row, item_id, chunk_no, text FROM chunks WHERE alive = 1 ORDER BY row"
+            ).fetchall()
+            generation = int(meta.get("generation", 0)) + 1
+            new_path = self._vectors_file(generation)
+            if records:
+                source = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                   shape=(self._committed_rows(conn), self._dim))
+                np.ascontiguousarray(source[[record["row"] for record in records]]).tofile(new_path)
+                del source
+            version = self._bump_version(conn)
+            conn.execute("DELETE FROM chunks")
+            conn.executemany(
+                "INSERT INTO chunks (row, item_id, chunk_no, text, alive, changed) VALUES (?, ?, ?, ?, 1, ?)",
+                [(i, r["item_id"], r["chunk_no"], r["text"], version) for i, r in enumerate(records)],
+            )
+            self._set_generation(conn, generation)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            if new_path is not None:
+                new_path.unlink(missing_ok=True)
+            self._read_meta(conn)
+            raise
+        self._remove_old_files(generation)
+
+    def _top_items(self, query: "np.ndarray", k: int, exclude: Optional[str] = None) -> List[Dict]:
+        """矩阵乘法算出所有分段的相似度，每个知识库项取最相似分段的得分"""
+        import numpy as np
+
+        self._load()
+        if self._matrix is None or len(self._matrix) == 0:
+            return []
+        scores = self._matrix @ query
+        scores = np.where(self._alive, scores, -np.inf)
+        if exclude in self._codes:
+            scores[self._item_codes == self._codes[exclude]] = -np.inf
+
+        # 先用 argpartition 取出候选分段，不足 k 个不同的项时再扩大到全部
+        candidates = min(len(scores), k * 20)
+        while True:
+            order = np.argpartition(-scores, candidates - 1)[:candidates]
+            order = order[np.argsort(-scores[order], kind="stable")]
+            order = order[np.isfinite(scores[order])]
+            # 每个知识库项的最高分：降序排列后每个编号第一次出现的位置
+            _, first = np.unique(self._item_codes[order], return_index=True)
+            if len(first) >= k or candidates == len(scores):
+                break
+            candidates = len(scores)
+        best_rows = order[np.sort(first)][:k]
+
+        conn = self._db()
+        results = []
+        for row in best_rows:
+            record = conn.execute("SELECT item_id, text FROM chunks WHERE row = ?", (int(row),)).fetchone()
+            # 加载之后其他进程压缩了索引（行号已变化），跳过对不上的行
+            if record is None or record["item_id"] != self._item_ids[self._item_codes[row]]:
+                continue
+            results.append({"id": record["item_id"], "score": round(float(scores[row]), 4), "chunk": record["text"]})
+        return results
+
+    def _locked_top_items(self, query: "np.ndarray", k: int) -> List[Dict]:
+        with self._lock:
+            return self._top_items(query, k)
+
+    async def search(self, query: str, k: int = 10) -> List[Dict]:
+        vector = (await get_embedder().embed([query]))[0]
+        # 加载、矩阵乘法和 SQLite 读取放到线程中执行；写入/压缩持有同一把锁时不阻塞事件循环
+        return await asyncio.to_thread(self._locked_top_items, vector, k)
+
+    async def related(self, item_id: str, k: int = 5) -> List[Dict]:
+        """以该项所有分段向量的均值作为查询，找出最相近的其他项"""
+        return await asyncio.to_thread(self._related, item_id, k)
+
+    def _related(self, item_id: str, k: int) -> List[Dict]:
+        import numpy as np
+
+        with self._lock:
+            self._load()
+            if item_id not in self._codes:
+                return []
+            rows = np.flatnonzero((self._item_codes == self._codes[item_id]) & self._alive)
+            if len(rows) == 0:
+                return []
+            centroid = self._matrix[rows].mean(axis=0)
+            norm = np.linalg.norm(centroid)
+            if norm == 0:
+                return []
+            return self._top_items((centroid / norm).astype(np.float32), k, exclude=item_id)
+
+
+vector_index = VectorIndex(config.VECTOR_INDEX_DIR)
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import signal
+import socket
+import uuid
+from typing import List
+
+import config
+import http_client
+from analyse import analyze_videos_task
+from jobs import job_store, new_job_event
+
+# 批量分析 worker：可以随 API 进程启动（INPROCESS_WORKER=1），
+# 也可以单独运行：python -m worker
+# 任务库的读写都放到线程中执行：多进程共用同一个任务库时，等待 SQLite 锁不会阻塞事件循环（包括续租心跳）
+
+
+async def _heartbeat(task_id: str, worker_id: str):
+    while True:
+        await asyncio.sleep(config.JOB_LEASE_SECONDS / 3)
+        await asyncio.to_thread(job_store.renew, task_id, worker_id)
+
+
+async def worker_loop(worker_id: str, stopping: asyncio.Event):
+    """不断领取并执行任务，直到 stopping 被设置；没有任务时等待新任务通知或轮询间隔"""
+    while not stopping.is_set():
+        task_id = await asyncio.to_thread(job_store.claim, worker_id)
+        if task_id is None:
+            new_job_event.clear()
+            try:
+                await asyncio.wait_for(new_job_event.wait(), timeout=config.JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        heartbeat = asyncio.create_task(_heartbeat(task_id, worker_id))
+        try:
+            await analyze_videos_task(task_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"任务执行失败 {task_id}: {e}")
+            await asyncio.to_thread(job_store.finish, task_id, status="failed", error=str(e))
+        finally:
+            heartbeat.cancel()
+
+
+class Worker:
+    """
+    管理若干个 worker_loop；退出时先停止领取新任务，等待进行中的任务完成（最多 grace 秒），
+    超时仍未完成的任务取消后交还，已完成的视频有检查点，其他 worker 接手后不会重复分析
+    """
+
+    def __init__(self, jobs: int = config.WORKER_JOBS):
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.jobs = max(1, jobs)
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+
+    @property
+    def draining(self) -> bool:
+        return self._stopping.is_set()
+
+    def start(self):
+        self._stopping.clear()
+        self._tasks = [asyncio.create_task(worker_loop(self.worker_id, self._stopping)) for _ in range(self.jobs)]
+
+    def drain(self):
+        """停止领取新任务，进行中的任务继续执行"""
+        self._stopping.set()
+        # 唤醒空闲的 worker_loop，让它们立即退出
+        new_job_event.set()
+
+    async def stop(self, grace: float = config.SHUTDOWN_GRACE_SECONDS):
+        self.drain()
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=grace)
+            if pending:
+                print(f"等待 {grace} 秒后仍有 {len(pending)} 个任务未完成，交还给其他 worker")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.to_thread(job_store.release, self.worker_id)
+
+
+async def main():
+    await http_client.startup()
+    config.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    worker = Worker()
+    worker.start()
+    print(f"分析 worker 已启动: {worker.worker_id}")
+    # 收到 SIGTERM/SIGINT 时先等待进行中的任务完成再退出
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows 不支持 add_signal_handler，Ctrl+C 时直接取消
+            pass
+    try:
+        await stop.wait()
+    finally:
+        await worker.stop()
+        await http_client.shutdown()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass